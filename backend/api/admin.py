@@ -1,6 +1,13 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from django.db.models import Sum
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils.html import format_html, format_html_join
+
+from .pagination import EstimatedCountPaginator
+from .profiling import aggregate_top_functions
 
 from .models import (
     User,
@@ -9,6 +16,8 @@ from .models import (
     Comment,
     Participant,
     ParticipationRequest,
+    RequestProfile,
+    DataExport,
 )
 
 
@@ -28,22 +37,32 @@ class UserAdmin(BaseUserAdmin):
 
 @admin.register(Project)
 class ProjectAdmin(admin.ModelAdmin):
-    list_display = ("name", "author", "city", "status", "created_at", "votes", "comments_count")
+    list_display = ("name", "author", "city", "status", "created_at", "score", "comments_count")
     search_fields = ("name", "description", "city", "author__username")
     list_filter = ("city", "status", "created_at")
     readonly_fields = ("created_at",)
-
-    def votes(self, obj):
-        """Compute sum of vote values for the project."""
-        total = obj.votes.aggregate(total=Sum("value"))["total"]
-        return total or 0
-    votes.short_description = "votes"
-    votes.admin_order_field = "votes__value"
+    autocomplete_fields = ("author",)
+    list_select_related = ("author",)
+    # The table is too large for COUNT(*) on every changelist page
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        # Score and comment count as subqueries: one query per page, and they sort correctly
+        return super().get_queryset(request).with_stats(stats=("score", "comments_count"))
+
+    # Not called `votes`: the changelist would take that for the reverse
+    # relation and sort by a join on api_vote, duplicating rows
+    def score(self, obj):
+        """Sum of vote values for the project."""
+        return obj.score
+    score.short_description = "votes"
+    score.admin_order_field = "score"
 
     def comments_count(self, obj):
-        return obj.comments.count()
+        return obj.comments_count
     comments_count.short_description = "comments"
-    comments_count.admin_order_field = "comments__id"
+    comments_count.admin_order_field = "comments_count"
 
 
 @admin.register(Vote)
@@ -52,6 +71,10 @@ class VoteAdmin(admin.ModelAdmin):
     list_filter = ("value", "created_at")
     search_fields = ("user__username", "project__name")
     readonly_fields = ("created_at",)
+    autocomplete_fields = ("user", "project")
+    list_select_related = ("user", "project")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Comment)
@@ -60,6 +83,10 @@ class CommentAdmin(admin.ModelAdmin):
     search_fields = ("content", "user__username", "project__name")
     list_filter = ("created_at",)
     readonly_fields = ("created_at",)
+    autocomplete_fields = ("user", "project")
+    list_select_related = ("user", "project")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     def short_content(self, obj):
         return (obj.content[:75] + "...") if len(obj.content) > 75 else obj.content
@@ -72,6 +99,8 @@ class ParticipantAdmin(admin.ModelAdmin):
     search_fields = ("user__username", "project__name", "role")
     list_filter = ("role",)
     readonly_fields = ("joined_at",)
+    autocomplete_fields = ("user", "project")
+    list_select_related = ("user", "project")
 
 
 @admin.register(ParticipationRequest)
@@ -80,3 +109,100 @@ class ParticipationRequestAdmin(admin.ModelAdmin):
     search_fields = ("user__username", "project__name", "message")
     list_filter = ("status", "created_at")
     readonly_fields = ("created_at",)
+    autocomplete_fields = ("user", "project")
+    list_select_related = ("user", "project")
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ("created_at", "method", "path", "view", "mode", "status_code", "duration_ms", "query_count", "user")
+    list_filter = ("mode", "view", "created_at")
+    search_fields = ("path", "view")
+    fields = ("created_at", "user", "method", "path", "view", "mode", "status_code",
+              "duration_ms", "query_count", "downloads", "top_functions_table")
+    readonly_fields = fields
+    change_list_template = "admin/api/requestprofile/change_list.html"
+    # Profiles recent enough to be worth aggregating in the top functions report
+    REPORT_SIZE = 50
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_queryset(self, request):
+        # The dumps can be large and are only needed for downloads
+        return super().get_queryset(request).defer("pstats", "collapsed_stacks")
+
+    def get_urls(self):
+        return [
+            path("top-functions/", self.admin_site.admin_view(self.top_functions_view),
+                 name="api_requestprofile_top_functions"),
+            path("<int:pk>/download/", self.admin_site.admin_view(self.download_view),
+                 name="api_requestprofile_download"),
+        ] + super().get_urls()
+
+    def downloads(self, obj):
+        url = reverse("admin:api_requestprofile_download", args=[obj.pk])
+        if obj.mode == "cprofile":
+            return format_html('<a href="{}">pstats file</a> (open with <code>python -m pstats</code> or snakeviz)', url)
+        return format_html('<a href="{}">collapsed stacks</a> (feed to flamegraph.pl or speedscope)', url)
+
+    def top_functions_table(self, obj):
+        if not obj.top_functions:
+            return "-"
+        columns = [key for key in obj.top_functions[0] if key != "function"]
+        header = format_html_join("", "<th>{}</th>", ((column.replace("_", " "),) for column in columns))
+        rows = format_html_join(
+            "", "<tr><td><code>{}</code></td>{}</tr>",
+            (
+                (entry["function"], format_html_join("", "<td>{}</td>", ((entry[c],) for c in columns)))
+                for entry in obj.top_functions
+            ),
+        )
+        return format_html("<table><thead><tr><th>function</th>{}</tr></thead><tbody>{}</tbody></table>", header, rows)
+    top_functions_table.short_description = "top functions"
+
+    def download_view(self, request, pk):
+        if not self.has_view_permission(request):
+            raise Http404
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        if profile.mode == "cprofile":
+            response = HttpResponse(bytes(profile.pstats or b""), content_type="application/octet-stream")
+            filename = f"profile-{profile.pk}.prof"
+        else:
+            response = HttpResponse(profile.collapsed_stacks, content_type="text/plain; charset=utf-8")
+            filename = f"profile-{profile.pk}.folded"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+    def top_functions_view(self, request):
+        if not self.has_view_permission(request):
+            raise Http404
+        profiles = RequestProfile.objects.order_by("-created_at")
+        view = request.GET.get("view")
+        if view:
+            profiles = profiles.filter(view=view)
+        recent = list(profiles.values_list("top_functions", flat=True)[:self.REPORT_SIZE])
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "Top functions across recent profiles",
+            "view_name": view,
+            "views": RequestProfile.objects.order_by("view").values_list("view", flat=True).distinct(),
+            "profile_count": len(recent),
+            "report": aggregate_top_functions(recent),
+        }
+        return TemplateResponse(request, "admin/api/requestprofile/top_functions.html", context)
+
+
+@admin.register(DataExport)
+class DataExportAdmin(admin.ModelAdmin):
+    list_display = ("created_at", "dataset", "format", "since", "until", "status", "size", "requested_by")
+    list_filter = ("status", "dataset", "format")
+    readonly_fields = ("created_at", "finished_at", "requested_by", "dataset", "format", "since", "until",
+                       "status", "path", "size", "error")
+
+    def has_add_permission(self, request):
+        return False
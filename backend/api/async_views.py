@@ -0,0 +1,156 @@
+"""
+Coroutine versions of the endpoints that mostly wait: the AI endpoints,
+which spend seconds per LLM call, and the read-heavy project detail and
+comment list. api/urls.py serves them instead of the DRF views when
+API_ASYNC_VIEWS is on, as backend/asgi.py sets it, so one ASGI process keeps
+hundreds of upstream calls in flight instead of one per worker thread.
+
+DRF views are sync-only, so these are plain Django views answering like the
+DRF ones: the same JSON bytes and status codes, session authentication,
+DRF's CSRF rule and the api.throttling budgets. Whatever they do not cover
+themselves - other methods, anonymous access to login-only endpoints,
+Authorization headers, the browsable API, form bodies - is handed to the DRF
+view they replace.
+"""
+import io
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.authentication import CSRFCheck
+from rest_framework.exceptions import ParseError, Throttled
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
+
+from . import throttling, views
+from .feedback_ai import analyze_project_with_gemini_async, rank_projects_on_interests_async
+from .instrumentation import span
+from .models import Comment, Project
+from .renderers import FastJSONParser, dumps
+from .serializers import CommentSerializer, ProjectSerializer
+
+
+def json_response(data=None, status=200):
+    if data is None:
+        return HttpResponse(status=status, content_type='application/json')
+    return HttpResponse(dumps(data), status=status, content_type='application/json')
+
+
+def throttled_response(wait):
+    """The 429 DRF's exception handler sends for a throttled request."""
+    exc = Throttled(wait)
+    response = json_response({"detail": str(exc.detail)}, status=429)
+    response['Retry-After'] = '%d' % exc.wait
+    return response
+
+
+def csrf_failure(request):
+    """Why an unsafe request fails SessionAuthentication's CSRF check, or None."""
+    check = CSRFCheck(lambda request: None)
+    check.process_request(request)
+    return check.process_view(request, None, (), {})
+
+
+def request_data(request):
+    """The JSON body, as DRF's request.data would parse it."""
+    if not request.body:
+        return {}
+    return FastJSONParser().parse(io.BytesIO(request.body))
+
+
+def _left_to_drf(request, methods):
+    return (
+        request.method not in methods
+        or 'HTTP_AUTHORIZATION' in request.META
+        or 'text/html' in request.META.get('HTTP_ACCEPT', '')
+        or 'format' in request.GET
+        or (request.method not in SAFE_METHODS and request.content_type != 'application/json')
+    )
+
+
+def async_endpoint(drf_view, methods=('GET',), login_required=False):
+    """
+    Serve `methods` with the decorated coroutine and everything else with
+    `drf_view`. The coroutine finds the authenticated user in request.user.
+    """
+    def decorator(func):
+        delegate = sync_to_async(drf_view)
+
+        @csrf_exempt
+        @wraps(func)
+        async def view(request, *args, **kwargs):
+            if _left_to_drf(request, methods):
+                return await delegate(request, *args, **kwargs)
+            request.user = await request.auser()
+            if login_required and not request.user.is_authenticated:
+                return await delegate(request, *args, **kwargs)
+            if request.user.is_authenticated and request.method not in SAFE_METHODS:
+                reason = csrf_failure(request)
+                if reason:
+                    return json_response({"detail": f"CSRF Failed: {reason}"}, status=403)
+            wait = await throttling.aconsume(request, func.__name__, BaseThrottle().get_ident(request))
+            if wait is not None:
+                return throttled_response(wait)
+            return await func(request, *args, **kwargs)
+        return view
+    return decorator
+
+
+@async_endpoint(views.project_detail_endpoint)
+async def project_detail_endpoint(request, project_id):
+    try:
+        project = await Project.live.with_stats(request.user).aget(pk=project_id)
+    except Project.DoesNotExist:
+        return json_response(status=404)
+    with span('serialize'):
+        data = ProjectSerializer(project, context={'request': request}).data
+    return json_response(data)
+
+
+@async_endpoint(views.comments_endpoint)
+async def comments_endpoint(request, project_id):
+    if not await Project.live.filter(pk=project_id).aexists():
+        return json_response(status=404)
+    comments = [comment async for comment in Comment.objects.filter(project_id=project_id).order_by('-created_at')]
+    with span('serialize'):
+        data = CommentSerializer(comments, many=True).data
+    return json_response(data)
+
+
+@async_endpoint(views.analyze_project_with_ai, login_required=True)
+async def analyze_project_with_ai(request, project_id):
+    try:
+        project = await Project.live.with_stats(request.user).aget(pk=project_id)
+    except Project.DoesNotExist:
+        return json_response({"error": "Project not found"}, status=404)
+
+    with span('serialize'):
+        serialized_project = ProjectSerializer(project, context={"request": request}).data
+
+    try:
+        analysis_result = await analyze_project_with_gemini_async(serialized_project)
+        project_with_analysis = dict(serialized_project)
+        project_with_analysis['analysis'] = analysis_result
+        return json_response(project_with_analysis)
+    except Exception as e:
+        return json_response({"error": str(e)}, status=500)
+
+
+@async_endpoint(views.rank_projects_by_interests, methods=('POST',))
+async def rank_projects_by_interests(request):
+    try:
+        prompt = request_data(request).get('prompt', None)
+    except ParseError as exc:
+        return json_response({"detail": str(exc.detail)}, status=400)
+    if not prompt:
+        return json_response({"error": "Prompt is required"}, status=400)
+
+    projects = [project async for project in Project.live.with_stats(request.user)]
+    with span('serialize'):
+        serialized_projects = ProjectSerializer(projects, many=True, context={"request": request}).data
+    try:
+        ranked_result = await rank_projects_on_interests_async(serialized_projects, prompt)
+        return json_response(views.format_ranking(ranked_result))
+    except Exception as e:
+        return json_response({"error": str(e)}, status=500)
@@ -0,0 +1,212 @@
+import bisect
+import threading
+import time
+
+from django.conf import settings
+
+
+# Every word of a name starts a key, so "park" also finds "Green park cleanup"
+MAX_KEYS_PER_NAME = 8
+
+
+def normalize(text):
+    return ' '.join((text or '').split()).casefold()
+
+
+def _name_keys(name):
+    words = normalize(name).split(' ')
+    return {' '.join(words[i:]) for i in range(min(len(words), MAX_KEYS_PER_NAME)) if words[i]}
+
+
+class AutocompleteIndex:
+    """
+    In-memory prefix index over project names and cities.
+
+    Keys live in sorted lists, so a lookup is a binary search followed by a
+    short forward scan. The index is built lazily, kept current by the
+    Project save/delete signals of this process and fully rebuilt in the
+    background every AUTOCOMPLETE_REBUILD_SECONDS to pick up writes made by
+    other worker processes. Builds read the table without holding the lock;
+    updates arriving meanwhile are journaled and replayed onto the result.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # Serializes builds; the index lock is only taken to swap them in
+        self._build_lock = threading.RLock()
+        self._name_keys = []     # sorted (key, project_id)
+        self._projects = {}      # project_id -> (name, city)
+        self._city_keys = []     # sorted (key, city)
+        self._city_counts = {}   # city -> number of live projects
+        self._built_at = None
+        self._rebuilding = False
+        # Updates made while a build reads the table, replayed onto its result
+        self._journal = None
+
+    # Building
+
+    def build(self):
+        from .models import Project
+
+        with self._build_lock:
+            with self._lock:
+                self._journal = []
+            try:
+                projects = {
+                    pk: (name, city)
+                    for pk, name, city in Project.live.values_list('id', 'name', 'city').iterator(chunk_size=5000)
+                }
+                name_keys, city_counts = [], {}
+                for pk, (name, city) in projects.items():
+                    name_keys.extend((key, pk) for key in _name_keys(name))
+                    city_counts[city] = city_counts.get(city, 0) + 1
+                name_keys.sort()
+                city_keys = sorted((normalize(city), city) for city in city_counts)
+            except BaseException:
+                with self._lock:
+                    self._journal = None
+                raise
+
+            with self._lock:
+                self._projects = projects
+                self._name_keys = name_keys
+                self._city_counts = city_counts
+                self._city_keys = city_keys
+                self._built_at = time.monotonic()
+                # The snapshot may predate any of these; replaying them in
+                # order leaves the latest state either way
+                journal, self._journal = self._journal, None
+                for method, args in journal:
+                    getattr(self, method)(*args)
+
+    def _record(self, method, *args):
+        """Journal an update for the running build, if any; call with the lock held."""
+        if self._journal is not None:
+            self._journal.append((method, args))
+
+    def _ensure_fresh(self):
+        if self._built_at is None:
+            with self._build_lock:
+                if self._built_at is None:
+                    self.build()
+            return
+        max_age = getattr(settings, 'AUTOCOMPLETE_REBUILD_SECONDS', 300)
+        if max_age and time.monotonic() - self._built_at > max_age and not self._rebuilding:
+            from .tasks import run_in_background
+
+            self._rebuilding = True
+            run_in_background(self._rebuild_in_background)
+
+    def _rebuild_in_background(self):
+        try:
+            self.build()
+        finally:
+            self._rebuilding = False
+
+    def invalidate(self):
+        with self._lock:
+            self._record('invalidate')
+            self._built_at = None
+
+    # Incremental updates
+
+    def update_project(self, pk, name, city):
+        with self._lock:
+            self._record('update_project', pk, name, city)
+            if self._built_at is None:
+                return
+            self._remove(pk)
+            self._projects[pk] = (name, city)
+            for key in _name_keys(name):
+                bisect.insort(self._name_keys, (key, pk))
+            if city not in self._city_counts:
+                bisect.insort(self._city_keys, (normalize(city), city))
+            self._city_counts[city] = self._city_counts.get(city, 0) + 1
+
+    def update_projects(self, rows):
+        """update_project() for many (pk, name, city) rows with a single re-sort."""
+        with self._lock:
+            rows = list(rows)
+            self._record('update_projects', rows)
+            if self._built_at is None:
+                return
+            rows = {pk: (name, city) for pk, name, city in rows}
+            self._remove_many(rows)
+            for pk, (name, city) in rows.items():
+                self._projects[pk] = (name, city)
+                self._name_keys.extend((key, pk) for key in _name_keys(name))
+                if city not in self._city_counts:
+                    self._city_keys.append((normalize(city), city))
+                self._city_counts[city] = self._city_counts.get(city, 0) + 1
+            self._name_keys.sort()
+            self._city_keys.sort()
+
+    def _remove_many(self, pks):
+        removed = [pk for pk in pks if pk in self._projects]
+        if not removed:
+            return
+        for pk in removed:
+            city = self._projects.pop(pk)[1]
+            self._city_counts[city] -= 1
+            if not self._city_counts[city]:
+                del self._city_counts[city]
+        removed = set(removed)
+        self._name_keys = [entry for entry in self._name_keys if entry[1] not in removed]
+        self._city_keys = [entry for entry in self._city_keys if entry[1] in self._city_counts]
+
+    def remove_project(self, pk):
+        with self._lock:
+            self._record('remove_project', pk)
+            if self._built_at is not None:
+                self._remove(pk)
+
+    def _remove(self, pk):
+        old = self._projects.pop(pk, None)
+        if old is None:
+            return
+        name, city = old
+        for key in _name_keys(name):
+            i = bisect.bisect_left(self._name_keys, (key, pk))
+            if i < len(self._name_keys) and self._name_keys[i] == (key, pk):
+                del self._name_keys[i]
+        self._city_counts[city] -= 1
+        if not self._city_counts[city]:
+            del self._city_counts[city]
+            i = bisect.bisect_left(self._city_keys, (normalize(city), city))
+            if i < len(self._city_keys) and self._city_keys[i] == (normalize(city), city):
+                del self._city_keys[i]
+
+    # Lookups
+
+    def search(self, prefix, limit=10):
+        self._ensure_fresh()
+        prefix = normalize(prefix)
+        if not prefix:
+            return {'projects': [], 'cities': []}
+
+        with self._lock:
+            projects, seen = [], set()
+            i = bisect.bisect_left(self._name_keys, (prefix,))
+            while i < len(self._name_keys) and len(projects) < limit:
+                key, pk = self._name_keys[i]
+                if not key.startswith(prefix):
+                    break
+                if pk not in seen:
+                    seen.add(pk)
+                    name, city = self._projects[pk]
+                    projects.append({'id': pk, 'name': name, 'city': city})
+                i += 1
+
+            cities = []
+            i = bisect.bisect_left(self._city_keys, (prefix,))
+            while i < len(self._city_keys) and len(cities) < limit:
+                key, city = self._city_keys[i]
+                if not key.startswith(prefix):
+                    break
+                cities.append({'city': city, 'count': self._city_counts[city]})
+                i += 1
+
+        return {'projects': projects, 'cities': cities}
+
+
+index = AutocompleteIndex()
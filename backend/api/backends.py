@@ -0,0 +1,19 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth.backends import ModelBackend
+
+from .caches import get_cached_user
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend whose get_user(), run by AuthenticationMiddleware on every
+    request with a session, is served from the cache instead of the database.
+    """
+
+    def get_user(self, user_id):
+        user = get_cached_user(user_id)
+        return user if user is not None and self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        # ModelBackend's version goes to the database, skipping the cache
+        return await sync_to_async(self.get_user)(user_id)
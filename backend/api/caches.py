@@ -0,0 +1,53 @@
+from django.core.cache import cache
+
+
+MY_PARTICIPATION_TTL = 300
+
+
+def _my_participation_version_key(user_id):
+    return f'my_participation:{user_id}:version'
+
+
+def my_participation_cache_key(user_id, query_string):
+    # Keys embed a per-user version, so invalidation is a single counter bump
+    # that orphans every cached page for that user at once.
+    version = cache.get_or_set(_my_participation_version_key(user_id), 1, timeout=None)
+    return f'my_participation:{user_id}:{version}:{query_string}'
+
+
+def invalidate_my_participation(*user_ids):
+    for user_id in set(user_ids):
+        try:
+            cache.incr(_my_participation_version_key(user_id))
+        except ValueError:
+            # No version yet means nothing has been cached for this user
+            pass
+
+
+USER_CACHE_TTL = 60
+
+
+def _user_key(user_id):
+    return f'auth_user:{user_id}'
+
+
+def get_cached_user(user_id):
+    """
+    The User for an authenticated request, with groups and permissions
+    prefetched, from the cache when possible. Saving the user, or changing
+    their groups, their permissions or those of their groups, drops the
+    entry (see api.signals).
+    """
+    from .models import User
+
+    key = _user_key(user_id)
+    user = cache.get(key)
+    if user is None:
+        user = User.objects.prefetch_related('groups', 'user_permissions').filter(pk=user_id).first()
+        if user is not None:
+            cache.set(key, user, USER_CACHE_TTL)
+    return user
+
+
+def invalidate_user(*user_ids):
+    cache.delete_many([_user_key(user_id) for user_id in set(user_ids)])
@@ -0,0 +1,60 @@
+from django.db import connection, models, transaction
+
+from . import facets
+from .autocomplete import index as autocomplete_index
+from .caches import invalidate_my_participation
+from .models import ParticipationRequest, Project
+
+
+def _cascaded_relations():
+    # Every table that points at Project with CASCADE, e.g. votes and comments.
+    # Only direct children are handled: none of them has cascading children itself.
+    return [
+        rel for rel in Project._meta.related_objects
+        if rel.on_delete is models.CASCADE
+    ]
+
+
+def count_project_rows(project_id):
+    """Number of rows that deleting the project would cascade to."""
+    return sum(
+        rel.related_model._base_manager.filter(**{rel.field.attname: project_id}).count()
+        for rel in _cascaded_relations()
+    )
+
+
+def tombstone_project(project):
+    """Hide a project from every listing ahead of a background purge."""
+    with transaction.atomic():
+        Project.objects.filter(pk=project.pk).update(is_deleted=True)
+        facets.adjust(facets.facet_key(project), -1)
+    transaction.on_commit(lambda: autocomplete_index.remove_project(project.pk))
+
+
+def purge_project(project_id):
+    """
+    Delete a project and everything cascading from it with one bulk DELETE per
+    table. Unlike Model.delete() nothing is loaded into Python and no
+    per-object signals are sent, so cache and facet upkeep happens here instead.
+    """
+    quote = connection.ops.quote_name
+    applicants = list(
+        ParticipationRequest.objects.filter(project_id=project_id).values_list('user_id', flat=True)
+    )
+    with transaction.atomic():
+        project = Project.objects.filter(pk=project_id).only('city', 'status', 'is_deleted').first()
+        if project is None:
+            return
+        facets.adjust(facets.facet_key(project), -1)
+        with connection.cursor() as cursor:
+            for rel in _cascaded_relations():
+                cursor.execute(
+                    f'DELETE FROM {quote(rel.related_model._meta.db_table)} WHERE {quote(rel.field.column)} = %s',
+                    [project_id],
+                )
+            cursor.execute(
+                f'DELETE FROM {quote(Project._meta.db_table)} WHERE {quote(Project._meta.pk.column)} = %s',
+                [project_id],
+            )
+    invalidate_my_participation(*applicants)
+    autocomplete_index.remove_project(project_id)
@@ -0,0 +1,216 @@
+"""
+Near-duplicate project detection with MinHash and locality-sensitive hashing.
+
+A project's name and description are cut into overlapping character
+shingles. One hash per shingle picks one of NUM_HASHES bins and the
+signature keeps each bin's smallest hash (one permutation hashing, so a
+signature costs one hash per shingle rather than NUM_HASHES). Two signatures
+agree in a position with probability equal to the Jaccard similarity of the
+shingle sets, so the share of equal positions estimates it.
+
+The signature is split into BANDS bands of ROWS values, each hashed together
+with the city into a ProjectBand bucket. Projects of the same city sharing a
+bucket are candidates, found with indexed (band, bucket) lookups instead of
+a comparison with every project, and confirmed against DUPLICATE_SIMILARITY
+with their stored signatures. With 16 bands of 4 rows a pair at similarity
+0.7 shares a bucket 99% of the time, one at 0.3 under 13%.
+
+api.signals keeps signatures current on save, api.importing on bulk imports;
+the find_duplicates command rebuilds them and clusters the whole table.
+"""
+import hashlib
+import re
+import struct
+import zlib
+from itertools import groupby
+
+from django.conf import settings
+from django.db.models import Q
+
+from .models import Project, ProjectBand, ProjectSignature
+
+
+SHINGLE_SIZE = 5
+NUM_HASHES = 64
+BANDS = 16
+ROWS = NUM_HASHES // BANDS
+MAX_RESULTS = 5
+
+_PRIME = (1 << 61) - 1
+
+
+def _coefficient(label):
+    # Derived from fixed labels, not a seeded RNG: stored signatures must stay comparable
+    return int.from_bytes(hashlib.blake2b(label.encode(), digest_size=8).digest(), 'big') % _PRIME
+
+
+_A, _B = _coefficient('minhash-a') or 1, _coefficient('minhash-b')
+# Bins left empty by short texts borrow the next filled bin's minimum, offset by
+# this much per bin skipped so borrowed values never equal genuine ones
+_BORROWED = _PRIME // NUM_HASHES + 1
+_PACKED = struct.Struct(f'<{NUM_HASHES}Q')
+_WORDS = re.compile(r'\w+')
+
+
+def shingles(text):
+    """CRC32s of the SHINGLE_SIZE-character windows of the normalized text."""
+    text = ' '.join(_WORDS.findall(text.lower()))
+    if len(text) <= SHINGLE_SIZE:
+        return {zlib.crc32(text.encode())}
+    return {zlib.crc32(text[i:i + SHINGLE_SIZE].encode()) for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def minhash(name, description):
+    bins = [None] * NUM_HASHES
+    for x in shingles(f'{name} {description}'):
+        h = (_A * x + _B) % _PRIME
+        position, value = h % NUM_HASHES, h // NUM_HASHES
+        if bins[position] is None or value < bins[position]:
+            bins[position] = value
+
+    # Rotation densification: walk backwards twice so every bin sees the next filled one
+    signature = list(bins)
+    following, distance = None, 0
+    for position in reversed(range(2 * NUM_HASHES)):
+        position %= NUM_HASHES
+        distance += 1
+        if bins[position] is not None:
+            following, distance = bins[position], 0
+        elif following is not None:
+            signature[position] = following + distance * _BORROWED
+    return tuple(signature)
+
+
+def similarity(signature, other):
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    return sum(x == y for x, y in zip(signature, other)) / NUM_HASHES
+
+
+def pack(signature):
+    return _PACKED.pack(*signature)
+
+
+def unpack(data):
+    return _PACKED.unpack(data)
+
+
+def pack_band(values):
+    return struct.pack(f'<{len(values)}Q', *values)
+
+
+def buckets(signature, city):
+    """The LSH bucket of each band, scoped to the city."""
+    city = city.strip().casefold().encode()
+    return [
+        int.from_bytes(
+            hashlib.blake2b(city + pack_band(signature[band * ROWS:(band + 1) * ROWS]), digest_size=8).digest(),
+            'big', signed=True,
+        )
+        for band in range(BANDS)
+    ]
+
+
+def index_projects(rows, replace=True):
+    """
+    (Re)compute and store the signatures and bands of (pk, name, description,
+    city) rows; `replace=False` skips removing old ones for new projects.
+    Returns {pk: signature}.
+    """
+    signatures = {pk: (minhash(name, description), city) for pk, name, description, city in rows}
+    if not signatures:
+        return {}
+    if replace:
+        ProjectBand.objects.filter(project_id__in=signatures).delete()
+        ProjectSignature.objects.filter(project_id__in=signatures).delete()
+    ProjectSignature.objects.bulk_create(
+        ProjectSignature(project_id=pk, minhash=pack(signature)) for pk, (signature, _) in signatures.items()
+    )
+    ProjectBand.objects.bulk_create(
+        ProjectBand(project_id=pk, band=band, bucket=bucket)
+        for pk, (signature, city) in signatures.items()
+        for band, bucket in enumerate(buckets(signature, city))
+    )
+    return {pk: signature for pk, (signature, _) in signatures.items()}
+
+
+def index_project(project, replace=True):
+    row = (project.pk, project.name, project.description, project.city)
+    signature = index_projects([row], replace=replace)[project.pk]
+    # Spares possible_duplicates() recomputing it for the response
+    project._minhash = signature
+    return signature
+
+
+def find_similar(signature, city, exclude=None, limit=MAX_RESULTS):
+    """Live projects of `city` at least DUPLICATE_SIMILARITY alike, most similar first."""
+    in_buckets = Q()
+    for band, bucket in enumerate(buckets(signature, city)):
+        in_buckets |= Q(band=band, bucket=bucket)
+    candidates = ProjectSignature.objects.filter(
+        project__in=ProjectBand.objects.filter(in_buckets).values('project_id'),
+        project__is_deleted=False,
+    )
+    if exclude is not None:
+        candidates = candidates.exclude(project_id=exclude)
+
+    found = []
+    for pk, name, packed in candidates.values_list('project_id', 'project__name', 'minhash'):
+        score = similarity(signature, unpack(packed))
+        if score >= settings.DUPLICATE_SIMILARITY:
+            found.append({'id': pk, 'name': name, 'similarity': round(score, 2)})
+    found.sort(key=lambda item: (-item['similarity'], item['id']))
+    return found[:limit]
+
+
+def possible_duplicates(project):
+    signature = getattr(project, '_minhash', None) or minhash(project.name, project.description)
+    return find_similar(signature, project.city, exclude=project.pk)
+
+
+def rebuild(batch_size=1000):
+    """Recompute every live project's signature. Returns the number indexed."""
+    rows = Project.live.order_by('pk').values_list('pk', 'name', 'description', 'city')
+    batch, total = [], 0
+    for row in rows.iterator(chunk_size=batch_size):
+        batch.append(row)
+        if len(batch) == batch_size:
+            total += len(index_projects(batch))
+            batch = []
+    return total + len(index_projects(batch))
+
+
+def clusters(threshold=None):
+    """
+    Groups of live projects linked by confirmed near-duplicate pairs, largest
+    first, as lists of project ids. Only pairs sharing a bucket are compared.
+    """
+    threshold = settings.DUPLICATE_SIMILARITY if threshold is None else threshold
+    signatures = dict(
+        ProjectSignature.objects.filter(project__is_deleted=False).values_list('project_id', 'minhash').iterator()
+    )
+    parent = {}
+
+    def root(pk):
+        while parent.get(pk, pk) != pk:
+            parent[pk] = parent.get(parent[pk], parent[pk])
+            pk = parent[pk]
+        return pk
+
+    rows = (
+        ProjectBand.objects.filter(project__is_deleted=False)
+        .order_by('band', 'bucket', 'project_id')
+        .values_list('band', 'bucket', 'project_id')
+    )
+    for _, group in groupby(rows.iterator(), key=lambda row: row[:2]):
+        members = [pk for _, _, pk in group if pk in signatures]
+        for i, pk in enumerate(members):
+            for other in members[i + 1:]:
+                if root(pk) == root(other):
+                    continue
+                if similarity(unpack(signatures[pk]), unpack(signatures[other])) >= threshold:
+                    parent[root(other)] = root(pk)
+
+    groups = {}
+    for pk in set(parent) | set(parent.values()):
+        groups.setdefault(root(pk), []).append(pk)
+    return sorted((sorted(group) for group in groups.values() if len(group) > 1), key=lambda group: (-len(group), group))
@@ -0,0 +1,206 @@
+"""
+Streaming analytics exports: projects with their aggregates, and the raw vote
+and comment events, as CSV, JSONL or Parquet.
+
+Rows are read with values_list().iterator(), which uses a server-side cursor
+on PostgreSQL, and written out chunk by chunk, so memory stays flat for any
+range. Exports cover `since < created_at <= until`; passing the previous
+export's `until` as the next `since` gives gap-free incremental exports.
+
+created_at is stamped when a row is saved, not when its transaction
+commits, so a row can become visible with a timestamp already behind the
+present. `until` therefore stays EXPORT_WATERMARK_LAG seconds in the past
+(see export_until), which must exceed the longest write transaction;
+otherwise such a row would fall before the next export's `since` and never
+be exported.
+"""
+import csv
+import datetime
+import io
+import os
+from itertools import islice
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Comment, DataExport, Project, Vote
+from .renderers import dumps
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+FORMATS = ('csv', 'jsonl', 'parquet')
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+CHUNK_SIZE = 2000
+
+
+class ExportError(ValueError):
+    pass
+
+
+# dataset -> (queryset factory, [(column, parquet type name)])
+DATASETS = {
+    'projects': (
+        lambda: Project.live.with_stats(stats=('score', 'comments_count', 'participants_count')),
+        [
+            ('id', 'int64'), ('author_id', 'int64'), ('name', 'string'), ('city', 'string'),
+            ('status', 'string'), ('latitude', 'float64'), ('longitude', 'float64'),
+            ('external_id', 'string'), ('created_at', 'timestamp'),
+            ('score', 'int64'), ('comments_count', 'int64'), ('participants_count', 'int64'),
+        ],
+    ),
+    'votes': (
+        lambda: Vote.objects.all(),
+        [('id', 'int64'), ('user_id', 'int64'), ('project_id', 'int64'), ('value', 'int64'), ('created_at', 'timestamp')],
+    ),
+    'comments': (
+        lambda: Comment.objects.all(),
+        [('id', 'int64'), ('user_id', 'int64'), ('project_id', 'int64'), ('content', 'string'), ('created_at', 'timestamp')],
+    ),
+}
+
+
+def validate(dataset, fmt):
+    if dataset not in DATASETS:
+        raise ExportError(f"Unknown dataset, choose one of: {', '.join(DATASETS)}")
+    if fmt not in FORMATS:
+        raise ExportError(f"Unknown format, choose one of: {', '.join(FORMATS)}")
+    if fmt == 'parquet' and pyarrow is None:
+        raise ExportError("Parquet export needs the pyarrow package")
+
+
+def parse_watermark(value):
+    """An ISO date or datetime from a query string or the command line; naive means UTC."""
+    if not value:
+        return None
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None and (day := parse_date(value)):
+            parsed = datetime.datetime.combine(day, datetime.time())
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ExportError(f"Invalid timestamp: {value}")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, datetime.timezone.utc)
+    return parsed
+
+
+def export_until(value=None):
+    """
+    The `until` of an export: `value` parsed like parse_watermark, but never
+    later than EXPORT_WATERMARK_LAG seconds ago, which is also the default.
+    """
+    settled = timezone.now() - datetime.timedelta(seconds=settings.EXPORT_WATERMARK_LAG)
+    until = parse_watermark(value)
+    return settled if until is None else min(until, settled)
+
+
+def rows(dataset, since=None, until=None):
+    """Tuples in DATASETS column order, oldest first."""
+    make_queryset, columns = DATASETS[dataset]
+    queryset = make_queryset()
+    if since is not None:
+        queryset = queryset.filter(created_at__gt=since)
+    if until is not None:
+        queryset = queryset.filter(created_at__lte=until)
+    names = [name for name, _ in columns]
+    return queryset.order_by('created_at', 'id').values_list(*names).iterator(chunk_size=CHUNK_SIZE)
+
+
+def export_chunks(dataset, fmt, since=None, until=None):
+    """Encoded chunks of the whole export, for a streaming response or a file."""
+    validate(dataset, fmt)
+    columns = DATASETS[dataset][1]
+    writer = {'csv': _csv_chunks, 'jsonl': _jsonl_chunks, 'parquet': _parquet_chunks}[fmt]
+    return writer(columns, _batches(rows(dataset, since, until)))
+
+
+def _batches(iterator):
+    while batch := list(islice(iterator, CHUNK_SIZE)):
+        yield batch
+
+
+def _csv_chunks(columns, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(name for name, _ in columns)
+    for batch in batches:
+        writer.writerows(
+            [value.isoformat() if hasattr(value, 'isoformat') else value for value in row] for row in batch
+        )
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _jsonl_chunks(columns, batches):
+    names = [name for name, _ in columns]
+    for batch in batches:
+        yield b''.join(dumps(dict(zip(names, row))) + b'\n' for row in batch)
+
+
+def _parquet_chunks(columns, batches):
+    types = {
+        'int64': pyarrow.int64(),
+        'float64': pyarrow.float64(),
+        'string': pyarrow.string(),
+        'timestamp': pyarrow.timestamp('us', tz='UTC'),
+    }
+    schema = pyarrow.schema([(name, types[kind]) for name, kind in columns])
+    sink = io.BytesIO()
+    # One row group per batch; the sink is drained after each so only the
+    # current group is ever held in memory
+    with pyarrow.parquet.ParquetWriter(sink, schema) as writer:
+        for batch in batches:
+            writer.write_table(pyarrow.Table.from_arrays(
+                [pyarrow.array(column, type=schema.field(i).type) for i, column in enumerate(zip(*batch))],
+                schema=schema,
+            ))
+            yield _drain(sink)
+    yield _drain(sink)
+
+
+def _drain(sink):
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate()
+    return data
+
+
+def export_path(export):
+    return os.path.join(settings.EXPORT_DIR, f'{export.dataset}-{export.pk}.{export.format}')
+
+
+def run_export(export_id):
+    """Write a queued DataExport to EXPORT_DIR; runs on the background pool."""
+    export = DataExport.objects.get(pk=export_id)
+    export.status = 'running'
+    export.save(update_fields=['status'])
+    path = export_path(export)
+    try:
+        os.makedirs(settings.EXPORT_DIR, exist_ok=True)
+        size = 0
+        with open(path, 'wb') as f:
+            for chunk in export_chunks(export.dataset, export.format, export.since, export.until):
+                f.write(chunk)
+                size += len(chunk)
+    except Exception as exc:
+        export.status, export.error = 'failed', str(exc)
+        export.finished_at = timezone.now()
+        export.save(update_fields=['status', 'error', 'finished_at'])
+        raise
+    export.status, export.path, export.size = 'done', path, size
+    export.finished_at = timezone.now()
+    export.save(update_fields=['status', 'path', 'size', 'finished_at'])
@@ -0,0 +1,69 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+from .models import CityStatusCount, Project
+
+
+def facet_key(project):
+    """The (city, status) bucket a project counts towards, None once tombstoned."""
+    if project.is_deleted:
+        return None
+    return (project.city, project.status)
+
+
+def adjust(key, delta):
+    if key is None or delta == 0:
+        return
+    city, status = key
+    # Counts that drifted low (see rebuild) stop at zero instead of violating
+    # the column's non-negative constraint and failing the write behind them
+    count = F('count') + delta if delta > 0 else Greatest(F('count') + delta, 0)
+    updated = CityStatusCount.objects.filter(city=city, status=status).update(count=count)
+    if updated or delta < 0:
+        return
+    try:
+        with transaction.atomic():
+            CityStatusCount.objects.create(city=city, status=status, count=delta)
+    except IntegrityError:
+        # Another writer created the row between our UPDATE and INSERT
+        CityStatusCount.objects.filter(city=city, status=status).update(count=F('count') + delta)
+
+
+def apply(deltas):
+    """adjust() for a {key: delta} mapping, one UPDATE per bucket touched by a batch."""
+    for key, delta in deltas.items():
+        adjust(key, delta)
+
+
+def move(old_key, new_key):
+    if old_key != new_key:
+        adjust(old_key, -1)
+        adjust(new_key, 1)
+
+
+def rebuild(cities=None):
+    """
+    Recount from the Project table, either everything or only `cities`.
+    Used after bulk writes that bypass signals, and to repair drift.
+    """
+    projects = Project.live.all()
+    counts = CityStatusCount.objects.all()
+    if cities is not None:
+        projects = projects.filter(city__in=cities)
+        counts = counts.filter(city__in=cities)
+    rows = projects.order_by().values('city', 'status').annotate(total=Count('id'))
+    with transaction.atomic():
+        counts.delete()
+        CityStatusCount.objects.bulk_create(
+            CityStatusCount(city=row['city'], status=row['status'], count=row['total']) for row in rows
+        )
+
+
+def city_facets():
+    cities = {}
+    for city, status, count in CityStatusCount.objects.filter(count__gt=0).values_list('city', 'status', 'count'):
+        entry = cities.setdefault(city, {'city': city, 'count': 0, 'statuses': {}})
+        entry['count'] += count
+        entry['statuses'][status] = count
+    return sorted(cities.values(), key=lambda entry: (-entry['count'], entry['city']))
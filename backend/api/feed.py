@@ -0,0 +1,151 @@
+"""
+Personalized project feeds. Each user's feed ranks the live projects of
+their city with a cheap local model and is stored as a list of ids in
+UserFeed, so serving a page of GET /api/feed/ reads one row by primary key
+and then the projects on that page.
+
+A project's score for a user adds up:
+- interest: the weights of the user's keywords found in the project's name
+  and description, divided by the square root of the project's keyword
+  count. Keywords come from the bio (BIO_WEIGHT) and from the projects the
+  user voted on (VOTE_WEIGHT times the vote, so downvoted topics count
+  against);
+- popularity: POPULARITY_WEIGHT * log(1 + net votes);
+- freshness: FRESHNESS_WEIGHT, halving every FRESHNESS_HALF_LIFE_DAYS.
+The user's own projects are left out.
+
+The build_feeds command rebuilds feeds in batches, a city at a time, and is
+meant to run periodically; a user without a feed gets one built on their
+first request.
+"""
+import heapq
+import math
+import re
+from collections import defaultdict
+from itertools import groupby, islice
+
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from .models import Project, User, UserFeed, Vote, project_score_subquery
+
+
+FEED_SIZE = 500
+DEFAULT_BATCH_SIZE = 500
+
+# What users say they care about outweighs what a single vote suggests
+BIO_WEIGHT = 2.0
+VOTE_WEIGHT = 0.5
+POPULARITY_WEIGHT = 0.5
+FRESHNESS_WEIGHT = 1.0
+FRESHNESS_HALF_LIFE_DAYS = 30
+# Keywords kept per user, which bounds the scoring work per feed
+MAX_INTEREST_KEYWORDS = 20
+
+_WORD = re.compile(r'[^\W\d_]{3,}')
+STOP_WORDS = frozenset(
+    'and are but for from has have into its not our that the their them they this was were will with you your'.split()
+)
+
+
+def keywords(text):
+    return {word for word in _WORD.findall(text.lower()) if word not in STOP_WORDS}
+
+
+def interests(bio, votes):
+    """
+    The MAX_INTEREST_KEYWORDS strongest {keyword: weight} from a bio and
+    (vote value, keywords of the voted project) pairs.
+    """
+    weights = defaultdict(float)
+    for word in keywords(bio or ''):
+        weights[word] += BIO_WEIGHT
+    for value, words in votes:
+        for word in words:
+            weights[word] += VOTE_WEIGHT * value
+    strongest = heapq.nlargest(MAX_INTEREST_KEYWORDS, weights.items(), key=lambda item: abs(item[1]))
+    return {word: weight for word, weight in strongest if weight}
+
+
+class CityIndex:
+    """The live projects of one city, with an inverted keyword index for scoring."""
+
+    def __init__(self, city, now):
+        rows = (
+            Project.live.filter(city__iexact=city)
+            .annotate(score=project_score_subquery())
+            .values_list('id', 'author_id', 'name', 'description', 'created_at', 'score')
+        )
+        self.ids, self.authors, self.base = [], [], []
+        self.postings = defaultdict(list)
+        for position, (pk, author_id, name, description, created_at, score) in enumerate(rows.iterator()):
+            age_days = max(0.0, (now - created_at).total_seconds() / 86400)
+            self.ids.append(pk)
+            self.authors.append(author_id)
+            self.base.append(
+                POPULARITY_WEIGHT * math.log1p(max(score, 0))
+                + FRESHNESS_WEIGHT * 0.5 ** (age_days / FRESHNESS_HALF_LIFE_DAYS)
+            )
+            words = keywords(f'{name} {description}')
+            norm = math.sqrt(len(words)) or 1.0
+            for word in words:
+                self.postings[word].append((position, 1 / norm))
+
+    def rank(self, user_id, weights):
+        """Ids of the FEED_SIZE best projects for a user with these keyword weights."""
+        scores = list(self.base)
+        # Only the projects sharing a keyword with the user are touched
+        for word, weight in weights.items():
+            for position, share in self.postings.get(word, ()):
+                scores[position] += weight * share
+        ranked = heapq.nlargest(
+            FEED_SIZE,
+            (position for position, author_id in enumerate(self.authors) if author_id != user_id),
+            key=scores.__getitem__,
+        )
+        return [self.ids[position] for position in ranked]
+
+
+def build_feeds(user_ids=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Rebuild the feeds of `user_ids`, every active user by default. Returns how many were built."""
+    users = User.objects.filter(is_active=True)
+    if user_ids is not None:
+        users = users.filter(pk__in=user_ids)
+    rows = users.annotate(city_key=Lower('city')).order_by('city_key', 'pk').values_list('pk', 'city_key', 'bio')
+
+    now = timezone.now()
+    built = 0
+    # Keywords of voted projects, extracted once however many users voted on them
+    project_keywords = {}
+    for city, group in groupby(rows.iterator(), key=lambda row: row[1]):
+        index = CityIndex(city, now)
+        while batch := list(islice(group, batch_size)):
+            voted = list(
+                Vote.objects.filter(user_id__in=[pk for pk, _, _ in batch]).values_list('user_id', 'value', 'project_id')
+            )
+            unseen = list({project_id for _, _, project_id in voted} - project_keywords.keys())
+            for start in range(0, len(unseen), batch_size):
+                projects = Project.objects.filter(pk__in=unseen[start:start + batch_size])
+                for pk, name, description in projects.values_list('pk', 'name', 'description'):
+                    project_keywords[pk] = keywords(f'{name} {description}')
+            votes = defaultdict(list)
+            for user_id, value, project_id in voted:
+                votes[user_id].append((value, project_keywords.get(project_id, ())))
+            feeds = [
+                UserFeed(user_id=pk, project_ids=index.rank(pk, interests(bio, votes[pk])), built_at=now)
+                for pk, _, bio in batch
+            ]
+            UserFeed.objects.bulk_create(
+                feeds, update_conflicts=True, unique_fields=['user'], update_fields=['project_ids', 'built_at'],
+            )
+            built += len(feeds)
+    return built
+
+
+def feed_for(user):
+    """The user's stored feed, built on the spot if they have none yet."""
+    feed = UserFeed.objects.filter(pk=user.pk).first()
+    if feed is None:
+        build_feeds([user.pk])
+        feed = UserFeed.objects.get(pk=user.pk)
+    return feed
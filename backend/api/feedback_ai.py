@@ -3,10 +3,17 @@ try:
 except Exception:
     genai = None
 
+import asyncio
 import os
+import weakref
+from asgiref.sync import sync_to_async
 from django.conf import settings
 import json
 import re
+import time
+
+from . import metrics
+from .instrumentation import span
 
 # --- Configure the Gemini Client ---
 # Only attempt to configure if the environment indicates Django settings are set up
@@ -35,6 +42,9 @@ if genai is None:
                 def generate_content(self, *args, **kwargs):
                     # Always raise so callers fall back to heuristic behavior
                     raise RuntimeError("generativeai package not installed or configured")
+
+                async def generate_content_async(self, *args, **kwargs):
+                    raise RuntimeError("generativeai package not installed or configured")
             return _DummyModel()
 
     genai = _DummyGenAI()
@@ -47,15 +57,78 @@ except Exception:
     class _DummyModel:
         def generate_content(self, *args, **kwargs):
             raise RuntimeError("generativeai model unavailable")
+
+        async def generate_content_async(self, *args, **kwargs):
+            raise RuntimeError("generativeai model unavailable")
     model = _DummyModel()
 
 
-def analyze_project_with_gemini(project_data):
+def generate_content(prompt, generation_config):
     """
-    Uses Google Gemini to analyze a serialized project object.
-    Returns structured analysis with summary, missing_points, and suggestions.
+    Call the model. The time spent is reported as the request's `llm` span
+    and in the LLM call metrics.
     """
+    start = time.perf_counter()
+    outcome = 'error'
+    try:
+        with span('llm'):
+            response = model.generate_content(prompt, generation_config=generation_config)
+        outcome = 'ok'
+        return response
+    finally:
+        metrics.LLM_CALLS.inc(outcome)
+        metrics.LLM_LATENCY.observe(time.perf_counter() - start)
+
+
+# One semaphore per event loop: asyncio primitives cannot be shared between loops
+_llm_slots = weakref.WeakKeyDictionary()
+
+
+def _llm_semaphore():
+    loop = asyncio.get_running_loop()
+    if loop not in _llm_slots:
+        _llm_slots[loop] = asyncio.Semaphore(getattr(settings, 'LLM_MAX_CONCURRENCY', 100))
+    return _llm_slots[loop]
+
+
+async def generate_content_async(prompt, generation_config):
+    """
+    generate_content() for async views. At most LLM_MAX_CONCURRENCY calls per
+    event loop are in flight; the rest wait here rather than upstream.
+    """
+    async with _llm_semaphore():
+        start = time.perf_counter()
+        outcome = 'error'
+        try:
+            with span('llm'):
+                call = getattr(model, 'generate_content_async', None)
+                if call is None:
+                    call = sync_to_async(model.generate_content, thread_sensitive=False)
+                response = await call(prompt, generation_config=generation_config)
+            outcome = 'ok'
+            return response
+        finally:
+            metrics.LLM_CALLS.inc(outcome)
+            metrics.LLM_LATENCY.observe(time.perf_counter() - start)
+
+
+def _call(prompt, generation_config):
+    """generate_content(), returning the exception instead of raising it."""
+    try:
+        return generate_content(prompt, generation_config=generation_config)
+    except Exception as e:
+        return e
+
+
+async def _call_async(prompt, generation_config):
+    try:
+        return await generate_content_async(prompt, generation_config=generation_config)
+    except Exception as e:
+        return e
+
 
+def _analysis_request(project_data):
+    """Prompt and generation config for analyze_project_with_gemini()."""
     # The prompt is largely the same, but we don't need to specify the
     # system role separately.
     prompt = f"""
@@ -75,13 +148,14 @@ def analyze_project_with_gemini(project_data):
         response_mime_type="application/json",
         temperature=0.7
     )
+    return prompt, generation_config
 
+
+def _analysis_result(response):
+    """The analysis from a model response, or the error fallback when the call raised."""
     try:
-        # Call the Gemini API
-        response = model.generate_content(
-            prompt,
-            generation_config=generation_config
-        )
+        if isinstance(response, Exception):
+            raise response
 
         # The response.text will contain the JSON string
         content = response.text.strip()
@@ -107,25 +181,31 @@ def analyze_project_with_gemini(project_data):
     return analysis_result
 
 
-def rank_projects_on_interests(projects, interests):
+def analyze_project_with_gemini(project_data):
     """
-    Ranks a list of projects based on how well they match the user's interests.
-    Uses Gemini to score each project and returns a sorted list.
-    Each returned item is a dict: {"project": <serialized project dict>, "score": <int>, "match_explanation": <str>}
+    Uses Google Gemini to analyze a serialized project object.
+    Returns structured analysis with summary, missing_points, and suggestions.
     """
+    return _analysis_result(_call(*_analysis_request(project_data)))
 
-    ranked_projects = []
 
+async def analyze_project_with_gemini_async(project_data):
+    """analyze_project_with_gemini() for async views."""
+    return _analysis_result(await _call_async(*_analysis_request(project_data)))
+
+
+def _interest_tokens(interests):
     # Precompute interest keywords for heuristic fallback
     def tokenize(s):
         return [t for t in re.split(r"[^a-zA-Z0-9]+", s.lower()) if t]
 
     interest_tokens = tokenize(interests or "")
     # Remove very short tokens
-    interest_tokens = [t for t in interest_tokens if len(t) > 2]
+    return [t for t in interest_tokens if len(t) > 2]
 
-    for project in projects:
-        prompt = f"""
+
+def _score_request(project, interests):
+    prompt = f"""
         You are an expert project recommender.
         Given the user's interests: {interests}
         Rate how well this project matches those interests on a scale of 1 to 10.
@@ -135,29 +215,15 @@ def rank_projects_on_interests(projects, interests):
         {json.dumps(project, indent=2)}
         """
 
-        generation_config = genai.types.GenerationConfig(
-            response_mime_type="text/plain",
-            temperature=0.5
-        )
-
-        try:
-            response = model.generate_content(
-                prompt,
-                generation_config=generation_config
-            )
-
-            score_text = response.text.strip()
-            score = int(score_text)
+    generation_config = genai.types.GenerationConfig(
+        response_mime_type="text/plain",
+        temperature=0.5
+    )
+    return prompt, generation_config
 
-        except Exception as e:
-            # If parsing or API fails, fall back to score 0
-            print(f"Error calling Gemini API for ranking: {e}")
-            score = 0
 
-        # Request a brief explanation for why this project fits the interests
-        explanation = ""
-        try:
-            explain_prompt = f"""
+def _explanation_request(project, interests):
+    explain_prompt = f"""
             You are a concise recommender assistant.
             Given the user's interests: {interests}
             and the project data below, provide a very short (max 30 words) justification explaining why this project matches the user's interests.
@@ -165,85 +231,106 @@ def rank_projects_on_interests(projects, interests):
             Project data:
             {json.dumps(project, indent=2)}
             """
-            explain_config = genai.types.GenerationConfig(
-                response_mime_type="text/plain",
-                temperature=0.5,
-                max_output_tokens=60
-            )
-            explain_resp = model.generate_content(explain_prompt, generation_config=explain_config)
-            explanation = explain_resp.text.strip().replace('\n', ' ')
-            # Truncate to 200 chars just in case
-            if len(explanation) > 200:
-                explanation = explanation[:197] + '...'
-        except Exception as e:
-            print(f"Error calling Gemini API for explanation: {e}")
-            explanation = ""
-
-        # Heuristic fallback: if explanation is empty, generate a short deterministic justification
-        if not explanation:
-            # Collect matches between interest tokens and project fields
-            matches = []
-            combined_fields = " ".join(
-                str(project.get(k, "") or "") for k in ("name", "description", "city", "location")
-            ).lower()
-            for tok in interest_tokens:
-                if tok in combined_fields and tok not in matches:
-                    matches.append(tok)
+    explain_config = genai.types.GenerationConfig(
+        response_mime_type="text/plain",
+        temperature=0.5,
+        max_output_tokens=60
+    )
+    return explain_prompt, explain_config
 
-            if matches:
-                # Use up to 5 tokens in the explanation
-                explanation = f"Matches interests: mentions {', '.join(matches[:5])}."
-            else:
-                # Fallback to a generic but informative sentence using project metadata
-                # Prefer city or status when present
-                city = project.get('city') or ''
-                status = project.get('status') or ''
-                if city:
-                    explanation = f"Relevant to interests and located in {city}."
-                elif status:
-                    explanation = f"Relevant project in status '{status}'."
-                else:
-                    explanation = "Relevant to the requested interests."
-
-        # Final deterministic fallback: if explanation is still empty (very rare), use project name/description
-        if not explanation:
-            name = project.get('name') or 'this project'
-            desc = (project.get('description') or '').strip()
-            if desc:
-                short = desc if len(desc) <= 100 else desc[:97] + '...'
-                explanation = f"{name}: {short}"
-            else:
-                explanation = f"{name}: relevant to the requested interests."
 
-        # Ensure explanation is concise (max ~200 chars)
+def _ranked_entry(project, interest_tokens, score_response, explain_response):
+    """One ranked project from its score and explanation responses (or call errors)."""
+    try:
+        if isinstance(score_response, Exception):
+            raise score_response
+        score_text = score_response.text.strip()
+        score = int(score_text)
+
+    except Exception as e:
+        # If parsing or API fails, fall back to score 0
+        print(f"Error calling Gemini API for ranking: {e}")
+        score = 0
+
+    # A brief explanation for why this project fits the interests
+    explanation = ""
+    try:
+        if isinstance(explain_response, Exception):
+            raise explain_response
+        explanation = explain_response.text.strip().replace('\n', ' ')
+        # Truncate to 200 chars just in case
         if len(explanation) > 200:
             explanation = explanation[:197] + '...'
+    except Exception as e:
+        print(f"Error calling Gemini API for explanation: {e}")
+        explanation = ""
 
-        ranked_projects.append({"project": project, "score": score, "match_explanation": explanation})
+    # Heuristic fallback: if explanation is empty, generate a short deterministic justification
+    if not explanation:
+        # Collect matches between interest tokens and project fields
+        matches = []
+        combined_fields = " ".join(
+            str(project.get(k, "") or "") for k in ("name", "description", "city", "location")
+        ).lower()
+        for tok in interest_tokens:
+            if tok in combined_fields and tok not in matches:
+                matches.append(tok)
+
+        if matches:
+            # Use up to 5 tokens in the explanation
+            explanation = f"Matches interests: mentions {', '.join(matches[:5])}."
+        else:
+            # Fallback to a generic but informative sentence using project metadata
+            # Prefer city or status when present
+            city = project.get('city') or ''
+            status = project.get('status') or ''
+            if city:
+                explanation = f"Relevant to interests and located in {city}."
+            elif status:
+                explanation = f"Relevant project in status '{status}'."
+            else:
+                explanation = "Relevant to the requested interests."
+
+    # Final deterministic fallback: if explanation is still empty (very rare), use project name/description
+    if not explanation:
+        name = project.get('name') or 'this project'
+        desc = (project.get('description') or '').strip()
+        if desc:
+            short = desc if len(desc) <= 100 else desc[:97] + '...'
+            explanation = f"{name}: {short}"
+        else:
+            explanation = f"{name}: relevant to the requested interests."
 
-    # Sort projects by score in descending order
-    ranked_projects.sort(key=lambda x: x.get('score', 0), reverse=True)
+    # Ensure explanation is concise (max ~200 chars)
+    if len(explanation) > 200:
+        explanation = explanation[:197] + '...'
 
-    # Build an overall summary. Try to ask the model for a concise summary; if unavailable, create a heuristic summary.
-    overall_summary = ""
-    try:
-        # Prepare a compact prompt describing top projects and interests
-        top_projects_brief = json.dumps([{"id": p["project"].get('id'), "name": p["project"].get('name'), "score": p["score"]} for p in ranked_projects[:5]])
-        summary_prompt = f"""
+    return {"project": project, "score": score, "match_explanation": explanation}
+
+
+def _summary_request(ranked_projects, interests):
+    # Prepare a compact prompt describing top projects and interests
+    top_projects_brief = json.dumps([{"id": p["project"].get('id'), "name": p["project"].get('name'), "score": p["score"]} for p in ranked_projects[:5]])
+    summary_prompt = f"""
         You are an expert summarizer.
         Given the user's interests: {interests}
         And the top ranked projects (id, name, score): {top_projects_brief}
         Produce a 1-2 sentence summary describing why these projects match the user's interests and any common themes or recommendations. Keep it under 40 words.
         Return plain text only.
         """
-        summary_config = genai.types.GenerationConfig(response_mime_type="text/plain", temperature=0.5, max_output_tokens=80)
-        try:
-            summary_resp = model.generate_content(summary_prompt, generation_config=summary_config)
-            overall_summary = summary_resp.text.strip().replace('\n', ' ')
-            if len(overall_summary) > 240:
-                overall_summary = overall_summary[:237] + '...'
-        except Exception:
-            overall_summary = ''
+    summary_config = genai.types.GenerationConfig(response_mime_type="text/plain", temperature=0.5, max_output_tokens=80)
+    return summary_prompt, summary_config
+
+
+def _ranking_result(ranked_projects, interest_tokens, summary_response):
+    """The ranking with an overall summary, from the model or built heuristically."""
+    overall_summary = ""
+    try:
+        if isinstance(summary_response, Exception):
+            raise summary_response
+        overall_summary = summary_response.text.strip().replace('\n', ' ')
+        if len(overall_summary) > 240:
+            overall_summary = overall_summary[:237] + '...'
     except Exception:
         overall_summary = ''
 
@@ -268,3 +355,46 @@ def rank_projects_on_interests(projects, interests):
 
     # Return structured result with summary
     return {"ranked_projects": ranked_projects, "summary": overall_summary}
+
+
+def rank_projects_on_interests(projects, interests):
+    """
+    Ranks a list of projects based on how well they match the user's interests.
+    Uses Gemini to score each project and returns a sorted list.
+    Each returned item is a dict: {"project": <serialized project dict>, "score": <int>, "match_explanation": <str>}
+    """
+    interest_tokens = _interest_tokens(interests)
+
+    ranked_projects = []
+    for project in projects:
+        score_response = _call(*_score_request(project, interests))
+        explain_response = _call(*_explanation_request(project, interests))
+        ranked_projects.append(_ranked_entry(project, interest_tokens, score_response, explain_response))
+
+    # Sort projects by score in descending order
+    ranked_projects.sort(key=lambda x: x.get('score', 0), reverse=True)
+
+    # Build an overall summary. Try to ask the model for a concise summary; if unavailable, create a heuristic summary.
+    summary_response = _call(*_summary_request(ranked_projects, interests))
+    return _ranking_result(ranked_projects, interest_tokens, summary_response)
+
+
+async def rank_projects_on_interests_async(projects, interests):
+    """
+    rank_projects_on_interests() for async views: the score and explanation
+    calls for all projects run concurrently, bounded by LLM_MAX_CONCURRENCY.
+    """
+    interest_tokens = _interest_tokens(interests)
+
+    async def rank(project):
+        score_response, explain_response = await asyncio.gather(
+            _call_async(*_score_request(project, interests)),
+            _call_async(*_explanation_request(project, interests)),
+        )
+        return _ranked_entry(project, interest_tokens, score_response, explain_response)
+
+    ranked_projects = list(await asyncio.gather(*(rank(project) for project in projects)))
+    ranked_projects.sort(key=lambda x: x.get('score', 0), reverse=True)
+
+    summary_response = await _call_async(*_summary_request(ranked_projects, interests))
+    return _ranking_result(ranked_projects, interest_tokens, summary_response)
@@ -0,0 +1,50 @@
+import csv
+import logging
+import threading
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+_places = None
+_lock = threading.Lock()
+
+
+def _normalize(name):
+    return ' '.join((name or '').split()).casefold()
+
+
+def _load():
+    """
+    Read the offline gazetteer: a CSV with `name`, `latitude` and `longitude`
+    columns, one row per city or well-known place. Loaded once per process.
+    """
+    places = {}
+    path = getattr(settings, 'GAZETTEER_PATH', None)
+    if not path:
+        return places
+    try:
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                try:
+                    places[_normalize(row['name'])] = (float(row['latitude']), float(row['longitude']))
+                except (KeyError, TypeError, ValueError):
+                    continue
+    except FileNotFoundError:
+        logger.warning("Gazetteer file %s not found, projects will not be geocoded", path)
+    return places
+
+
+def lookup(*names):
+    """Coordinates of the first name found in the gazetteer, or None."""
+    global _places
+    if _places is None:
+        with _lock:
+            if _places is None:
+                _places = _load()
+    for name in names:
+        coords = _places.get(_normalize(name))
+        if coords:
+            return coords
+    return None
@@ -0,0 +1,136 @@
+import math
+
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+
+# Geohashes are stored as integers: 60 interleaved bits, the same as a
+# 12-character base32 geohash. A character-level prefix is then a contiguous
+# integer range, which any B-tree index can scan.
+GEOHASH_BITS = 60
+# Range scans one radius query may issue
+MAX_COVERING_CELLS = 16
+
+
+def encode_geohash(latitude, longitude, bits=GEOHASH_BITS):
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    value = 0
+    for i in range(bits):
+        # Even bits split longitude, odd bits latitude, as in textual geohashes
+        target, coord = (lon_range, longitude) if i % 2 == 0 else (lat_range, latitude)
+        mid = (target[0] + target[1]) / 2
+        value <<= 1
+        if coord >= mid:
+            value |= 1
+            target[0] = mid
+        else:
+            target[1] = mid
+    return value
+
+
+def _cell_size(chars):
+    """(height, width) in degrees of a geohash cell with `chars` base32 characters."""
+    bits = 5 * chars
+    lon_bits = (bits + 1) // 2
+    lat_bits = bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def _precision_for_radius(latitude, radius_km):
+    # The coarsest cells still cover the circle when taken with their eight
+    # neighbours, as long as a cell is at least `radius` tall and wide.
+    dlat = radius_km / KM_PER_DEGREE
+    dlon = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 1e-6))
+    chars = 0
+    while chars < GEOHASH_BITS // 5:
+        height, width = _cell_size(chars + 1)
+        if height < dlat or width < dlon:
+            break
+        chars += 1
+    return chars
+
+
+def covering_ranges(latitude, longitude, radius_km):
+    """
+    Half-open integer ranges of stored geohashes that contain every point
+    within `radius_km`. Returns None when the radius is so large that no
+    useful prefix exists and the caller should not filter at all.
+    """
+    min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius_km)
+    if min_lon is None:
+        return _neighbour_ranges(latitude, longitude, radius_km)
+
+    # The finest cells that tile the bounding box in at most MAX_COVERING_CELLS
+    # range scans; coarser cells would drag in rows far outside the circle
+    chars, cells = 0, []
+    while chars < GEOHASH_BITS // 5:
+        height, width = _cell_size(chars + 1)
+        rows = range(int((min_lat + 90.0) // height), int((min(max_lat, 90.0 - 1e-9) + 90.0) // height) + 1)
+        columns = range(int((min_lon + 180.0) // width), int((min(max_lon, 180.0 - 1e-9) + 180.0) // width) + 1)
+        if len(rows) * len(columns) > MAX_COVERING_CELLS:
+            break
+        chars += 1
+        cells = [
+            (-90.0 + (row + 0.5) * height, -180.0 + (column + 0.5) * width)
+            for row in rows for column in columns
+        ]
+    if chars == 0:
+        return None
+    return _merge(cells, chars)
+
+
+def _neighbour_ranges(latitude, longitude, radius_km):
+    # Near a pole or the antimeridian: the cell holding the centre and its
+    # eight neighbours, at a precision where they are sure to cover the circle
+    chars = _precision_for_radius(latitude, radius_km)
+    if chars == 0:
+        return None
+
+    height, width = _cell_size(chars)
+    points = []
+    for dlat in (-height, 0, height):
+        for dlon in (-width, 0, width):
+            lat = min(max(latitude + dlat, -90.0), 90.0 - 1e-9)
+            lon = (longitude + dlon + 180.0) % 360.0 - 180.0
+            points.append((lat, lon))
+    return _merge(points, chars)
+
+
+def _merge(points, chars):
+    """Sorted, coalesced ranges of the `chars`-character cells holding `points`."""
+    shift = GEOHASH_BITS - 5 * chars
+    ranges = []
+    for prefix in sorted({encode_geohash(lat, lon) >> shift for lat, lon in points}):
+        low, high = prefix << shift, (prefix + 1) << shift
+        if ranges and ranges[-1][1] == low:
+            ranges[-1] = (ranges[-1][0], high)
+        else:
+            ranges.append((low, high))
+    return ranges
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """
+    (min_lat, max_lat, min_lon, max_lon) in degrees of the smallest box holding
+    every point within `radius_km`. The longitude bounds are None when the box
+    reaches a pole or wraps around the antimeridian.
+    """
+    angle = radius_km / EARTH_RADIUS_KM
+    lat = math.radians(latitude)
+    min_lat, max_lat = lat - angle, lat + angle
+    if min_lat <= -math.pi / 2 or max_lat >= math.pi / 2:
+        return max(math.degrees(min_lat), -90.0), min(math.degrees(max_lat), 90.0), None, None
+    delta = math.degrees(math.asin(math.sin(angle) / math.cos(lat)))
+    if longitude - delta < -180.0 or longitude + delta > 180.0:
+        return math.degrees(min_lat), math.degrees(max_lat), None, None
+    return math.degrees(min_lat), math.degrees(max_lat), longitude - delta, longitude + delta
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
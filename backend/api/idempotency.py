@@ -0,0 +1,98 @@
+"""
+Idempotency-Key support for the write endpoints clients retry. The first
+request with a key runs the view and stores its response in the cache for
+IDEMPOTENCY_TTL seconds; a retry with the same key gets that response back
+(with Idempotent-Replayed: true) for one cache read, without running the
+view again.
+
+Keys belong to the client that sent them (a user, or an IP when anonymous)
+and to one view. Reusing a key with a different body is a 422. While the
+first request is still running, a short lock in the cache turns concurrent
+duplicates away with a 409 and Retry-After. Server errors are not stored, so
+retrying them runs the view again. Keys are only accepted on JSON bodies,
+whose raw bytes are fingerprinted.
+
+Responses and locks must be visible to every worker, so the feature needs a
+shared cache: IDEMPOTENCY_ENABLED is on by default only with REDIS_URL.
+With the per-process LocMem cache a retry reaching another worker would run
+the write again; turn it on there only for single-process deployments.
+While disabled the header is ignored.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+from rest_framework.throttling import BaseThrottle
+
+from .renderers import dumps
+from .throttling import client_key
+
+try:
+    from orjson import loads
+except ImportError:
+    from json import loads
+
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+KEY_PREFIX = 'idempotency:'
+MAX_KEY_LENGTH = 255
+
+
+def fingerprint(request):
+    """Digest of what makes a retry the same request: method, path and body."""
+    digest = hashlib.sha256(f'{request.method} {request.path}\n'.encode())
+    digest.update(request.body)
+    return digest.digest()[:16]
+
+
+def cache_key(request, view_name, key):
+    _, client = client_key(request, BaseThrottle().get_ident(request))
+    key_digest = hashlib.sha256(key.encode()).hexdigest()[:32]
+    return f'{KEY_PREFIX}{client}:{view_name}:{key_digest}'
+
+
+def replay(stored):
+    _, status, content = stored
+    response = Response(loads(content) if content else None, status=status)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(view):
+    """Honour the Idempotency-Key header on a view taking a DRF request."""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.META.get(HEADER)
+        if key is None or not settings.IDEMPOTENCY_ENABLED:
+            return view(request, *args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return Response({"error": f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters"}, status=400)
+        if request.content_type != 'application/json':
+            return Response({"error": "Idempotency-Key is only supported with JSON bodies"}, status=400)
+
+        stored_key = cache_key(request, view.__name__, key)
+        request_digest = fingerprint(request)
+        stored = cache.get(stored_key)
+        if stored is not None:
+            if stored[0] != request_digest:
+                return Response({"error": "Idempotency-Key was already used for a different request"}, status=422)
+            return replay(stored)
+
+        lock_key = stored_key + ':lock'
+        if not cache.add(lock_key, 1, timeout=settings.IDEMPOTENCY_LOCK_SECONDS):
+            response = Response({"error": "A request with this Idempotency-Key is in progress"}, status=409)
+            response['Retry-After'] = '1'
+            return response
+        try:
+            response = view(request, *args, **kwargs)
+            if response.status_code < 500:
+                content = dumps(response.data) if response.data is not None else b''
+                cache.set(stored_key, (request_digest, response.status_code, content), timeout=settings.IDEMPOTENCY_TTL)
+            return response
+        finally:
+            cache.delete(lock_key)
+
+    return wrapper
@@ -0,0 +1,201 @@
+"""
+Bulk import of projects from municipal data feeds (CSV or JSONL).
+
+Rows are parsed as a stream, validated one by one and written in batches:
+each batch is a bulk INSERT ... ON CONFLICT (external_id) DO UPDATE per set of
+columns its rows carry (an update only touches the columns a row has), in its
+own transaction, after which the facet counts, the autocomplete index and
+the duplicate-detection signatures are updated once for the whole batch.
+Invalid rows are reported, not fatal.
+"""
+import csv
+import io
+import json
+from collections import Counter
+from itertools import islice
+
+from django.db import transaction
+from rest_framework import serializers
+
+from . import duplicates, facets, gazetteer
+from .autocomplete import index as autocomplete_index
+from .models import Project
+from .serializers import CreateProjectSerializer
+
+
+FORMATS = ('csv', 'jsonl')
+DEFAULT_BATCH_SIZE = 500
+# Columns an import may overwrite on a project it already has
+UPSERT_FIELDS = ['name', 'description', 'city', 'location', 'status', 'latitude', 'longitude', 'geohash']
+
+
+def _max_length(field):
+    return Project._meta.get_field(field).max_length
+
+
+class ImportProjectSerializer(CreateProjectSerializer):
+    # The model's limits, so an oversized value is reported instead of failing the batch's INSERT
+    name = serializers.CharField(max_length=_max_length('name'))
+    city = serializers.CharField(max_length=_max_length('city'))
+    external_id = serializers.CharField(max_length=_max_length('external_id'), required=False, allow_null=True)
+    status = serializers.CharField(max_length=_max_length('status'), required=False)
+
+
+def detect_format(filename='', content_type=''):
+    name = (filename or '').lower()
+    if name.endswith('.csv') or content_type.startswith('text/csv'):
+        return 'csv'
+    if name.endswith(('.jsonl', '.ndjson')) or content_type.startswith(('application/x-ndjson', 'application/jsonl')):
+        return 'jsonl'
+    return None
+
+
+def read_rows(stream, fmt):
+    """
+    Yield (line number, row dict or None, parse error or None) from a binary
+    stream. Empty CSV cells count as missing values.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, {key: value for key, value in row.items() if key and value not in ('', None)}, None
+        return
+
+    for number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            yield number, None, f"Invalid JSON: {exc}"
+            continue
+        if not isinstance(row, dict):
+            yield number, None, "Each line must be a JSON object"
+            continue
+        yield number, row, None
+
+
+class ImportReport:
+    MAX_ERRORS = 1000
+
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors = []
+
+    def error(self, line, external_id, errors):
+        self.failed += 1
+        if len(self.errors) < self.MAX_ERRORS:
+            self.errors.append({'line': line, 'external_id': external_id, 'errors': errors})
+
+    def as_dict(self):
+        return {
+            'created': self.created,
+            'updated': self.updated,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+        }
+
+
+def upsert_fields(data):
+    """The UPSERT_FIELDS a validated row sets; an update leaves the others alone."""
+    fields = [name for name in UPSERT_FIELDS if name in data]
+    if 'latitude' in data:
+        fields.append('geohash')
+    return tuple(fields)
+
+
+def build_project(data, author):
+    if 'latitude' not in data:
+        coords = gazetteer.lookup(data['location'], data['city'])
+        if coords:
+            data['latitude'], data['longitude'] = coords
+    project = Project(author=author, **data)
+    project.update_geohash()
+    return project
+
+
+def import_projects(rows, author=None, batch_size=DEFAULT_BATCH_SIZE, report=None):
+    """
+    Validate and upsert (line, row, parse error) tuples as produced by
+    read_rows(). Returns the ImportReport; `author` owns newly created projects.
+    """
+    report = report or ImportReport()
+    validator = ImportProjectSerializer()
+    rows = iter(rows)
+    while batch := list(islice(rows, batch_size)):
+        projects = {}
+        anonymous = []
+        for line, row, parse_error in batch:
+            if parse_error:
+                report.error(line, None, {'non_field_errors': [parse_error]})
+                continue
+            try:
+                data = validator.run_validation(row)
+            except serializers.ValidationError as exc:
+                report.error(line, row.get('external_id'), exc.detail)
+                continue
+            # Taken before geocoding: looked-up coordinates only fill in new projects
+            fields = upsert_fields(data)
+            project = build_project(data, author)
+            project._upsert_fields = fields
+            if project.external_id:
+                # A feed listing the same id twice in a batch: the last row wins
+                projects[project.external_id] = project
+            else:
+                anonymous.append(project)
+        if projects or anonymous:
+            _write_batch(list(projects.values()) + anonymous, report)
+    return report
+
+
+def _write_batch(projects, report):
+    external_ids = [project.external_id for project in projects if project.external_id]
+    with transaction.atomic():
+        existing = {
+            row['external_id']: row
+            for row in Project.objects.filter(external_id__in=external_ids)
+            .values('external_id', 'city', 'status', 'is_deleted')
+        }
+        # One upsert per set of columns the rows carry, so none overwrites
+        # a column its row left out
+        groups = {}
+        for project in projects:
+            groups.setdefault(project._upsert_fields, []).append(project)
+        for fields, group in groups.items():
+            Project.objects.bulk_create(
+                group,
+                update_conflicts=True,
+                unique_fields=['external_id'],
+                update_fields=list(fields),
+            )
+
+        deltas = Counter()
+        for project in projects:
+            old = existing.get(project.external_id)
+            if old is None:
+                deltas[(project.city, project.status)] += 1
+            elif not old['is_deleted']:
+                status = project.status if 'status' in project._upsert_fields else old['status']
+                deltas[(old['city'], old['status'])] -= 1
+                deltas[(project.city, status)] += 1
+        facets.apply(deltas)
+        report.created += len(projects) - len(existing)
+        report.updated += len(existing)
+
+        # Upserted rows do not reliably get their pk back, look them up
+        live = Project.live.filter(external_id__in=external_ids).values_list('id', 'name', 'description', 'city')
+        rows = list(live) + [
+            (project.pk, project.name, project.description, project.city)
+            for project in projects if not project.external_id
+        ]
+        # bulk_create sends no post_save, so signals.project_saved does not index these
+        duplicates.index_projects([row for row in rows if row[0] is not None])
+        entries = [(pk, name, city) for pk, name, _, city in rows]
+        if any(pk is None for pk, _, _ in entries):
+            transaction.on_commit(autocomplete_index.invalidate)
+        else:
+            transaction.on_commit(lambda: autocomplete_index.update_projects(entries))
@@ -0,0 +1,86 @@
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+_current = ContextVar('api_request_stats', default=None)
+
+_IN_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """SQL with variable-length IN lists collapsed, so repeats of one query compare equal."""
+    return _WHITESPACE.sub(' ', _IN_LIST.sub('(?)', sql)).strip()
+
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view = None
+        self.query_count = 0
+        self.db_time = 0.0
+        self.fingerprints = Counter()
+        self.spans = {}
+
+    def add_span(self, name, seconds):
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def duplicates(self, threshold):
+        return [(sql, count) for sql, count in self.fingerprints.most_common() if count >= threshold]
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+def current_stats():
+    return _current.get()
+
+
+def start_request():
+    stats = RequestStats()
+    return stats, _current.set(stats)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+@contextmanager
+def span(name):
+    """Time a block (serialization, LLM calls...) into the current request's stats."""
+    stats = _current.get()
+    if stats is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.add_span(name, time.perf_counter() - start)
+
+
+def record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.query_count += 1
+        stats.db_time += time.perf_counter() - start
+        stats.fingerprints[fingerprint(sql)] += 1
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """
+    connection_created receiver. The wrapper stays on the connection object
+    and reads the request through a context variable, so queries run from
+    sync_to_async threads are attributed to the right request too.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
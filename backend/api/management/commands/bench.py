@@ -0,0 +1,259 @@
+import json
+import logging
+import platform
+import re
+import statistics
+import subprocess
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError
+from urllib.request import HTTPCookieProcessor, Request, build_opener
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+
+from api.models import Comment, ParticipationRequest, Project, User, Vote
+
+from .seed_data import SEED_PASSWORD
+
+
+_QUERIES = re.compile(r'db;dur=[\d.]+;desc="(\d+) queries"')
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+@contextmanager
+def quiet_request_timing():
+    """Keep api.timing's per-request log lines out of a benchmark's report."""
+    logger = logging.getLogger('api.timing')
+    disabled, logger.disabled = logger.disabled, True
+    try:
+        yield
+    finally:
+        logger.disabled = disabled
+
+
+def check_not_throttled(statuses):
+    """
+    In-process runs switch api.throttling off, a live server has to be
+    started with THROTTLE_ENABLED=0 itself; measuring its 429s is pointless.
+    """
+    if '429' in statuses:
+        raise CommandError("The server throttled the benchmark (HTTP 429), run it with THROTTLE_ENABLED=0")
+
+
+class TestClientDriver:
+    """Runs requests in-process through the Django test client."""
+
+    def __init__(self, host, username):
+        self.client = Client(SERVER_NAME=host)
+        self.client.force_login(User.objects.get(username=username))
+
+    def request(self, method, path, body=None):
+        response = getattr(self.client, method.lower())(
+            path, data=json.dumps(body) if body is not None else '', content_type='application/json',
+        )
+        return response.status_code, response.get('Server-Timing', '')
+
+
+class HttpDriver:
+    """Runs requests against a live server, logging in as a seeded user."""
+
+    def __init__(self, base_url, username):
+        self.base_url = base_url.rstrip('/')
+        self.cookies = CookieJar()
+        self.opener = build_opener(HTTPCookieProcessor(self.cookies))
+        self.request('GET', '/api/ping/')
+        status, _ = self.request('POST', '/api/login/', {'username': username, 'password': SEED_PASSWORD})
+        if status != 200:
+            raise CommandError(f"Could not log in as {username} (HTTP {status})")
+
+    def request(self, method, path, body=None):
+        headers = {'Content-Type': 'application/json'}
+        csrf = next((cookie.value for cookie in self.cookies if cookie.name == 'csrftoken'), None)
+        if csrf:
+            headers['X-CSRFToken'] = csrf
+            headers['Referer'] = self.base_url + '/'
+        data = json.dumps(body).encode() if body is not None else None
+        req = Request(self.base_url + path, data=data, method=method, headers=headers)
+        try:
+            with self.opener.open(req) as response:
+                response.read()
+                return response.status, response.headers.get('Server-Timing', '')
+        except HTTPError as error:
+            error.read()
+            return error.code, error.headers.get('Server-Timing', '')
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the main API endpoints and report throughput, latency percentiles "
+        "and query counts per endpoint. Use on a database filled by seed_data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help="Requests per endpoint")
+        parser.add_argument('--warmup', type=int, default=3, help="Unmeasured requests per endpoint")
+        parser.add_argument(
+            '--base-url',
+            help="Benchmark a running server, started with THROTTLE_ENABLED=0, instead of the in-process test client",
+        )
+        parser.add_argument('--host', default='localhost', help="Host header for the test client")
+        parser.add_argument('--only', nargs='*', help="Endpoint names to run")
+        parser.add_argument('--output', help="Write results to this JSON file")
+        parser.add_argument('--compare', help="Print the change against an earlier JSON result")
+
+    # Measure the server, not api.throttling turning the benchmark away; this
+    # only reaches the test client, see check_not_throttled for --base-url
+    @override_settings(THROTTLE_ENABLED=False)
+    @quiet_request_timing()
+    def handle(self, *args, **options):
+        author_id = Project.objects.values_list('author_id', flat=True).filter(
+            author__username__startswith='seed_user_',
+        ).first()
+        if author_id is None:
+            raise CommandError("No seeded data found, run seed_data first")
+        user = User.objects.get(pk=author_id)
+
+        if options['base_url']:
+            driver = HttpDriver(options['base_url'], user.username)
+        else:
+            driver = TestClientDriver(options['host'], user.username)
+
+        endpoints = self.endpoints(user)
+        if options['only']:
+            endpoints = [e for e in endpoints if e[0] in options['only']]
+
+        results = {}
+        for name, calls in endpoints:
+            results[name] = self.run(driver, calls, options['requests'], options['warmup'])
+            self.print_row(name, results[name])
+            check_not_throttled(results[name]['statuses'])
+
+        report = {
+            'meta': self.meta(options),
+            'endpoints': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+        if options['compare']:
+            with open(options['compare']) as f:
+                self.print_comparison(json.load(f), report)
+
+    def endpoints(self, user):
+        """(name, requests) pairs; an endpoint's measured requests cycle through its list."""
+        project = Project.objects.filter(author=user).first()
+        busy = Project.objects.annotate(vote_count=Count('votes')).order_by('-vote_count').first()
+        city = project.city
+        term = project.name.split()[0].lower()
+
+        def vote(project_id):
+            # Alternate so each round trip performs a real write
+            return [
+                ('POST', f'/api/vote/{project_id}/', {'value': 1}),
+                ('DELETE', f'/api/vote/{project_id}/', None),
+            ]
+
+        return [
+            ('projects_list', [('GET', '/api/projects/', None)]),
+            ('projects_city', [('GET', f'/api/projects/?city={city}', None)]),
+            ('projects_search', [('GET', f'/api/projects/?search={term}', None)]),
+            ('projects_near', [('GET', '/api/projects/?near=54.6872,25.2797&radius=5', None)]),
+            ('project_detail', [('GET', f'/api/projects/{busy.id}', None)]),
+            ('project_comments', [('GET', f'/api/comments/{busy.id}/', None)]),
+            ('project_facets', [('GET', '/api/projects/facets/', None)]),
+            ('autocomplete', [('GET', f'/api/autocomplete/?q={term[:3]}', None)]),
+            ('vote', vote(busy.id)),
+            ('participation_inbox', [('GET', '/api/participation_requests/inbox/', None)]),
+            ('my_participation_requests', [('GET', '/api/my_participation_requests/', None)]),
+        ]
+
+    def run(self, driver, calls, count, warmup):
+        for i in range(warmup):
+            driver.request(*calls[i % len(calls)])
+
+        latencies, queries, statuses = [], [], {}
+        started = time.perf_counter()
+        for i in range(warmup, warmup + count):
+            method, path, body = calls[i % len(calls)]
+            start = time.perf_counter()
+            status, server_timing = driver.request(method, path, body)
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            match = _QUERIES.search(server_timing)
+            if match:
+                queries.append(int(match.group(1)))
+        elapsed = time.perf_counter() - started
+
+        return {
+            'requests': count,
+            'throughput_rps': round(count / elapsed, 2) if elapsed else None,
+            'latency_ms': {
+                'mean': round(statistics.fmean(latencies), 3),
+                'p50': round(percentile(latencies, 0.50), 3),
+                'p95': round(percentile(latencies, 0.95), 3),
+                'p99': round(percentile(latencies, 0.99), 3),
+                'max': round(max(latencies), 3),
+            },
+            'queries': {
+                'mean': round(statistics.fmean(queries), 2) if queries else None,
+                'max': max(queries) if queries else None,
+            },
+            'statuses': statuses,
+        }
+
+    def meta(self, options):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, cwd=settings.BASE_DIR,
+            ).stdout.strip() or None
+        except OSError:
+            commit = None
+        return {
+            'commit': commit,
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'mode': 'http' if options['base_url'] else 'test_client',
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'requests_per_endpoint': options['requests'],
+            'dataset': {
+                'users': User.objects.count(),
+                'projects': Project.objects.count(),
+                'votes': Vote.objects.count(),
+                'comments': Comment.objects.count(),
+                'participation_requests': ParticipationRequest.objects.count(),
+            },
+        }
+
+    def print_row(self, name, result):
+        latency = result['latency_ms']
+        self.stdout.write(
+            f"{name:28} {result['throughput_rps']:>9} req/s  "
+            f"p50 {latency['p50']:>8.2f}  p95 {latency['p95']:>8.2f}  p99 {latency['p99']:>8.2f} ms  "
+            f"queries {result['queries']['max']}  {result['statuses']}"
+        )
+
+    def print_comparison(self, before, after):
+        self.stdout.write(f"\nChange since {before['meta'].get('commit') or before['meta']['timestamp']}:")
+        for name, result in after['endpoints'].items():
+            old = before['endpoints'].get(name)
+            if not old:
+                continue
+            old_p95, new_p95 = old['latency_ms']['p95'], result['latency_ms']['p95']
+            change = (new_p95 - old_p95) / old_p95 * 100 if old_p95 else 0.0
+            self.stdout.write(
+                f"{name:28} p95 {old_p95:>8.2f} -> {new_p95:>8.2f} ms ({change:+.1f}%)  "
+                f"queries {old['queries']['max']} -> {result['queries']['max']}"
+            )
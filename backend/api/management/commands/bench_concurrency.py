@@ -0,0 +1,215 @@
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from asgiref.sync import ThreadSensitiveContext
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client, override_settings
+
+from api.models import Project, User
+
+from .bench import HttpDriver, check_not_throttled, percentile, quiet_request_timing
+
+
+ENDPOINTS = {
+    'ai_feedback': '/api/ai_feedback/{project_id}/',
+    'project_detail': '/api/projects/{project_id}',
+    'comments': '/api/comments/{project_id}/',
+}
+
+
+class SimulatedModel:
+    """LLM client stand-in whose every call takes `latency` seconds, like a slow upstream."""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def generate_content(self, prompt, generation_config=None):
+        time.sleep(self.latency)
+        return self.reply(prompt)
+
+    async def generate_content_async(self, prompt, generation_config=None):
+        await asyncio.sleep(self.latency)
+        return self.reply(prompt)
+
+    def reply(self, prompt):
+        text = '{"summary": "simulated", "missing_points": [], "suggestions": []}' if 'JSON object' in prompt else '5'
+        return type('Response', (), {'text': text})()
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare how many concurrent clients the WSGI deployment (sync DRF views, "
+        "a fixed pool of worker threads) and the ASGI one (api.async_views on an "
+        "event loop) serve, by default on /api/ai_feedback/ with a simulated LLM "
+        "latency. In-process runs each deployment in its own subprocess; with "
+        "--base-url it measures a running server instead (run it once against "
+        "gunicorn and once against uvicorn). Use on a database filled by seed_data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=('both', 'wsgi', 'asgi'), default='both')
+        parser.add_argument('--endpoint', choices=list(ENDPOINTS), default='ai_feedback')
+        parser.add_argument('--clients', type=int, default=200, help="Concurrent clients")
+        parser.add_argument('--requests', type=int, default=2, help="Requests per client")
+        parser.add_argument('--workers', type=int, default=8, help="WSGI worker threads (e.g. gunicorn --threads)")
+        parser.add_argument(
+            '--llm-latency', type=float, default=0.5,
+            help="Seconds per simulated LLM call in-process; 0 calls the real model",
+        )
+        parser.add_argument(
+            '--base-url', help="Benchmark a running server, started with THROTTLE_ENABLED=0, instead of running in-process",
+        )
+        parser.add_argument('--output', help="Write results to this JSON file")
+
+    # Only reaches in-process runs, see check_not_throttled for --base-url
+    @override_settings(THROTTLE_ENABLED=False)
+    @quiet_request_timing()
+    def handle(self, *args, **options):
+        user = User.objects.filter(username__startswith='seed_user_').order_by('id').first()
+        project_id = Project.objects.order_by('id').values_list('id', flat=True).first()
+        if user is None or project_id is None:
+            raise CommandError("No seeded data found, run seed_data first")
+        path = ENDPOINTS[options['endpoint']].format(project_id=project_id)
+
+        if options['base_url']:
+            results = {options['mode']: self.run_http(options, user, path)}
+            check_not_throttled(results[options['mode']]['statuses'])
+        elif options['mode'] == 'both':
+            results = {mode: self.run_subprocess(mode, options) for mode in ('wsgi', 'asgi')}
+        else:
+            results = {options['mode']: self.run_in_process(options, user, path)}
+
+        for mode, result in results.items():
+            latency = result['latency_ms']
+            self.stdout.write(
+                f"{mode}: {result['requests_per_s']} req/s  p50 {latency['p50']:.0f}  "
+                f"p95 {latency['p95']:.0f}  p99 {latency['p99']:.0f} ms  {result['statuses']}"
+            )
+        if {'wsgi', 'asgi'} <= results.keys() and results['wsgi']['requests_per_s']:
+            ratio = results['asgi']['requests_per_s'] / results['wsgi']['requests_per_s']
+            self.stdout.write(self.style.SUCCESS(f"ASGI serves {ratio:.1f}x the requests per second"))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    def run_subprocess(self, mode, options):
+        # The URLconf picks the views at import time, so each deployment needs its own process
+        with tempfile.NamedTemporaryFile(suffix='.json') as output:
+            command = [
+                sys.executable, sys.argv[0], 'bench_concurrency', '--mode', mode,
+                '--endpoint', options['endpoint'], '--clients', str(options['clients']),
+                '--requests', str(options['requests']), '--workers', str(options['workers']),
+                '--llm-latency', str(options['llm_latency']), '--output', output.name,
+            ]
+            env = {**os.environ, 'API_ASYNC_VIEWS': '1' if mode == 'asgi' else '0'}
+            subprocess.run(command, env=env, check=True, stdout=subprocess.DEVNULL)
+            return json.load(output)[mode]
+
+    def run_in_process(self, options, user, path):
+        if settings.API_ASYNC_VIEWS != (options['mode'] == 'asgi'):
+            raise CommandError(f"Run --mode {options['mode']} with API_ASYNC_VIEWS={int(options['mode'] == 'asgi')}")
+        login = Client()
+        login.force_login(user)
+        cookies = login.cookies
+
+        patch = mock.patch('api.feedback_ai.model', SimulatedModel(options['llm_latency']))
+        if options['llm_latency'] > 0:
+            patch.start()
+        try:
+            # The test clients send Host: testserver, as under the test runner
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                if options['mode'] == 'asgi':
+                    return asyncio.run(self.run_asgi(options, cookies, path))
+                return self.run_wsgi(options, cookies, path)
+        finally:
+            if options['llm_latency'] > 0:
+                patch.stop()
+
+    def run_wsgi(self, options, cookies, path):
+        # Clients queue for one of `workers` threads, as they would for gunicorn's
+        workers = threading.Semaphore(options['workers'])
+
+        def client(samples):
+            http = Client()
+            http.cookies = cookies
+            try:
+                for _ in range(options['requests']):
+                    began = time.perf_counter()
+                    with workers:
+                        status = http.get(path).status_code
+                    samples.append(((time.perf_counter() - began) * 1000, status))
+            finally:
+                connections.close_all()
+
+        return self.run_threads(options, client)
+
+    async def run_asgi(self, options, cookies, path):
+        samples = []
+
+        async def client():
+            http = AsyncClient()
+            http.cookies = cookies
+            for _ in range(options['requests']):
+                began = time.perf_counter()
+                # ASGIHandler gives every request its own thread for sync work; the test client does not
+                async with ThreadSensitiveContext():
+                    status = (await http.get(path)).status_code
+                samples.append(((time.perf_counter() - began) * 1000, status))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(options['clients'])))
+        return self.summarize(samples, time.perf_counter() - started)
+
+    def run_http(self, options, user, path):
+        drivers = [HttpDriver(options['base_url'], user.username) for _ in range(options['clients'])]
+        drivers.reverse()
+
+        def client(samples):
+            driver = drivers.pop()
+            for _ in range(options['requests']):
+                began = time.perf_counter()
+                status, _ = driver.request('GET', path)
+                samples.append(((time.perf_counter() - began) * 1000, status))
+
+        return self.run_threads(options, client)
+
+    def run_threads(self, options, client):
+        samples = []
+        threads = [threading.Thread(target=client, args=(samples,)) for _ in range(options['clients'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return self.summarize(samples, time.perf_counter() - started)
+
+    def summarize(self, samples, elapsed):
+        """Throughput, latency percentiles and status counts from (ms, status) samples."""
+        latencies = [ms for ms, _ in samples]
+        statuses = {}
+        for _, status in samples:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        return {
+            'requests': len(latencies),
+            'elapsed_s': round(elapsed, 3),
+            'requests_per_s': round(len(latencies) / elapsed, 2) if elapsed else None,
+            'latency_ms': {
+                'mean': round(statistics.fmean(latencies), 1) if latencies else None,
+                'p50': round(percentile(latencies, 0.50), 1),
+                'p95': round(percentile(latencies, 0.95), 1),
+                'p99': round(percentile(latencies, 0.99), 1),
+            },
+            'statuses': statuses,
+        }
@@ -0,0 +1,93 @@
+import gzip
+import io
+import json
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from api.models import Project
+from api.renderers import FastJSONParser, FastJSONRenderer, orjson
+from api.serializers import ProjectSerializer
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def best_of(repeat, func):
+    """Fastest of `repeat` runs in ms, the least noisy estimate of the cost."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings), result
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare DRF's JSON renderer and parser with the orjson ones, and the "
+        "bytes on the wire with gzip and brotli, for a large /api/projects/ payload "
+        "built from the projects in the database. Use on a database filled by seed_data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--projects', type=int, default=10000, help="Projects in the payload")
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--output', help="Write results to this JSON file")
+
+    def handle(self, *args, **options):
+        count = options['projects']
+        request = APIRequestFactory().get('/api/projects/')
+        request.user = AnonymousUser()
+        projects = Project.live.with_stats()[:count]
+        rows = list(ProjectSerializer(projects, many=True, context={'request': request}).data)
+        if not rows:
+            raise CommandError("No projects found, run seed_data first")
+        # Repeat what there is up to the requested size
+        payload = [{**rows[i % len(rows)], 'id': i + 1} for i in range(count)]
+        repeat = options['repeat']
+
+        results = {'projects': count, 'orjson': orjson is not None, 'render_ms': {}, 'parse_ms': {}, 'bytes': {}}
+
+        stdlib_ms, stdlib_body = best_of(repeat, lambda: JSONRenderer().render(payload))
+        fast_ms, fast_body = best_of(repeat, lambda: FastJSONRenderer().render(payload))
+        if json.loads(stdlib_body) != json.loads(fast_body):
+            raise CommandError("Renderers disagree on the payload")
+        results['render_ms'] = {'drf': round(stdlib_ms, 2), 'fast': round(fast_ms, 2)}
+
+        results['parse_ms'] = {
+            'drf': round(best_of(repeat, lambda: JSONParser().parse(io.BytesIO(stdlib_body)))[0], 2),
+            'fast': round(best_of(repeat, lambda: FastJSONParser().parse(io.BytesIO(stdlib_body)))[0], 2),
+        }
+
+        results['bytes']['identity'] = len(fast_body)
+        for level in (1, 6, 9):
+            ms, body = best_of(repeat, lambda: gzip.compress(fast_body, compresslevel=level))
+            results['bytes'][f'gzip-{level}'] = {'bytes': len(body), 'ms': round(ms, 2)}
+        if brotli is not None:
+            for quality in (1, 5, 11):
+                ms, body = best_of(1 if quality == 11 else repeat, lambda: brotli.compress(fast_body, quality=quality))
+                results['bytes'][f'br-{quality}'] = {'bytes': len(body), 'ms': round(ms, 2)}
+
+        self.stdout.write(
+            f"Render {count} projects: DRF {results['render_ms']['drf']} ms, "
+            f"fast {results['render_ms']['fast']} ms{'' if orjson else ' (orjson not installed)'}"
+        )
+        self.stdout.write(f"Parse: DRF {results['parse_ms']['drf']} ms, fast {results['parse_ms']['fast']} ms")
+        self.stdout.write(f"Body: {results['bytes']['identity']} bytes uncompressed")
+        for name, result in results['bytes'].items():
+            if name != 'identity':
+                ratio = result['bytes'] / results['bytes']['identity']
+                self.stdout.write(f"  {name:8} {result['bytes']:>10} bytes ({ratio:.1%})  {result['ms']:>8.2f} ms")
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
@@ -0,0 +1,139 @@
+import json
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import override_settings
+
+from api.models import Project, User, Vote
+
+from .bench import HttpDriver, TestClientDriver, check_not_throttled, percentile, quiet_request_timing
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure vote_for_project write throughput with concurrent voters, each "
+        "logged in as a different seeded user. Run it once per database setup "
+        "(SQLite defaults vs WAL, Postgres with persistent connections vs pooling) "
+        "and compare the reports. Use on a database filled by seed_data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help="Concurrent voters")
+        parser.add_argument('--duration', type=float, default=10.0, help="Seconds to run")
+        parser.add_argument(
+            '--contention', choices=('hot', 'spread'), default='hot',
+            help="hot: everyone votes on one project; spread: each voter has its own",
+        )
+        parser.add_argument(
+            '--base-url',
+            help="Benchmark a running server, started with THROTTLE_ENABLED=0, instead of the in-process test client",
+        )
+        parser.add_argument('--host', default='localhost', help="Host header for the test client")
+        parser.add_argument('--output', help="Write results to this JSON file")
+
+    # Only reaches the test client, see check_not_throttled for --base-url
+    @override_settings(THROTTLE_ENABLED=False)
+    @quiet_request_timing()
+    def handle(self, *args, **options):
+        threads = options['threads']
+        users = list(User.objects.filter(username__startswith='seed_user_').order_by('id')[:threads])
+        projects = list(Project.objects.order_by('id').values_list('id', flat=True)[:threads])
+        if len(users) < threads or not projects:
+            raise CommandError(f"Need {threads} seeded users and some projects, run seed_data first")
+        if options['contention'] == 'hot':
+            projects = projects[:1] * threads
+
+        # Every voter starts from "not voted", so the first POST creates a row
+        Vote.objects.filter(user__in=users, project_id__in=set(projects)).delete()
+
+        if options['base_url']:
+            drivers = [HttpDriver(options['base_url'], user.username) for user in users]
+        else:
+            drivers = [TestClientDriver(options['host'], user.username) for user in users]
+
+        results = [None] * threads
+        start = threading.Barrier(threads + 1)
+        deadline = []
+
+        def voter(i):
+            latencies, statuses = [], {}
+            calls = [
+                ('POST', f'/api/vote/{projects[i]}/', {'value': 1}),
+                ('DELETE', f'/api/vote/{projects[i]}/', None),
+            ]
+            start.wait()
+            try:
+                n = 0
+                while time.perf_counter() < deadline[0]:
+                    began = time.perf_counter()
+                    status, _ = drivers[i].request(*calls[n % 2])
+                    latencies.append((time.perf_counter() - began) * 1000)
+                    statuses[str(status)] = statuses.get(str(status), 0) + 1
+                    n += 1
+            finally:
+                connections.close_all()
+            results[i] = (latencies, statuses)
+
+        workers = [threading.Thread(target=voter, args=(i,)) for i in range(threads)]
+        for worker in workers:
+            worker.start()
+        deadline.append(time.perf_counter() + options['duration'])
+        start.wait()
+        for worker in workers:
+            worker.join()
+
+        latencies = [ms for thread_latencies, _ in results for ms in thread_latencies]
+        statuses = {}
+        for _, thread_statuses in results:
+            for status, count in thread_statuses.items():
+                statuses[status] = statuses.get(status, 0) + count
+        check_not_throttled(statuses)
+        succeeded = sum(count for status, count in statuses.items() if status.startswith('2'))
+
+        report = {
+            'setup': self.describe_setup(options),
+            'threads': threads,
+            'contention': options['contention'],
+            'duration_s': options['duration'],
+            'writes': len(latencies),
+            'successful_writes_per_s': round(succeeded / options['duration'], 2),
+            'latency_ms': {
+                'mean': round(statistics.fmean(latencies), 3) if latencies else None,
+                'p50': round(percentile(latencies, 0.50), 3),
+                'p95': round(percentile(latencies, 0.95), 3),
+                'p99': round(percentile(latencies, 0.99), 3),
+                'max': round(max(latencies), 3) if latencies else None,
+            },
+            'statuses': statuses,
+        }
+
+        self.stdout.write(json.dumps(report['setup']))
+        self.stdout.write(
+            f"{threads} voters ({options['contention']}): {report['successful_writes_per_s']} writes/s  "
+            f"p50 {report['latency_ms']['p50']:.2f}  p95 {report['latency_ms']['p95']:.2f}  "
+            f"p99 {report['latency_ms']['p99']:.2f} ms  {statuses}"
+        )
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    def describe_setup(self, options):
+        """The database settings that matter for write concurrency, as seen by this process."""
+        settings_dict = connection.settings_dict
+        setup = {
+            'mode': 'http' if options['base_url'] else 'test_client',
+            'database': connection.vendor,
+            'conn_max_age': settings_dict.get('CONN_MAX_AGE'),
+            'pool': bool(settings_dict.get('OPTIONS', {}).get('pool')),
+        }
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                for pragma in ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size'):
+                    cursor.execute(f'PRAGMA {pragma}')
+                    setup[pragma] = cursor.fetchone()[0]
+            setup['transaction_mode'] = settings_dict.get('OPTIONS', {}).get('transaction_mode')
+        return setup
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.feed import DEFAULT_BATCH_SIZE, build_feeds
+
+
+class Command(BaseCommand):
+    help = (
+        "Rank projects for every active user (or the given ones) and store the "
+        "feeds served by /api/feed/ (see api.feed). Run it periodically."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('users', nargs='*', type=int, help="Only rebuild these user ids")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        built = build_feeds(options['users'] or None, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Built {built} feed(s) in {time.perf_counter() - started:.1f} s"
+        ))
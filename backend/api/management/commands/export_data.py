@@ -0,0 +1,60 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.exporting import DATASETS, FORMATS, ExportError, export_chunks, export_until, parse_watermark, validate
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream a dataset (projects with their aggregates, votes or comments) to a "
+        "CSV, JSONL or Parquet file in constant memory. With --state the export is "
+        "incremental: it starts where the previous run with the same file ended."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=list(DATASETS))
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument('--output', default='-', help="File to write, or - for stdout")
+        parser.add_argument('--since', help="Only rows created after this ISO timestamp")
+        parser.add_argument('--until', help="Only rows created up to this ISO timestamp (default and latest: EXPORT_WATERMARK_LAG seconds ago)")
+        parser.add_argument(
+            '--state',
+            help="Watermark file: read as --since when it exists, overwritten with --until after a successful export",
+        )
+
+    def handle(self, *args, **options):
+        dataset, fmt = options['dataset'], options['format']
+        since = options['since']
+        if options['state'] and not since and os.path.exists(options['state']):
+            with open(options['state']) as f:
+                since = f.read().strip()
+        try:
+            validate(dataset, fmt)
+            since = parse_watermark(since)
+            until = export_until(options['until'])
+        except ExportError as exc:
+            raise CommandError(str(exc))
+
+        size = 0
+        if options['output'] == '-':
+            for chunk in export_chunks(dataset, fmt, since, until):
+                sys.stdout.buffer.write(chunk)
+                size += len(chunk)
+            sys.stdout.buffer.flush()
+        else:
+            # Written next to the target and renamed, so a failed run leaves no partial file
+            partial = options['output'] + '.partial'
+            with open(partial, 'wb') as f:
+                for chunk in export_chunks(dataset, fmt, since, until):
+                    f.write(chunk)
+                    size += len(chunk)
+            os.replace(partial, options['output'])
+
+        if options['state']:
+            with open(options['state'], 'w') as f:
+                f.write(until.isoformat())
+        self.stderr.write(self.style.SUCCESS(
+            f"Exported {dataset} ({size} bytes) up to watermark {until.isoformat()}"
+        ))
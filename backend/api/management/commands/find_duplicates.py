@@ -0,0 +1,38 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from api import duplicates
+from api.models import Project
+
+
+class Command(BaseCommand):
+    help = (
+        "Cluster near-duplicate projects of the same city across the whole table "
+        "(see api.duplicates). --rebuild first recomputes every signature, e.g. "
+        "for projects created before duplicate detection existed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help="Recompute all signatures first")
+        parser.add_argument('--similarity', type=float, help="Minimum similarity, DUPLICATE_SIMILARITY by default")
+        parser.add_argument('--output', help="Write the clusters to this JSON file")
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            self.stdout.write(f"Indexed {duplicates.rebuild()} project(s)")
+
+        groups = duplicates.clusters(options['similarity'])
+        names = dict(
+            Project.live.filter(pk__in=[pk for group in groups for pk in group]).values_list('pk', 'name')
+        )
+        clusters = [[{'id': pk, 'name': names.get(pk)} for pk in group] for group in groups]
+        for cluster in clusters:
+            self.stdout.write(", ".join(f"#{project['id']} {project['name']}" for project in cluster))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(clusters, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(clusters)} cluster(s) covering {sum(len(cluster) for cluster in clusters)} project(s)"
+        ))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from api import gazetteer
+from api.models import Project
+
+
+class Command(BaseCommand):
+    help = "Fill in project coordinates from the offline gazetteer (GAZETTEER_PATH)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Re-geocode projects that already have coordinates")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        projects = Project.objects.only('id', 'city', 'location', 'latitude', 'longitude', 'geohash')
+        if not options['all']:
+            projects = projects.filter(latitude__isnull=True)
+
+        batch, updated, missing = [], 0, 0
+        for project in projects.iterator(chunk_size=options['batch_size']):
+            coords = gazetteer.lookup(project.location, project.city)
+            if coords is None:
+                missing += 1
+                continue
+            project.latitude, project.longitude = coords
+            project.update_geohash()
+            batch.append(project)
+            if len(batch) >= options['batch_size']:
+                updated += self._flush(batch)
+        updated += self._flush(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Geocoded {updated} project(s), {missing} not found in gazetteer"))
+
+    def _flush(self, batch):
+        count = len(batch)
+        if batch:
+            Project.objects.bulk_update(batch, ['latitude', 'longitude', 'geohash'])
+            batch.clear()
+        return count
@@ -0,0 +1,49 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.importing import DEFAULT_BATCH_SIZE, FORMATS, detect_format, import_projects, read_rows
+from api.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Import projects from a CSV or JSONL feed, creating new ones and updating "
+        "those whose external_id is already known. Invalid rows are reported and skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or - for stdin")
+        parser.add_argument('--format', choices=FORMATS, help="Defaults to the file extension")
+        parser.add_argument('--author', help="Username that owns newly created projects")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--errors', help="Write per-row errors to this JSONL file")
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or detect_format(options['path'])
+        if fmt is None:
+            raise CommandError("Cannot tell the format from the file name, pass --format")
+
+        author = None
+        if options['author']:
+            try:
+                author = User.objects.get(username=options['author'])
+            except User.DoesNotExist:
+                raise CommandError(f"No user named {options['author']}")
+
+        if options['path'] == '-':
+            report = import_projects(read_rows(sys.stdin.buffer, fmt), author, options['batch_size'])
+        else:
+            with open(options['path'], 'rb') as f:
+                report = import_projects(read_rows(f, fmt), author, options['batch_size'])
+
+        if options['errors'] and report.errors:
+            with open(options['errors'], 'w') as f:
+                for error in report.errors:
+                    f.write(json.dumps(error) + '\n')
+
+        for error in report.errors[:10]:
+            self.stderr.write(f"line {error['line']}: {json.dumps(error['errors'])}")
+        summary = f"Created {report.created}, updated {report.updated}, failed {report.failed}"
+        self.stdout.write(self.style.SUCCESS(summary) if not report.failed else self.style.WARNING(summary))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.deletion import purge_project
+from api.models import Project
+
+
+class Command(BaseCommand):
+    help = "Finish deleting tombstoned projects, e.g. after a worker restart dropped queued deletes."
+
+    def handle(self, *args, **options):
+        project_ids = list(Project.objects.filter(is_deleted=True).values_list('id', flat=True))
+        for project_id in project_ids:
+            purge_project(project_id)
+        self.stdout.write(self.style.SUCCESS(f"Purged {len(project_ids)} project(s)"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api import facets
+
+
+class Command(BaseCommand):
+    help = "Recount the per-city/status project facets from the Project table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('cities', nargs='*', help="Only recount these cities")
+
+    def handle(self, *args, **options):
+        facets.rebuild(options['cities'] or None)
+        self.stdout.write(self.style.SUCCESS("Facet counts rebuilt"))
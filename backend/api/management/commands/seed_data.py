@@ -0,0 +1,148 @@
+import random
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api import facets
+from api.autocomplete import index as autocomplete_index
+from api.models import Comment, ParticipationRequest, Project, User, Vote
+
+
+SEED_PASSWORD = 'seed-password'
+
+CITIES = {
+    'Vilnius': (54.6872, 25.2797),
+    'Kaunas': (54.8985, 23.9036),
+    'Riga': (56.9496, 24.1052),
+    'Tallinn': (59.4370, 24.7536),
+    'Warsaw': (52.2297, 21.0122),
+    'Berlin': (52.5200, 13.4050),
+    'Prague': (50.0755, 14.4378),
+    'Helsinki': (60.1699, 24.9384),
+}
+STATUSES = ['idea', 'idea', 'idea', 'planning', 'in_progress', 'done']
+WORDS = (
+    'park garden river school library bike lane playground mural cleanup tree planting '
+    'community kitchen recycling repair cafe market youth sports festival bridge lighting '
+    'bench square museum workshop shelter solar roof water fountain trail'
+).split()
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-insert synthetic users, projects, votes, comments and participation "
+        "requests for benchmarking. Seeded users log in with password "
+        f"'{SEED_PASSWORD}'. Never run against production data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--projects', type=int, default=5000)
+        parser.add_argument('--votes-per-project', type=int, default=20, help="Average; actual counts vary")
+        parser.add_argument('--comments-per-project', type=int, default=5, help="Average; actual counts vary")
+        parser.add_argument('--requests-per-project', type=int, default=2, help="Average; actual counts vary")
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=42, help="Random seed, for reproducible datasets")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+
+        user_ids = self.seed_users(options['users'])
+        project_ids = self.seed_projects(options['projects'], user_ids)
+        if not user_ids or not project_ids:
+            return
+        self.seed_per_project(
+            Vote, project_ids, user_ids, options['votes_per_project'],
+            lambda user_id, project_id: Vote(user_id=user_id, project_id=project_id, value=self.rng.choice((1, 1, 1, -1))),
+            unique=True,
+        )
+        self.seed_per_project(
+            Comment, project_ids, user_ids, options['comments_per_project'],
+            lambda user_id, project_id: Comment(user_id=user_id, project_id=project_id, content=self.sentence(12)),
+        )
+        self.seed_per_project(
+            ParticipationRequest, project_ids, user_ids, options['requests_per_project'],
+            lambda user_id, project_id: ParticipationRequest(
+                user_id=user_id, project_id=project_id, message=self.sentence(8),
+                status=self.rng.choice(('pending', 'pending', 'approved', 'rejected')),
+            ),
+            unique=True,
+        )
+
+        # bulk_create skips the signals that keep these current
+        facets.rebuild()
+        autocomplete_index.invalidate()
+        self.stdout.write(self.style.SUCCESS("Seeding finished"))
+
+    def sentence(self, words):
+        return ' '.join(self.rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+    def bulk_insert(self, model, objects):
+        # Consumes a generator batch by batch, so memory stays flat at any volume
+        objects = iter(objects)
+        attempted = 0
+        # ignore_conflicts drops duplicates silently, so count what actually landed
+        before = model._base_manager.count()
+        while batch := list(islice(objects, self.batch_size)):
+            with transaction.atomic():
+                model.objects.bulk_create(batch, ignore_conflicts=True)
+            attempted += len(batch)
+        created = model._base_manager.count() - before
+        self.stdout.write(f"{model.__name__}: {created} created ({attempted - created} skipped as duplicates)")
+
+    def seed_users(self, count):
+        # Hashing is deliberately slow, so every seeded user shares one hash
+        password = make_password(SEED_PASSWORD)
+        offset = User.objects.filter(username__startswith='seed_user_').count()
+        cities = list(CITIES)
+        users = (
+            User(
+                username=f'seed_user_{offset + i}',
+                email=f'seed_user_{offset + i}@example.com',
+                password=password,
+                city=self.rng.choice(cities),
+                bio=self.sentence(10),
+            )
+            for i in range(count)
+        )
+        self.bulk_insert(User, users)
+        return list(User.objects.filter(username__startswith='seed_user_').values_list('id', flat=True))
+
+    def seed_projects(self, count, user_ids):
+        if not user_ids:
+            return []
+        first_new_id = (Project.objects.order_by('-id').values_list('id', flat=True).first() or 0) + 1
+        self.bulk_insert(Project, self.generate_projects(count, user_ids))
+        return list(Project.objects.filter(id__gte=first_new_id).values_list('id', flat=True))
+
+    def generate_projects(self, count, user_ids):
+        for _ in range(count):
+            city, (lat, lon) = self.rng.choice(list(CITIES.items()))
+            project = Project(
+                author_id=self.rng.choice(user_ids),
+                name=self.sentence(self.rng.randint(2, 5))[:-1],
+                description=self.sentence(self.rng.randint(20, 80)),
+                city=city,
+                status=self.rng.choice(STATUSES),
+                location=f'{self.rng.choice(WORDS).capitalize()} street {self.rng.randint(1, 200)}',
+                latitude=lat + self.rng.uniform(-0.1, 0.1),
+                longitude=lon + self.rng.uniform(-0.15, 0.15),
+            )
+            project.update_geohash()
+            yield project
+
+    def seed_per_project(self, model, project_ids, user_ids, average, build, unique=False):
+        def generate():
+            for project_id in project_ids:
+                count = min(self.rng.randint(0, 2 * average), len(user_ids))
+                if unique:
+                    authors = self.rng.sample(user_ids, count)
+                else:
+                    authors = [self.rng.choice(user_ids) for _ in range(count)]
+                for user_id in authors:
+                    yield build(user_id, project_id)
+
+        self.bulk_insert(model, generate())
@@ -0,0 +1,212 @@
+import atexit
+import json
+import math
+import os
+import threading
+import time
+
+from django.conf import settings
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class _Shards(threading.local):
+    """
+    Per-thread storage. Each thread only ever writes its own dict, so
+    recording needs no lock; collection sums the dicts of all threads.
+    """
+
+    def __init__(self):
+        self.values = {}
+        with _shards_lock:
+            _all_shards.append(self.values)
+
+
+_shards_lock = threading.Lock()
+_all_shards = []
+_local = _Shards()
+_metrics = {}
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        _metrics[name] = self
+
+    def inc(self, *labelvalues, amount=1):
+        values = _local.values
+        key = (self.name, labelvalues)
+        values[key] = values.get(key, 0) + amount
+
+
+class Histogram:
+    """Fixed-bucket histogram; per-thread state is [bucket counts..., sum, count]."""
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        _metrics[name] = self
+
+    def observe(self, value, *labelvalues):
+        values = _local.values
+        key = (self.name, labelvalues)
+        state = values.get(key)
+        if state is None:
+            state = values[key] = [0] * (len(self.buckets) + 2)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                state[i] += 1
+                break
+        state[-2] += value
+        state[-1] += 1
+
+
+REQUESTS = Counter('api_requests_total', "API requests handled.", ('view', 'method', 'status'))
+REQUEST_LATENCY = Histogram('api_request_duration_seconds', "API request latency.", ('view', 'method'))
+REQUEST_QUERIES = Counter('api_db_queries_total', "SQL queries run by API requests.", ('view',))
+LLM_CALLS = Counter('api_llm_calls_total', "Calls made to the LLM upstream.", ('outcome',))
+LLM_LATENCY = Histogram('api_llm_duration_seconds', "LLM upstream latency.")
+
+
+def _merge(into, key, value):
+    current = into.get(key)
+    if current is None:
+        into[key] = list(value) if isinstance(value, list) else value
+    elif isinstance(value, list):
+        for i, v in enumerate(value):
+            current[i] += v
+    else:
+        into[key] = current + value
+
+
+def local_snapshot():
+    """Sum of every thread's values in this process."""
+    with _shards_lock:
+        shards = list(_all_shards)
+    snapshot = {}
+    for shard in shards:
+        # Copy first: the owning thread may add keys while we iterate
+        for key, value in list(shard.items()):
+            _merge(snapshot, key, value)
+    return snapshot
+
+
+# Multi-process mode: with METRICS_MULTIPROC_DIR set, a thread in every
+# worker process writes its snapshot to <dir>/<pid>.json each
+# METRICS_FLUSH_SECONDS (and at exit), and the exporter sums all files, so
+# any gunicorn worker can answer a scrape for the whole server, idle workers
+# included. Files of exited workers are kept so counters never go backwards;
+# clear the directory when the server is (re)started.
+
+_flusher_pid = None
+
+
+def _multiproc_dir():
+    return getattr(settings, 'METRICS_MULTIPROC_DIR', '') or None
+
+
+def start_flusher():
+    """Start this process's flush thread, once per process (workers are forked)."""
+    global _flusher_pid
+    if _flusher_pid == os.getpid() or not _multiproc_dir():
+        return
+    with _shards_lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+    threading.Thread(target=_flush_periodically, name='metrics-flush', daemon=True).start()
+    atexit.register(_flush_at_exit)
+
+
+def _flush_periodically():
+    global _flusher_pid
+    while directory := _multiproc_dir():
+        try:
+            flush(directory)
+        except OSError:
+            pass
+        time.sleep(getattr(settings, 'METRICS_FLUSH_SECONDS', 5))
+    # Multi-process mode was turned off (tests); a later start_flusher() may restart it
+    _flusher_pid = None
+
+
+def _flush_at_exit():
+    directory = _multiproc_dir()
+    if directory and _flusher_pid == os.getpid():
+        flush(directory)
+
+
+def flush(directory):
+    rows = [[name, list(labels), value] for (name, labels), value in local_snapshot().items()]
+    path = os.path.join(directory, f'{os.getpid()}.json')
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(rows, f)
+    os.replace(tmp_path, path)
+
+
+def collect():
+    snapshot = local_snapshot()
+    directory = _multiproc_dir()
+    if not directory:
+        return snapshot
+
+    own_file = f'{os.getpid()}.json'
+    for filename in os.listdir(directory):
+        if not filename.endswith('.json') or filename == own_file:
+            continue
+        try:
+            with open(os.path.join(directory, filename)) as f:
+                rows = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for name, labels, value in rows:
+            _merge(snapshot, (name, tuple(labels)), value)
+    return snapshot
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if isinstance(value, float) and math.isinf(value):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus():
+    """Current metrics in the Prometheus text exposition format (0.0.4)."""
+    snapshot = collect()
+    lines = []
+    for metric in _metrics.values():
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.type}')
+        series = sorted((labels, value) for (name, labels), value in snapshot.items() if name == metric.name)
+        for labelvalues, value in series:
+            if metric.type == 'counter':
+                lines.append(f'{metric.name}{_labels(metric.labelnames, labelvalues)} {_number(value)}')
+                continue
+            cumulative = 0
+            for bound, count in zip(metric.buckets + (math.inf,), value[:-2] + [value[-1] - sum(value[:-2])]):
+                cumulative += count
+                le = (('le', _number(float(bound))),)
+                lines.append(f'{metric.name}_bucket{_labels(metric.labelnames, labelvalues, le)} {cumulative}')
+            lines.append(f'{metric.name}_sum{_labels(metric.labelnames, labelvalues)} {_number(float(value[-2]))}')
+            lines.append(f'{metric.name}_count{_labels(metric.labelnames, labelvalues)} {value[-1]}')
+    return '\n'.join(lines) + '\n'
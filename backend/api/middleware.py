@@ -0,0 +1,350 @@
+import json
+import logging
+import re
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence, compress_string
+
+from . import instrumentation, metrics, profiling, routers
+from .models import RequestProfile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+timing_logger = logging.getLogger('api.timing')
+slow_logger = logging.getLogger('api.slow')
+
+
+PRIMARY_PIN_COOKIE = 'db_primary_until'
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/x-ndjson', 'application/javascript')
+_ACCEPT_ENCODING = re.compile(r'\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([\d.]+))?')
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+API_VIEW_MODULES = ('api.views', 'api.async_views')
+
+
+def _view_name(view_func):
+    # @api_view hides the function behind a generated class named after it
+    return getattr(view_func, 'cls', view_func).__name__
+
+
+class HybridMiddleware:
+    """
+    Base for middleware that runs natively under both WSGI and ASGI, so the
+    ASGI chain stays on the event loop instead of hopping to a thread for
+    every middleware. Subclasses dispatch to __acall__ when `is_async`.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+
+class RequestTimingMiddleware(HybridMiddleware):
+    """
+    Measures every request handled by api.views: SQL query count and time,
+    named spans such as serialization and LLM calls, and the total. Results go
+    out as a Server-Timing header and one JSON log line on `api.timing`;
+    repeated queries (likely N+1s) and requests slower than
+    SLOW_REQUEST_THRESHOLD_MS are additionally reported on `api.slow`.
+    Counts and latencies also feed the per-view metrics served at /api/metrics.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        if self.is_async:
+            # The handler runs a sync process_view in a thread, which this does not need
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats, token = instrumentation.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            instrumentation.end_request(token)
+        return self.finish(request, response, stats)
+
+    async def __acall__(self, request):
+        stats, token = instrumentation.start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            instrumentation.end_request(token)
+        return self.finish(request, response, stats)
+
+    def finish(self, request, response, stats):
+        if stats.view is not None:
+            self.report(request, response, stats)
+            self.record_metrics(request, response, stats)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        self.name_view(view_func)
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        self.name_view(view_func)
+
+    def name_view(self, view_func):
+        stats = instrumentation.current_stats()
+        if stats is not None and view_func.__module__ in API_VIEW_MODULES:
+            stats.view = _view_name(view_func)
+
+    def record_metrics(self, request, response, stats):
+        metrics.REQUESTS.inc(stats.view, request.method, str(response.status_code))
+        metrics.REQUEST_LATENCY.observe(stats.elapsed, stats.view, request.method)
+        metrics.REQUEST_QUERIES.inc(stats.view, amount=stats.query_count)
+        metrics.start_flusher()
+
+    def report(self, request, response, stats):
+        total_ms = stats.elapsed * 1000
+        spans_ms = {name: seconds * 1000 for name, seconds in stats.spans.items()}
+        duplicates = stats.duplicates(getattr(settings, 'DUPLICATE_QUERY_THRESHOLD', 3))
+
+        timings = [f'db;dur={stats.db_time * 1000:.1f};desc="{stats.query_count} queries"']
+        timings += [f'{name};dur={ms:.1f}' for name, ms in spans_ms.items()]
+        timings.append(f'total;dur={total_ms:.1f}')
+        response['Server-Timing'] = ', '.join(timings)
+
+        record = {
+            'view': stats.view,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': stats.query_count,
+            'db_ms': round(stats.db_time * 1000, 2),
+            'spans_ms': {name: round(ms, 2) for name, ms in spans_ms.items()},
+            'total_ms': round(total_ms, 2),
+            'duplicate_queries': [{'sql': sql, 'count': count} for sql, count in duplicates],
+        }
+        timing_logger.info(json.dumps(record))
+
+        if duplicates:
+            slow_logger.warning(
+                "%s %s repeated %d query shape(s), worst %dx: %s",
+                request.method, request.path, len(duplicates), duplicates[0][1], duplicates[0][0],
+            )
+        if total_ms >= getattr(settings, 'SLOW_REQUEST_THRESHOLD_MS', 500):
+            slow_logger.warning("Slow request: %s", json.dumps(record))
+
+
+class ProfilingMiddleware(HybridMiddleware):
+    """
+    Runs the view under a profiler when a staff user sends an X-Profile header
+    (see api.profiling) and stores the result as a RequestProfile, whose id is
+    returned in X-Profile-Id. Must come after AuthenticationMiddleware; other
+    requests pay for one header lookup. Async views are not profiled: the
+    profilers follow a single thread, not an event loop.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        if self.is_async:
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        header = request.META.get('HTTP_X_PROFILE')
+        if header is None:
+            return None
+        mode = profiling.parse_mode(header)
+        if mode is None or not request.user.is_staff:
+            return None
+        return self.profile(mode, request, view_func, view_args, view_kwargs)
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        header = request.META.get('HTTP_X_PROFILE')
+        if header is None or iscoroutinefunction(view_func):
+            return None
+        mode = profiling.parse_mode(header)
+        if mode is None or not (await request.auser()).is_staff:
+            return None
+        return await sync_to_async(self.profile)(mode, request, view_func, view_args, view_kwargs)
+
+    def profile(self, mode, request, view_func, view_args, view_kwargs):
+        response, results = profiling.profile_view(mode, view_func, request, *view_args, **view_kwargs)
+        if results is None:
+            return response
+
+        elapsed, pstats_dump, collapsed, top_functions = results
+        stats = instrumentation.current_stats()
+        profile = RequestProfile.objects.create(
+            user=request.user,
+            method=request.method,
+            path=request.get_full_path()[:500],
+            view=_view_name(view_func),
+            mode=mode,
+            status_code=response.status_code,
+            duration_ms=elapsed * 1000,
+            query_count=stats.query_count if stats is not None else None,
+            pstats=pstats_dump,
+            collapsed_stacks=collapsed,
+            top_functions=top_functions,
+        )
+        profiling.prune()
+        response['X-Profile-Id'] = str(profile.pk)
+        return response
+
+
+class ReplicaRoutingMiddleware(HybridMiddleware):
+    """
+    Lets reads of safe requests go to read replicas (see api.routers). Any
+    other request pins its client to the primary for REPLICA_PIN_SECONDS
+    through a cookie, so the client reads its own writes even when replicas
+    lag, whichever worker serves the next request.
+    """
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not routers.replicas():
+            return self.get_response(request)
+
+        if request.method not in SAFE_METHODS:
+            response = self.get_response(request)
+            self.pin(response)
+            return response
+
+        if self.pinned(request):
+            return self.get_response(request)
+
+        token = routers.allow_replica_reads()
+        try:
+            return self.get_response(request)
+        finally:
+            routers.reset(token)
+
+    async def __acall__(self, request):
+        if not routers.replicas():
+            return await self.get_response(request)
+
+        if request.method not in SAFE_METHODS:
+            response = await self.get_response(request)
+            self.pin(response)
+            return response
+
+        if self.pinned(request):
+            return await self.get_response(request)
+
+        # sync_to_async copies the context, so ORM calls made from threads see this too
+        token = routers.allow_replica_reads()
+        try:
+            return await self.get_response(request)
+        finally:
+            routers.reset(token)
+
+    def pinned(self, request):
+        try:
+            return float(request.COOKIES.get(PRIMARY_PIN_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def pin(self, response):
+        seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 10)
+        response.set_cookie(
+            PRIMARY_PIN_COOKIE, f'{time.time() + seconds:.0f}', max_age=seconds,
+            httponly=True, samesite='Lax',
+        )
+
+
+class CompressionMiddleware(HybridMiddleware):
+    """
+    Compresses text responses of at least COMPRESSION_MIN_BYTES with brotli,
+    when installed and accepted, or gzip. Streaming responses are compressed
+    chunk by chunk. gzip output gets Django's random padding against BREACH,
+    brotli is not used for HTML, which may carry CSRF tokens.
+    """
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return self.compress(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.compress(request, await self.get_response(request))
+
+    def compress(self, request, response):
+        content_type = response.get('Content-Type', '')
+        if response.has_header('Content-Encoding') or response.status_code < 200 or response.status_code == 204:
+            return response
+        # Async iterators cannot go through the sync compressors below
+        if response.streaming and response.is_async:
+            return response
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if not response.streaming and len(response.content) < getattr(settings, 'COMPRESSION_MIN_BYTES', 1024):
+            return response
+
+        # HTML pages carry CSRF tokens, and only gzip gets the BREACH padding
+        encoding = self.negotiate(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''), allow_brotli=not content_type.startswith('text/html'),
+        )
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if encoding == 'br':
+                response.streaming_content = self.brotli_stream(response.streaming_content)
+            else:
+                response.streaming_content = compress_sequence(response.streaming_content, max_random_bytes=100)
+            del response.headers['Content-Length']
+        else:
+            if encoding == 'br':
+                compressed = brotli.compress(response.content, quality=getattr(settings, 'BROTLI_QUALITY', 5))
+            else:
+                compressed = compress_string(response.content, max_random_bytes=100)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # The representation changed, so a strong validator no longer applies
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def negotiate(self, accept_encoding, allow_brotli=True):
+        """br or gzip, whichever the client accepts with the higher q (br on ties)."""
+        accepted = {}
+        for part in accept_encoding.lower().split(','):
+            match = _ACCEPT_ENCODING.match(part)
+            if match:
+                try:
+                    accepted[match.group(1)] = float(match.group(2) or 1)
+                except ValueError:
+                    continue
+        wildcard = accepted.get('*', 0)
+        candidates = [('gzip', accepted.get('gzip', wildcard))]
+        if brotli is not None and allow_brotli:
+            candidates.append(('br', accepted.get('br', wildcard)))
+        # max() keeps the first of equal items, so list br first to win ties
+        name, q = max(reversed(candidates), key=lambda candidate: candidate[1])
+        return name if q > 0 else None
+
+    def brotli_stream(self, chunks):
+        compressor = brotli.Compressor(quality=getattr(settings, 'BROTLI_QUALITY', 5))
+        for chunk in chunks:
+            data = compressor.process(chunk)
+            # Flush so each chunk reaches the client as soon as it is produced
+            data += compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
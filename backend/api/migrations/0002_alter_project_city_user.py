@@ -12,6 +12,12 @@ class Migration(migrations.Migration):
         ('api', '0001_initial'),
         ('auth', '0012_alter_user_first_name_max_length'),
     ]
+    # This migration creates AUTH_USER_MODEL, while admin's swappable
+    # dependency resolves to api's first migration; order them explicitly so
+    # that a fresh database can be migrated
+    run_before = [
+        ('admin', '0001_initial'),
+    ]
 
     operations = [
         migrations.AlterField(
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-19 03:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_participationrequest'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='participationrequest',
+            index=models.Index(fields=['project', 'status', 'created_at'], name='api_partreq_proj_status_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 04:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_participationrequest_inbox_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='is_deleted',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+    ]
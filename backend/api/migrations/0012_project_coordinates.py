@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-19 04:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_project_is_deleted'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='geohash',
+            field=models.BigIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
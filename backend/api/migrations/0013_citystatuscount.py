@@ -0,0 +1,40 @@
+# Generated by Django 5.2.8 on 2026-10-19 04:04
+
+from django.db import migrations, models
+
+
+def populate_counts(apps, schema_editor):
+    Project = apps.get_model('api', 'Project')
+    CityStatusCount = apps.get_model('api', 'CityStatusCount')
+    rows = (
+        Project.objects.filter(is_deleted=False)
+        .order_by()
+        .values('city', 'status')
+        .annotate(total=models.Count('id'))
+    )
+    CityStatusCount.objects.bulk_create(
+        CityStatusCount(city=row['city'], status=row['status'], count=row['total']) for row in rows
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_project_coordinates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CityStatusCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city', models.CharField(max_length=64)),
+                ('status', models.CharField(max_length=32)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('city', 'status')},
+            },
+        ),
+        migrations.RunPython(populate_counts, migrations.RunPython.noop),
+    ]
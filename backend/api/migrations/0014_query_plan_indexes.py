@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-19 04:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_citystatuscount'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['project', '-created_at'], name='api_comment_project_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['city', 'status'], name='api_project_city_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(fields=['project', 'value'], name='api_vote_project_value_idx'),
+        ),
+    ]
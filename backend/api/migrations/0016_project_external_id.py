@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 04:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_requestprofile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='external_id',
+            field=models.CharField(blank=True, max_length=128, null=True, unique=True),
+        ),
+    ]
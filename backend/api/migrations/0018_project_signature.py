@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-19 04:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_data_export'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectSignature',
+            fields=[
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='signature', serialize=False, to='api.project')),
+                ('minhash', models.BinaryField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProjectBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.PositiveSmallIntegerField()),
+                ('bucket', models.BigIntegerField()),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bands', to='api.project')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['band', 'bucket'], name='api_projectband_bucket_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-19 04:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_project_signature'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserFeed',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='feed', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('project_ids', models.JSONField(default=list)),
+                ('built_at', models.DateTimeField()),
+            ],
+        ),
+    ]
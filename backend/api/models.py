@@ -1,5 +1,9 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .geo import encode_geohash
 
 # Create your models here.
 
@@ -26,6 +30,59 @@ class User(AbstractUser):
     )
 
 
+def project_score_subquery(project_ref='pk'):
+    """Sum of vote values for the project referenced by `project_ref` in the outer query."""
+    votes = (
+        Vote.objects.filter(project=OuterRef(project_ref))
+        .order_by()
+        .values('project')
+        .annotate(total=Sum('value'))
+        .values('total')
+    )
+    return Coalesce(Subquery(votes, output_field=IntegerField()), Value(0))
+
+
+def related_count_subquery(model, project_ref='pk'):
+    rows = (
+        model.objects.filter(project=OuterRef(project_ref))
+        .order_by()
+        .values('project')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    return Coalesce(Subquery(rows, output_field=IntegerField()), Value(0))
+
+
+PROJECT_STATS = ('score', 'comments_count', 'participants_count', 'user_vote')
+
+
+class ProjectQuerySet(models.QuerySet):
+    def with_stats(self, user=None, stats=PROJECT_STATS):
+        """
+        Annotate score, comment and participant counts (and the vote of `user`)
+        as correlated subqueries, so serializing a list costs a single query.
+        `stats` limits the annotations to the ones a response actually needs.
+        """
+        annotations = {}
+        if 'score' in stats:
+            annotations['score'] = project_score_subquery()
+        if 'comments_count' in stats:
+            annotations['comments_count'] = related_count_subquery(Comment)
+        if 'participants_count' in stats:
+            annotations['participants_count'] = related_count_subquery(Participant)
+        if 'user_vote' in stats and user is not None and user.is_authenticated:
+            user_vote = Vote.objects.filter(project=OuterRef('pk'), user=user).values('value')[:1]
+            annotations['user_vote'] = Coalesce(Subquery(user_vote), Value(0))
+        return self.annotate(**annotations) if annotations else self
+
+
+class LiveProjectManager(models.Manager.from_queryset(ProjectQuerySet)):
+    """Hides projects tombstoned by a background delete that has not finished yet."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
+
 class Project(models.Model):
     author = models.ForeignKey(User, on_delete=models.DO_NOTHING, related_name='projects', null=True)
     name = models.CharField(max_length=100)
@@ -34,10 +91,101 @@ class Project(models.Model):
     status = models.CharField(max_length=32, default='idea')
     location = models.CharField(max_length=256)
     created_at = models.DateTimeField(auto_now_add=True)
+    is_deleted = models.BooleanField(default=False, db_index=True)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    # Integer geohash of (latitude, longitude), see api.geo; indexed for radius queries
+    geohash = models.BigIntegerField(null=True, blank=True, db_index=True)
+    # Identifier in the feed the project was imported from (see api.importing)
+    external_id = models.CharField(max_length=128, null=True, blank=True, unique=True)
+
+    # The default manager sees every row, so dumpdata, the admin and related
+    # lookups keep tombstoned projects; request paths read through `live`
+    objects = ProjectQuerySet.as_manager()
+    live = LiveProjectManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['city', 'status'], name='api_project_city_status_idx'),
+            # Incremental exports scan created_at ranges in (created_at, id) order
+            models.Index(fields=['created_at', 'id'], name='api_project_created_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what the facet counts currently hold for this row (see api.facets)
+        loaded = dict(zip(field_names, values))
+        if {'city', 'status', 'is_deleted'} <= loaded.keys():
+            instance._facet_snapshot = None if loaded['is_deleted'] else (loaded['city'], loaded['status'])
+        return instance
+
+    def update_geohash(self):
+        if self.latitude is None or self.longitude is None:
+            self.geohash = None
+        else:
+            self.geohash = encode_geohash(self.latitude, self.longitude)
+
+    def save(self, *args, **kwargs):
+        self.update_geohash()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geohash'}
+        super().save(*args, **kwargs)
+
+
+class ProjectSignature(models.Model):
+    """MinHash signature of a project's name and description, see api.duplicates."""
+    project = models.OneToOneField(Project, on_delete=models.CASCADE, primary_key=True, related_name='signature')
+    # duplicates.NUM_HASHES unsigned 64-bit minimums, packed
+    minhash = models.BinaryField()
+
+    def __str__(self):
+        return f"Signature of project {self.project_id}"
+
+
+class ProjectBand(models.Model):
+    """
+    One LSH band of a project's signature: projects sharing a (band, bucket)
+    row are near-duplicate candidates.
+    """
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='bands')
+    band = models.PositiveSmallIntegerField()
+    # Hash of the band's values and the project's city
+    bucket = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['band', 'bucket'], name='api_projectband_bucket_idx'),
+        ]
+
+
+class UserFeed(models.Model):
+    """A user's personalized project feed, ranked ahead of time by api.feed."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='feed')
+    # Project ids, best first
+    project_ids = models.JSONField(default=list)
+    built_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Feed of user {self.user_id} ({len(self.project_ids)} projects)"
+
+
+class CityStatusCount(models.Model):
+    """Number of live projects per (city, status), maintained by api.facets."""
+    city = models.CharField(max_length=64)
+    status = models.CharField(max_length=32)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('city', 'status')
+
+    def __str__(self):
+        return f"{self.city} / {self.status}: {self.count}"
+
 
 class Vote(models.Model):
     user = models.ForeignKey(User, on_delete=models.DO_NOTHING, related_name='votes')
@@ -50,6 +198,11 @@ class Vote(models.Model):
 
     class Meta:
         unique_together = ('user', 'project')
+        indexes = [
+            # Covers the per-project SUM(value) behind every project's score
+            models.Index(fields=['project', 'value'], name='api_vote_project_value_idx'),
+            models.Index(fields=['created_at', 'id'], name='api_vote_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} voted for {self.project.name}"
@@ -61,6 +214,12 @@ class Comment(models.Model):
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['project', '-created_at'], name='api_comment_project_recent_idx'),
+            models.Index(fields=['created_at', 'id'], name='api_comment_created_idx'),
+        ]
+
     def __str__(self):
         return f"Comment by {self.user.username} on {self.project.name}"
 
@@ -91,6 +250,70 @@ class ParticipationRequest(models.Model):
 
     class Meta:
         unique_together = ('user', 'project')
+        indexes = [
+            models.Index(fields=['project', 'status', 'created_at'], name='api_partreq_proj_status_idx'),
+        ]
 
     def __str__(self):
         return f"Participation request by {self.user.username} for {self.project.name} - {self.status}"
+
+
+class RequestProfile(models.Model):
+    """
+    A profile of one request, recorded on demand by api.middleware.ProfilingMiddleware.
+    cProfile runs keep the raw pstats dump; sampled runs keep collapsed stacks.
+    """
+    MODE_CHOICES = (
+        ('cprofile', 'cProfile'),
+        ('sample', 'Sampling'),
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    view = models.CharField(max_length=100, db_index=True)
+    mode = models.CharField(max_length=16, choices=MODE_CHOICES)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    query_count = models.PositiveIntegerField(null=True, blank=True)
+    pstats = models.BinaryField(null=True, blank=True)
+    collapsed_stacks = models.TextField(blank=True)
+    top_functions = models.JSONField(default=list)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms, {self.get_mode_display()})"
+
+
+class DataExport(models.Model):
+    """
+    A file export queued by a staff member through the API and written to
+    EXPORT_DIR by api.exporting.run_export on the background pool.
+    """
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    dataset = models.CharField(max_length=32)
+    format = models.CharField(max_length=16)
+    since = models.DateTimeField(null=True, blank=True)
+    until = models.DateTimeField()
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default='queued')
+    path = models.CharField(max_length=500, blank=True)
+    size = models.PositiveBigIntegerField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.dataset}.{self.format} ({self.get_status_display()})"
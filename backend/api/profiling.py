@@ -0,0 +1,175 @@
+"""
+On-demand profiling of single requests. A staff user sends `X-Profile: 1`
+(cProfile) or `X-Profile: sample` (stack sampling) and the view runs under the
+profiler; the result is stored as a RequestProfile for browsing in the admin.
+"""
+import cProfile
+import marshal
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+
+CPROFILE = 'cprofile'
+SAMPLE = 'sample'
+
+TOP_FUNCTIONS_STORED = 50
+
+
+def parse_mode(header):
+    """Profiler named by an X-Profile header value, or None to run unprofiled."""
+    value = header.strip().lower()
+    if value in ('', '0', 'off', 'false'):
+        return None
+    if value == SAMPLE:
+        return SAMPLE
+    return CPROFILE
+
+
+def _label(code):
+    return f"{getattr(code, 'co_qualname', code.co_name)} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class CProfileRun:
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+
+    def __enter__(self):
+        try:
+            self.profiler.enable()
+        except ValueError:
+            # Another profiler is already active on this thread
+            self.profiler = None
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.profiler is not None:
+            self.profiler.disable()
+
+    def results(self):
+        """(pstats marshal dump, collapsed stacks, top functions by own time)"""
+        if self.profiler is None:
+            return None
+        self.profiler.create_stats()
+        top = sorted(self.profiler.stats.items(), key=lambda item: item[1][2], reverse=True)[:TOP_FUNCTIONS_STORED]
+        return marshal.dumps(self.profiler.stats), '', [
+            {
+                'function': f"{name} ({os.path.basename(filename)}:{line})",
+                'calls': calls,
+                'own_seconds': round(own, 6),
+                'total_seconds': round(total, 6),
+            }
+            for (filename, line, name), (_, calls, own, total, _) in top
+        ]
+
+
+class SamplingRun:
+    """
+    Samples the calling thread's stack from a helper thread every
+    PROFILE_SAMPLE_INTERVAL_MS. Much cheaper than cProfile on call-heavy code
+    and produces collapsed stacks that flamegraph tools read directly.
+    """
+
+    def __init__(self):
+        self.interval = getattr(settings, 'PROFILE_SAMPLE_INTERVAL_MS', 5) / 1000
+        self.stacks = Counter()
+        self.thread_id = threading.get_ident()
+        self.done = threading.Event()
+        self.sampler = threading.Thread(target=self.sample, name='api-profile-sampler', daemon=True)
+
+    def __enter__(self):
+        self.sampler.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.done.set()
+        self.sampler.join()
+
+    def sample(self):
+        while not self.done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            # Stop at profile_view, so stacks start at the view rather than the server
+            while frame is not None and frame.f_code is not profile_view.__code__:
+                stack.append(_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def results(self):
+        own, anywhere = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')
+            own[frames[-1]] += count
+            for frame in set(frames):
+                anywhere[frame] += count
+        total = sum(self.stacks.values()) or 1
+        collapsed = '\n'.join(f'{stack} {count}' for stack, count in self.stacks.most_common())
+        return None, collapsed, [
+            {
+                'function': function,
+                'samples': count,
+                'own_share': round(count / total, 4),
+                'total_share': round(anywhere[function] / total, 4),
+            }
+            for function, count in own.most_common(TOP_FUNCTIONS_STORED)
+        ]
+
+
+def profile_view(mode, view, request, *args, **kwargs):
+    """
+    Run the view under the chosen profiler and return (response, results).
+    Lazy responses are rendered inside the profile so serialization counts.
+    """
+    run = SamplingRun() if mode == SAMPLE else CProfileRun()
+    started = time.perf_counter()
+    with run:
+        response = view(request, *args, **kwargs)
+        if callable(getattr(response, 'render', None)):
+            response = response.render()
+    elapsed = time.perf_counter() - started
+    results = run.results()
+    return response, (elapsed, *results) if results is not None else None
+
+
+def prune(keep=None):
+    """Delete all but the newest PROFILE_RETENTION profiles."""
+    from .models import RequestProfile
+
+    keep = keep if keep is not None else getattr(settings, 'PROFILE_RETENTION', 200)
+    cutoff = list(RequestProfile.objects.order_by('-id').values_list('id', flat=True)[keep:keep + 1])
+    if cutoff:
+        RequestProfile.objects.filter(id__lte=cutoff[0]).delete()
+
+
+def aggregate_top_functions(profiles, limit=30):
+    """
+    Merge the stored top functions of several profiles: own time for cProfile
+    runs, sample counts for sampled runs, each sorted by its own measure.
+    """
+    seconds, calls, samples = Counter(), Counter(), Counter()
+    appearances = Counter()
+    for top_functions in profiles:
+        for entry in top_functions:
+            function = entry['function']
+            appearances[function] += 1
+            if 'own_seconds' in entry:
+                seconds[function] += entry['own_seconds']
+                calls[function] += entry['calls']
+            else:
+                samples[function] += entry['samples']
+
+    return {
+        'by_time': [
+            {'function': f, 'own_seconds': round(s, 6), 'calls': calls[f], 'profiles': appearances[f]}
+            for f, s in seconds.most_common(limit)
+        ],
+        'by_samples': [
+            {'function': f, 'samples': n, 'profiles': appearances[f]}
+            for f, n in samples.most_common(limit)
+        ],
+    }
@@ -0,0 +1,75 @@
+"""
+orjson-backed JSON renderer and parser, the DRF defaults (see settings). Both
+produce and accept exactly what DRF's own JSONRenderer/JSONParser do and fall
+back to them when orjson is not installed. Also an NDJSON renderer for
+streamed listings.
+"""
+import json
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(data, encoder=None):
+    """
+    Compact UTF-8 JSON for `data`, byte-for-byte what JSONRenderer produces.
+    Pass a DRF JSONEncoder to reuse one across many calls.
+    """
+    encoder = encoder or encoders.JSONEncoder()
+    if orjson is None:
+        ret = json.dumps(data, cls=type(encoder), ensure_ascii=False, allow_nan=False, separators=(',', ':'))
+        ret = ret.encode()
+    else:
+        # Datetimes go through DRF's encoder so they keep its format ("Z" for UTC)
+        ret = orjson.dumps(
+            data,
+            default=encoder.default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME,
+        )
+    # Same escaping as JSONRenderer, which keeps the output valid JavaScript
+    return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Indented output is for humans, leave it to the standard library
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data, self.encoder_class())
+
+
+class NDJSONRenderer(BaseRenderer):
+    """One JSON document per line; lists render one line per item."""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        encoder = encoders.JSONEncoder()
+        rows = data if isinstance(data, list) else [data]
+        return b''.join(dumps(row, encoder) + b'\n' for row in rows)
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', 'utf-8')
+        if orjson is None or encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
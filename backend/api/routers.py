@@ -0,0 +1,52 @@
+"""
+Read-replica routing. Reads go to a replica only inside a request that
+ReplicaRoutingMiddleware marked as replica-safe: a GET/HEAD/OPTIONS from a
+client that has not written recently. Everything else - writes, requests
+from recently writing clients, management commands and background tasks -
+stays on the primary, so nobody misses their own vote or comment.
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+_replica_reads = ContextVar('api_replica_reads', default=False)
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def allow_replica_reads():
+    """Let reads in the current context use replicas; returns a token for `reset`."""
+    return _replica_reads.set(True)
+
+
+def reset(token):
+    _replica_reads.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        aliases = replicas()
+        if not aliases or not _replica_reads.get():
+            return DEFAULT_DB_ALIAS
+        # A session not replicated yet would look expired and log its user out
+        if model._meta.app_label == 'sessions':
+            return DEFAULT_DB_ALIAS
+        # Reads inside a transaction on the primary must see its uncommitted rows
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(aliases)
+
+    def db_for_write(self, model, **hints):
+        # A "safe" request that writes anyway reads its own rows back from here on
+        if _replica_reads.get():
+            _replica_reads.set(False)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
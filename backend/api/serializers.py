@@ -1,36 +1,141 @@
+from django.db.models.functions import Substr
+from django.utils.text import Truncator
 from rest_framework import serializers
 from .models import *
+from . import gazetteer
+
+
+# Computed ProjectSerializer fields and the with_stats() annotation each one reads
+STAT_FIELDS = {
+    'votes': 'score',
+    'user_voted': 'user_vote',
+    'comments_count': 'comments_count',
+    'participants_count': 'participants_count',
+}
+CARD_DESCRIPTION_LENGTH = 200
 
 
 class ProjectSerializer(serializers.ModelSerializer):
+    # Each computed field prefers the annotation added by Project.objects.with_stats()
     votes = serializers.SerializerMethodField()
     user_voted = serializers.SerializerMethodField()
-    comments_count = serializers.IntegerField(source='comments.count', read_only=True)
-    participants_count = serializers.IntegerField(source='participants.count', read_only=True)
+    comments_count = serializers.SerializerMethodField()
+    participants_count = serializers.SerializerMethodField()
     class Meta:
         model = Project
-        fields = '__all__'
+        exclude = ['is_deleted', 'geohash', 'external_id']
+
+    def __init__(self, *args, fields=None, **kwargs):
+        # `fields` keeps only the named fields, see ?fields= on the project list
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @classmethod
+    def field_names(cls):
+        return list(cls().fields)
+
+    @classmethod
+    def stats_for(cls, fields):
+        """with_stats() annotations needed to serialize `fields`."""
+        return [STAT_FIELDS[name] for name in fields if name in STAT_FIELDS]
 
     def get_votes(self, project):
+        if hasattr(project, 'score'):
+            return project.score
         return project.votes.filter(value=1).count() - project.votes.filter(value=-1).count()
 
     def get_user_voted(self, project):
         user = self.context.get('request').user
         if user.is_anonymous:
             return 0
+        if hasattr(project, 'user_vote'):
+            return project.user_vote
         vote = project.votes.filter(user=user).first()
         if vote:
             return vote.value
         return 0
 
+    def get_comments_count(self, project):
+        if hasattr(project, 'comments_count'):
+            return project.comments_count
+        return project.comments.count()
+
+    def get_participants_count(self, project):
+        if hasattr(project, 'participants_count'):
+            return project.participants_count
+        return project.participants.count()
+
+    def validate(self, attrs):
+        return validate_coordinates(attrs)
+
+    def update(self, instance, validated_data):
+        moved = any(
+            field in validated_data and validated_data[field] != getattr(instance, field)
+            for field in ('city', 'location')
+        )
+        if moved and 'latitude' not in validated_data:
+            coords = gazetteer.lookup(
+                validated_data.get('location', instance.location),
+                validated_data.get('city', instance.city),
+            )
+            validated_data['latitude'], validated_data['longitude'] = coords or (None, None)
+        return super().update(instance, validated_data)
+
+
+class ProjectCardSerializer(ProjectSerializer):
+    """What a project card in the feed shows, with the description cut short."""
+    description = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Project
+        fields = [
+            'id', 'name', 'description', 'author', 'city', 'location', 'status', 'created_at',
+            'votes', 'user_voted', 'comments_count',
+        ]
+
+    def get_description(self, project):
+        # Lists annotate just the start of the text (see with_description_snippet)
+        text = getattr(project, 'description_snippet', None)
+        if text is None:
+            text = project.description
+        return Truncator(text).chars(CARD_DESCRIPTION_LENGTH)
+
+
+def with_description_snippet(queryset):
+    """Fetch only as much of each description as a card shows."""
+    return queryset.defer('description').annotate(
+        description_snippet=Substr('description', 1, CARD_DESCRIPTION_LENGTH + 1),
+    )
+
+
+def validate_coordinates(attrs):
+    if ('latitude' in attrs) != ('longitude' in attrs):
+        raise serializers.ValidationError("latitude and longitude must be given together")
+    for field, bound in (('latitude', 90), ('longitude', 180)):
+        value = attrs.get(field)
+        if value is not None and not -bound <= value <= bound:
+            raise serializers.ValidationError({field: f"Must be between -{bound} and {bound}"})
+    return attrs
+
 
 class CreateProjectSerializer(serializers.Serializer):
     name = serializers.CharField(max_length=150)
     description = serializers.CharField(max_length=1024)
     city = serializers.CharField(max_length=100)
     location = serializers.CharField(max_length=100)
+    latitude = serializers.FloatField(required=False, min_value=-90, max_value=90)
+    longitude = serializers.FloatField(required=False, min_value=-180, max_value=180)
+
+    def validate(self, attrs):
+        return validate_coordinates(attrs)
 
     def create(self, validated_data):
+        if 'latitude' not in validated_data:
+            coords = gazetteer.lookup(validated_data['location'], validated_data['city'])
+            if coords:
+                validated_data['latitude'], validated_data['longitude'] = coords
         project = Project.objects.create(**validated_data)
         return project
 
@@ -64,12 +169,41 @@ class CommentSerializer(serializers.ModelSerializer):
 
 
 class ParticipationRequestSerializer(serializers.ModelSerializer):
+    username = serializers.CharField(source='user.username', read_only=True)
+
     class Meta:
         model = ParticipationRequest
         fields = '__all__'
 
 
+class InboxParticipationRequestSerializer(ParticipationRequestSerializer):
+    project_name = serializers.CharField(source='project.name', read_only=True)
+
+
+class MyParticipationRequestSerializer(ParticipationRequestSerializer):
+    """
+    Expects `project` to be select_related. The view adds the project's score
+    and participants_count to project_info, outside the per-user cache.
+    """
+    project_info = serializers.SerializerMethodField()
+
+    def get_project_info(self, participation_request):
+        project = participation_request.project
+        return {
+            'id': project.id,
+            'name': project.name,
+            'city': project.city,
+            'status': project.status,
+        }
+
+
 class ParticipantSerializer(serializers.ModelSerializer):
     class Meta:
         model = Participant
         fields = '__all__'
+
+
+class DataExportSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DataExport
+        exclude = ['path']
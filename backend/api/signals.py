@@ -0,0 +1,85 @@
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import duplicates, facets
+from .autocomplete import index as autocomplete_index
+from .caches import invalidate_my_participation, invalidate_user
+from .models import ParticipationRequest, Project, User
+
+
+@receiver(post_save, sender=ParticipationRequest)
+@receiver(post_delete, sender=ParticipationRequest)
+def participation_request_changed(sender, instance, **kwargs):
+    invalidate_my_participation(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def user_access_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            invalidate_user(instance.pk)
+    elif action == 'pre_clear':
+        # Changed from the group/permission side; clear() gives no pk_set,
+        # so find the affected users before the rows go
+        target = 'group' if sender is User.groups.through else 'permission'
+        invalidate_user(*sender.objects.filter(**{target: instance}).values_list('user_id', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        invalidate_user(*pk_set)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def group_permissions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # Cached members of the group must not keep permissions derived from it
+    if not reverse:
+        if not action.startswith('post_'):
+            return
+        group_ids = [instance.pk]
+    elif action == 'pre_clear':
+        group_ids = list(sender.objects.filter(permission=instance).values_list('group_id', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        group_ids = pk_set
+    else:
+        return
+    invalidate_user(*User.groups.through.objects.filter(group_id__in=group_ids).values_list('user_id', flat=True))
+
+
+@receiver(pre_save, sender=Project)
+def remember_project_facet(sender, instance, **kwargs):
+    if hasattr(instance, '_facet_snapshot') or instance._state.adding:
+        return
+    # Instance was not loaded from the database (or only partially), ask it
+    old = Project.objects.filter(pk=instance.pk).values('city', 'status', 'is_deleted').first()
+    instance._facet_snapshot = None if not old or old['is_deleted'] else (old['city'], old['status'])
+
+
+@receiver(post_save, sender=Project)
+def project_saved(sender, instance, created, **kwargs):
+    new_key = facets.facet_key(instance)
+    facets.move(None if created else instance._facet_snapshot, new_key)
+    instance._facet_snapshot = new_key
+
+    update_fields = kwargs.get('update_fields')
+    if not instance.is_deleted and (update_fields is None or {'name', 'description', 'city'} & set(update_fields)):
+        duplicates.index_project(instance, replace=not created)
+
+    pk, name, city = instance.pk, instance.name, instance.city
+    if instance.is_deleted:
+        transaction.on_commit(lambda: autocomplete_index.remove_project(pk))
+    else:
+        transaction.on_commit(lambda: autocomplete_index.update_project(pk, name, city))
+
+
+@receiver(post_delete, sender=Project)
+def project_deleted(sender, instance, **kwargs):
+    facets.adjust(getattr(instance, '_facet_snapshot', facets.facet_key(instance)), -1)
+    pk = instance.pk
+    transaction.on_commit(lambda: autocomplete_index.remove_project(pk))
@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework.utils import encoders
+
+from .renderers import dumps
+
+
+# Rows per write; small enough that the first bytes leave almost at once
+STREAM_FLUSH_ROWS = 100
+
+
+def wants_stream(request):
+    """`Accept: application/x-ndjson` (or ?format=ndjson) and ?stream=1 both stream."""
+    return request.accepted_renderer.format == 'ndjson' or request.GET.get('stream') in ('1', 'true')
+
+
+def stream_queryset(request, queryset, serializer_class, **serializer_kwargs):
+    """
+    Serialize `queryset` row by row into a StreamingHttpResponse: NDJSON when
+    that was negotiated, otherwise a JSON array identical to the buffered one.
+    Rows come from .iterator(), so memory stays flat whatever the size.
+    """
+    ndjson = request.accepted_renderer.format == 'ndjson'
+    # The body is produced after the view (and its routing context) returns,
+    # so fix the database the request would have read from now
+    queryset = queryset.using(queryset.db)
+    serializer = serializer_class(**serializer_kwargs)
+    chunk_size = getattr(settings, 'STREAM_CHUNK_SIZE', 500)
+
+    def generate():
+        encoder = encoders.JSONEncoder()
+        separator = b'\n' if ndjson else b','
+        batch = [] if ndjson else [b'[']
+        for index, obj in enumerate(queryset.iterator(chunk_size=chunk_size)):
+            row = dumps(serializer.to_representation(obj), encoder)
+            if ndjson:
+                batch.append(row + separator)
+            else:
+                batch.append(row if index == 0 else separator + row)
+            if len(batch) >= STREAM_FLUSH_ROWS:
+                yield b''.join(batch)
+                batch = []
+        if not ndjson:
+            batch.append(b']')
+        if batch:
+            yield b''.join(batch)
+
+    response = StreamingHttpResponse(
+        generate(), content_type='application/x-ndjson' if ndjson else 'application/json',
+    )
+    patch_vary_headers(response, ('Accept',))
+    return response
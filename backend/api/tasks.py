@@ -0,0 +1,34 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'BACKGROUND_TASK_WORKERS', 2),
+    thread_name_prefix='api-background',
+)
+
+
+def run_in_background(func, *args, **kwargs):
+    """
+    Run `func` on the in-process worker pool. Work queued here is lost if the
+    process dies, so every task must be safe to redo from a management command.
+    With BACKGROUND_TASKS_EAGER the call runs inline, which tests rely on.
+    """
+    if getattr(settings, 'BACKGROUND_TASKS_EAGER', False):
+        return func(*args, **kwargs)
+
+    def run():
+        try:
+            func(*args, **kwargs)
+        except Exception:
+            logger.exception("Background task %s failed", getattr(func, '__name__', func))
+        finally:
+            # Worker threads outlive requests, so nothing else would close these
+            connections.close_all()
+
+    return _executor.submit(run)
@@ -0,0 +1,76 @@
+"""
+Helpers for tests that guard query performance: per-endpoint query budgets
+that must hold at several data sizes, and SQLite query plan inspection.
+"""
+import re
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+# "SCAN api_vote" is a full table scan; "SCAN api_vote USING COVERING INDEX ..."
+# walks an index and is fine for the purposes of these tests
+_FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?! USING (?:COVERING )?INDEX)\s*$')
+
+
+def explain(sql):
+    """EXPLAIN QUERY PLAN detail lines of an already interpolated SQLite statement."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def full_scans(plan):
+    return [match.group(1) for line in plan if (match := _FULL_SCAN.match(line.strip()))]
+
+
+class QueryPerformanceMixin:
+    """TestCase mixin; `request` callables are run while queries are captured."""
+
+    @contextmanager
+    def capture_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            yield context
+
+    def assertQueryBudget(self, budget, request, sizes, populate):
+        """
+        Call `populate(n)` for each size to add rows, then `request()`; the
+        query count must be identical at every size and within `budget`,
+        which proves it does not grow with N.
+        """
+        counts = {}
+        for size in sizes:
+            populate(size)
+            with self.capture_queries() as context:
+                response = request()
+            self.assertLess(response.status_code, 400, response.content)
+            counts[size] = len(context.captured_queries)
+
+        self.assertEqual(
+            len(set(counts.values())), 1,
+            f"Query count grows with data size: {counts}",
+        )
+        self.assertLessEqual(
+            max(counts.values()), budget,
+            f"Over budget of {budget} queries: {counts}",
+        )
+
+    def explain_request(self, request):
+        """Run `request()` and return (sql, plan) for every SELECT it issued."""
+        with self.capture_queries() as context:
+            response = request()
+        self.assertLess(response.status_code, 400, response.content)
+        return [
+            (query['sql'], explain(query['sql']))
+            for query in context.captured_queries
+            if query['sql'].lstrip().upper().startswith('SELECT')
+        ]
+
+    def assertNoFullTableScans(self, request, allowed=()):
+        for sql, plan in self.explain_request(request):
+            scanned = [table for table in full_scans(plan) if table not in allowed]
+            self.assertFalse(
+                scanned,
+                f"Full table scan of {', '.join(scanned)}:\n{sql}\n" + '\n'.join(plan),
+            )
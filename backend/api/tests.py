@@ -1,3 +1,1225 @@
-from django.test import TestCase
+import asyncio
+import base64
+import datetime
+import gzip
+import io
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import Group, Permission
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, models
+from django.http import HttpResponse
+from django.test import AsyncClient, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path
+from django.utils import timezone
+
+from . import async_views, autocomplete, duplicates, facets, feed, geo, idempotency, metrics, throttling
+from .deletion import count_project_rows
+from .exporting import export_chunks
+from .importing import import_projects, read_rows
+from .models import (
+    CityStatusCount, Comment, DataExport, Participant, ParticipationRequest, Project, RequestProfile, User, UserFeed,
+    Vote,
+)
+from rest_framework.renderers import JSONRenderer
+
+from .middleware import PRIMARY_PIN_COOKIE, CompressionMiddleware, ReplicaRoutingMiddleware
+from .pagination import EstimatedCountPaginator
+from .renderers import FastJSONRenderer
+from .routers import ReplicaRouter, allow_replica_reads, reset as reset_replica_reads
+from .testing import QueryPerformanceMixin
+
+
+def make_user(username, **kwargs):
+    return User.objects.create_user(username, f'{username}@example.com', 'password123', city='Vilnius', bio='', **kwargs)
+
+
+class QueryBudgetTests(QueryPerformanceMixin, TestCase):
+    SIZES = (1, 5, 20)
+
+    def setUp(self):
+        self.user = make_user('reader')
+        self.voters = [make_user(f'voter{i}') for i in range(3)]
+        self.client.force_login(self.user)
+        # Warm the session and user caches, which the budgets assume
+        self.client.get('/api/user/')
+        self.project = Project.objects.create(author=self.user, name='Seed', description='d', city='Vilnius', location='L')
+
+    def add_projects(self, count):
+        for _ in range(count):
+            project = Project.objects.create(author=self.user, name='Park', description='d', city='Vilnius', location='L')
+            for voter in self.voters:
+                Vote.objects.create(user=voter, project=project, value=1)
+            Comment.objects.create(user=self.voters[0], project=project, content='c')
+            Participant.objects.create(user=self.voters[1], project=project, role='member')
+
+    def add_activity(self, count):
+        for i in range(count):
+            Comment.objects.create(user=self.voters[i % 3], project=self.project, content='c')
+
+    def test_project_list(self):
+        self.assertQueryBudget(3, lambda: self.client.get('/api/projects/'), self.SIZES, self.add_projects)
+
+    def test_project_list_filtered_by_city(self):
+        self.assertQueryBudget(3, lambda: self.client.get('/api/projects/?city=Vilnius'), self.SIZES, self.add_projects)
+
+    def test_project_detail(self):
+        self.assertQueryBudget(
+            3, lambda: self.client.get(f'/api/projects/{self.project.id}'), self.SIZES, self.add_activity,
+        )
+
+    def test_project_comments(self):
+        self.assertQueryBudget(
+            4, lambda: self.client.get(f'/api/comments/{self.project.id}/'), self.SIZES, self.add_activity,
+        )
+
+    def test_vote(self):
+        def vote():
+            Vote.objects.filter(user=self.user).delete()
+            return self.client.post(f'/api/vote/{self.project.id}/', {'value': 1}, content_type='application/json')
+
+        def add_votes(count):
+            for _ in range(count):
+                Vote.objects.create(user=make_user(f'extra{User.objects.count()}'), project=self.project, value=1)
+
+        # One of these is the DELETE that resets the caller's vote
+        self.assertQueryBudget(6, vote, self.SIZES, add_votes)
+
+
+@skipUnless(connection.vendor == 'sqlite', "Query plans are checked with SQLite's EXPLAIN QUERY PLAN")
+class QueryPlanTests(QueryPerformanceMixin, TestCase):
+    def setUp(self):
+        self.user = make_user('reader')
+        self.client.force_login(self.user)
+        # Warm the session and user caches, which the budgets assume
+        self.client.get('/api/user/')
+        self.project = Project.objects.create(author=self.user, name='Park', description='d', city='Vilnius', location='L')
+        Vote.objects.create(user=self.user, project=self.project, value=1)
+        Comment.objects.create(user=self.user, project=self.project, content='c')
+
+    def test_get_projects_by_city_uses_indexes(self):
+        self.assertNoFullTableScans(lambda: self.client.get('/api/projects/?city=Vilnius'))
+
+    def test_get_project_comments_uses_indexes(self):
+        plans = self.explain_request(lambda: self.client.get(f'/api/comments/{self.project.id}/'))
+        for sql, plan in plans:
+            self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan, sql)
+        self.assertNoFullTableScans(lambda: self.client.get(f'/api/comments/{self.project.id}/'))
+
+    def test_vote_for_project_uses_indexes(self):
+        self.assertNoFullTableScans(
+            lambda: self.client.post(f'/api/vote/{self.project.id}/', {'value': -1}, content_type='application/json'),
+        )
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_PIN_SECONDS=10)
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def route(self, request, write=False):
+        """Database the router picks for a read made while `request` is handled."""
+        routed = {}
+
+        def view(request):
+            if write:
+                self.router.db_for_write(Project)
+            routed['db'] = self.router.db_for_read(Project)
+            return HttpResponse()
+
+        response = ReplicaRoutingMiddleware(view)(request)
+        return routed['db'], response
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertEqual(self.router.db_for_read(Project), 'default')
+
+    def test_safe_request_reads_from_replica(self):
+        db, response = self.route(self.factory.get('/api/projects/'))
+        self.assertEqual(db, 'replica')
+        self.assertNotIn(PRIMARY_PIN_COOKIE, response.cookies)
+
+    def test_sessions_are_read_from_primary(self):
+        token = allow_replica_reads()
+        try:
+            self.assertEqual(self.router.db_for_read(Session), 'default')
+        finally:
+            reset_replica_reads(token)
+
+    def test_write_pins_client_to_primary(self):
+        db, response = self.route(self.factory.post('/api/vote/1/'))
+        self.assertEqual(db, 'default')
+        self.assertIn(PRIMARY_PIN_COOKIE, response.cookies)
+
+        request = self.factory.get('/api/projects/')
+        request.COOKIES[PRIMARY_PIN_COOKIE] = response.cookies[PRIMARY_PIN_COOKIE].value
+        db, _ = self.route(request)
+        self.assertEqual(db, 'default')
+
+    def test_expired_pin_reads_from_replica_again(self):
+        request = self.factory.get('/api/projects/')
+        request.COOKIES[PRIMARY_PIN_COOKIE] = '1'
+        db, _ = self.route(request)
+        self.assertEqual(db, 'replica')
+
+    def test_write_during_safe_request_switches_reads_to_primary(self):
+        db, _ = self.route(self.factory.get('/api/projects/'), write=True)
+        self.assertEqual(db, 'default')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas_everything_uses_primary(self):
+        db, response = self.route(self.factory.post('/api/vote/1/'))
+        self.assertEqual(db, 'default')
+        self.assertNotIn(PRIMARY_PIN_COOKIE, response.cookies)
+
+
+class AuthCacheTests(TestCase):
+    def setUp(self):
+        self.user = make_user('cached')
+        self.client.login(username='cached', password='password123')
+
+    def test_warm_authenticated_request_runs_no_queries(self):
+        self.client.get('/api/user/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/user/')
+        self.assertEqual(response.json()['username'], 'cached')
+
+    def test_saving_user_refreshes_cache(self):
+        self.client.get('/api/user/')
+        self.user.city = 'Kaunas'
+        self.user.save()
+        self.assertEqual(self.client.get('/api/user/').json()['city'], 'Kaunas')
+
+    def test_group_changes_refresh_cache(self):
+        group = Group.objects.create(name='moderators')
+        self.client.get('/api/user/')
+        group.api_user_set.add(self.user)
+        self.assertEqual(self.client.get('/api/user/').json()['groups'], [group.pk])
+        group.api_user_set.clear()
+        self.assertEqual(self.client.get('/api/user/').json()['groups'], [])
+
+    def test_group_permission_changes_refresh_cache(self):
+        self.user.is_staff = True
+        self.user.save()
+        group = Group.objects.create(name='editors')
+        group.api_user_set.add(self.user)
+        permission = Permission.objects.get(codename='view_project')
+        self.assertEqual(self.client.get('/admin/api/project/').status_code, 403)
+
+        group.permissions.add(permission)
+        self.assertIsNone(cache.get(f'auth_user:{self.user.pk}'))
+        self.assertEqual(self.client.get('/admin/api/project/').status_code, 200)
+        # Cleared from the permission's side, which sends no pk_set
+        permission.group_set.clear()
+        self.assertIsNone(cache.get(f'auth_user:{self.user.pk}'))
+        self.assertEqual(self.client.get('/admin/api/project/').status_code, 403)
+
+    def test_deactivated_user_is_logged_out(self):
+        self.client.get('/api/user/')
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/user/').status_code, 403)
+
+    def test_views_default_to_session_authentication_only(self):
+        project = Project.objects.create(author=self.user, name='Park', description='d', city='Vilnius', location='L')
+        comment = Comment.objects.create(user=self.user, project=project, content='Hi')
+        self.client.logout()
+        self.assertEqual(self.client.delete(f'/api/delete_comment/{comment.id}/').status_code, 403)
+        # HTTP Basic credentials are not an accepted way in
+        basic = 'Basic ' + base64.b64encode(b'cached:password123').decode()
+        response = self.client.delete(f'/api/delete_comment/{comment.id}/', HTTP_AUTHORIZATION=basic)
+        self.assertEqual(response.status_code, 403)
+        self.assertTrue(Comment.objects.filter(pk=comment.pk).exists())
+
+
+class RenderingTests(SimpleTestCase):
+    def test_fast_renderer_matches_drf(self):
+        data = {
+            'when': datetime.datetime(2025, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc),
+            'amount': Decimal('1.50'),
+            'text': 'Šiauliai\u2028Kaunas',
+            1: [None, True, 0.5],
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def compress(self, body, accept_encoding='gzip, deflate'):
+        request = RequestFactory().get('/api/projects/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        response = HttpResponse(body, content_type='application/json')
+        return CompressionMiddleware(lambda request: response)(request)
+
+    @override_settings(COMPRESSION_MIN_BYTES=1024)
+    def test_large_responses_are_compressed(self):
+        body = json.dumps([{'name': 'Park', 'city': 'Vilnius'}] * 200).encode()
+        response = self.compress(body)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), body)
+
+    @override_settings(COMPRESSION_MIN_BYTES=1024)
+    def test_small_or_unaccepted_responses_are_not_compressed(self):
+        self.assertFalse(self.compress(b'[]').has_header('Content-Encoding'))
+        body = json.dumps([{'name': 'Park'}] * 200).encode()
+        self.assertFalse(self.compress(body, accept_encoding='gzip;q=0').has_header('Content-Encoding'))
+
+
+class StreamingTests(TestCase):
+    def setUp(self):
+        self.user = make_user('streamer')
+        for i in range(7):
+            project = Project.objects.create(author=self.user, name=f'Park {i}', description='d', city='Vilnius', location='L')
+            Vote.objects.create(user=self.user, project=project, value=1)
+
+    def test_stream_matches_buffered_list(self):
+        buffered = self.client.get('/api/projects/').json()
+        response = self.client.get('/api/projects/?stream=1')
+        self.assertTrue(response.streaming)
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), buffered)
+
+    def test_ndjson_is_negotiated_from_accept(self):
+        buffered = self.client.get('/api/projects/?city=Vilnius').json()
+        response = self.client.get('/api/projects/?city=Vilnius', HTTP_ACCEPT='application/x-ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).splitlines()
+        self.assertEqual([json.loads(line) for line in lines], buffered)
+
+    def test_empty_stream_is_valid_json(self):
+        response = self.client.get('/api/projects/?stream=1&city=Nowhere')
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), [])
+
+
+class SparseFieldsetTests(QueryPerformanceMixin, TestCase):
+    def setUp(self):
+        self.user = make_user('cards')
+        self.client.force_login(self.user)
+        self.client.get('/api/user/')
+        self.project = Project.objects.create(
+            author=self.user, name='Park', description='word ' * 100, city='Vilnius', location='L',
+        )
+        Vote.objects.create(user=self.user, project=self.project, value=1)
+
+    def test_fields_limit_output_and_queries(self):
+        with self.capture_queries() as context:
+            response = self.client.get('/api/projects/?fields=id,name')
+        self.assertEqual(response.json(), [{'id': self.project.id, 'name': 'Park'}])
+        sql = context.captured_queries[-1]['sql']
+        self.assertNotIn('api_vote', sql)
+        self.assertNotIn('description', sql)
+
+    def test_requested_stats_are_annotated(self):
+        with self.capture_queries() as context:
+            response = self.client.get('/api/projects/?fields=id,votes')
+        self.assertEqual(response.json(), [{'id': self.project.id, 'votes': 1}])
+        sql = context.captured_queries[-1]['sql']
+        self.assertIn('api_vote', sql)
+        self.assertNotIn('api_comment', sql)
+
+    def test_card_view_truncates_description(self):
+        card = self.client.get('/api/projects/?view=card').json()[0]
+        self.assertNotIn('participants_count', card)
+        self.assertEqual(len(card['description']), 200)
+        self.assertTrue(card['description'].endswith('…'))
+        self.assertEqual(card['votes'], 1)
+        self.assertEqual(card['user_voted'], 1)
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get('/api/projects/?view=card&fields=id,latitude')
+        self.assertEqual(response.status_code, 400)
+
+
+class ImportTests(TestCase):
+    def setUp(self):
+        self.staff = make_user('importer', is_staff=True)
+
+    def feed(self, *rows):
+        return io.BytesIO('\n'.join(json.dumps(row) for row in rows).encode())
+
+    def row(self, external_id, **fields):
+        return {'external_id': external_id, 'name': 'Park', 'description': 'd', 'city': 'Vilnius', 'location': 'L', **fields}
+
+    def test_upsert_on_external_id(self):
+        import_projects(read_rows(self.feed(self.row('a'), self.row('b')), 'jsonl'), author=self.staff)
+        report = import_projects(
+            read_rows(self.feed(self.row('a', city='Riga', status='done'), self.row('c')), 'jsonl'), author=self.staff,
+        )
+        self.assertEqual((report.created, report.updated, report.failed), (1, 1, 0))
+        self.assertEqual(Project.objects.get(external_id='a').city, 'Riga')
+        self.assertEqual(
+            sorted(CityStatusCount.objects.filter(count__gt=0).values_list('city', 'status', 'count')),
+            [('Riga', 'done', 1), ('Vilnius', 'idea', 2)],
+        )
+
+    def test_update_keeps_columns_the_row_leaves_out(self):
+        rows = [self.row('a', status='done', latitude=54.6, longitude=25.3), self.row('b')]
+        import_projects(read_rows(self.feed(*rows), 'jsonl'), author=self.staff)
+        report = import_projects(
+            read_rows(self.feed(self.row('a', name='Renamed'), self.row('b', status='active')), 'jsonl'), author=self.staff,
+        )
+        self.assertEqual(report.updated, 2)
+        self.assertEqual(
+            list(Project.objects.order_by('external_id').values_list('name', 'status', 'latitude')),
+            [('Renamed', 'done', 54.6), ('Park', 'active', None)],
+        )
+        self.assertEqual(
+            sorted(CityStatusCount.objects.filter(count__gt=0).values_list('city', 'status', 'count')),
+            [('Vilnius', 'active', 1), ('Vilnius', 'done', 1)],
+        )
+
+    def test_values_longer_than_the_columns_are_reported(self):
+        rows = [self.row('a', name='x' * 101), self.row('b', city='y' * 65), self.row('c')]
+        report = import_projects(read_rows(self.feed(*rows), 'jsonl'), author=self.staff)
+        self.assertEqual((report.created, report.failed), (1, 2))
+        self.assertEqual([list(error['errors']) for error in report.errors], [['name'], ['city']])
+
+    def test_invalid_rows_are_reported(self):
+        body = b'{"external_id": "a", "name": "Park"}\nnot json\n' + json.dumps(self.row('b')).encode()
+        report = import_projects(read_rows(io.BytesIO(body), 'jsonl'), author=self.staff)
+        self.assertEqual((report.created, report.failed), (1, 2))
+        self.assertEqual([error['line'] for error in report.errors], [1, 2])
+        self.assertIn('city', report.errors[0]['errors'])
+
+    def test_csv_upload_is_staff_only(self):
+        upload = io.BytesIO(b'external_id,name,description,city,location\nx,Park,d,Vilnius,L\n')
+        upload.name = 'feed.csv'
+        self.client.force_login(make_user('visitor'))
+        self.assertEqual(self.client.post('/api/projects/import/', {'file': upload}).status_code, 403)
+
+        upload.seek(0)
+        self.client.force_login(self.staff)
+        response = self.client.post('/api/projects/import/', {'file': upload})
+        self.assertEqual(response.json()['created'], 1)
+
+
+# Rows made by the tests are stamped just now; most tests export them at once
+@override_settings(EXPORT_WATERMARK_LAG=0)
+class ExportTests(TestCase):
+    def setUp(self):
+        self.staff = make_user('analyst', is_staff=True)
+        self.project = Project.objects.create(author=self.staff, name='Park', description='d', city='Vilnius', location='L')
+        Vote.objects.create(user=self.staff, project=self.project, value=1)
+
+    def test_stream_is_staff_only_and_incremental(self):
+        self.client.force_login(make_user('visitor'))
+        self.assertEqual(self.client.get('/api/exports/stream/projects/').status_code, 403)
+
+        self.client.force_login(self.staff)
+        response = self.client.get('/api/exports/stream/projects/')
+        rows = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(rows[0].split(',')[-3:], ['score', 'comments_count', 'participants_count'])
+        self.assertEqual(rows[1].split(',')[-3:], ['1', '0', '0'])
+
+        watermark = response['X-Export-Watermark']
+        Comment.objects.create(user=self.staff, project=self.project, content='later')
+        response = self.client.get('/api/exports/stream/comments/', {'type': 'jsonl', 'since': watermark})
+        lines = b''.join(response.streaming_content).splitlines()
+        self.assertEqual([json.loads(line)['content'] for line in lines], ['later'])
+        response = self.client.get('/api/exports/stream/votes/', {'since': watermark})
+        self.assertEqual(b''.join(response.streaming_content).decode().splitlines(), ['id,user_id,project_id,value,created_at'])
+
+    @override_settings(EXPORT_WATERMARK_LAG=60)
+    def test_watermark_lags_behind_commits(self):
+        self.client.force_login(self.staff)
+        later = (timezone.now() + datetime.timedelta(hours=1)).isoformat()
+        response = self.client.get('/api/exports/stream/votes/', {'until': later})
+        b''.join(response.streaming_content)
+        watermark = datetime.datetime.fromisoformat(response['X-Export-Watermark'])
+        self.assertLessEqual(watermark, timezone.now() - datetime.timedelta(seconds=60))
+
+        # Stamped after the watermark but committed only now, as a slow
+        # transaction would: the next incremental export still picks it up
+        comment = Comment.objects.create(user=self.staff, project=self.project, content='slow')
+        Comment.objects.filter(pk=comment.pk).update(created_at=watermark + datetime.timedelta(seconds=30))
+        with override_settings(EXPORT_WATERMARK_LAG=0):
+            response = self.client.get('/api/exports/stream/comments/', {'type': 'jsonl', 'since': watermark.isoformat()})
+        lines = b''.join(response.streaming_content).splitlines()
+        self.assertEqual([json.loads(line)['content'] for line in lines], ['slow'])
+
+    def test_invalid_parameters(self):
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get('/api/exports/stream/users/').status_code, 400)
+        self.assertEqual(self.client.get('/api/exports/stream/votes/', {'since': 'yesterday'}).status_code, 400)
+
+    def test_background_export(self):
+        self.client.force_login(self.staff)
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(EXPORT_DIR=directory, BACKGROUND_TASKS_EAGER=True):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post('/api/exports/', {'dataset': 'votes', 'type': 'jsonl'}, content_type='application/json')
+            self.assertEqual(response.status_code, 202)
+            export_id = response.json()['id']
+            self.assertEqual(self.client.get(f'/api/exports/{export_id}/').json()['status'], 'done')
+
+            response = self.client.get(f'/api/exports/{export_id}/download/')
+            body = b''.join(response.streaming_content)
+            response.close()
+            self.assertEqual(json.loads(body)['project_id'], self.project.id)
+            self.assertEqual(body, b''.join(export_chunks('votes', 'jsonl', until=DataExport.objects.get().until)))
+
+            os.remove(DataExport.objects.get().path)
+            self.assertEqual(self.client.get(f'/api/exports/{export_id}/download/').status_code, 410)
+
+
+class AdminChangelistTests(QueryPerformanceMixin, TestCase):
+    def setUp(self):
+        self.admin = make_user('admin', is_staff=True, is_superuser=True)
+        self.client.force_login(self.admin)
+        self.client.get('/admin/')
+
+    def add_projects(self, count):
+        voters = [make_user(f'fan{Project.objects.count()}-{i}') for i in range(2)]
+        for i in range(count):
+            project = Project.objects.create(author=self.admin, name=f'P{i}', description='d', city='Vilnius', location='L')
+            for voter in voters[:i % 3]:
+                Vote.objects.create(user=voter, project=project, value=1)
+            Comment.objects.create(user=self.admin, project=project, content='c')
+            Comment.objects.create(user=self.admin, project=project, content='c')
+
+    def test_project_changelist_queries_do_not_grow(self):
+        self.add_projects(1)
+        with self.capture_queries() as queries:
+            self.client.get('/admin/api/project/')
+        baseline = len(queries)
+        self.add_projects(10)
+        with self.assertNumQueries(baseline):
+            self.client.get('/admin/api/project/')
+
+    def test_sort_by_score_does_not_duplicate_rows(self):
+        self.add_projects(4)
+        response = self.client.get('/admin/api/project/', {'o': '-6'})
+        projects = list(response.context['cl'].result_list)
+        self.assertEqual(len(projects), 4)
+        self.assertEqual([project.score for project in projects], [2, 1, 0, 0])
+        self.assertEqual({project.comments_count for project in projects}, {2})
+
+    def test_paginator_stops_counting_at_the_limit(self):
+        self.add_projects(5)
+        with mock.patch('api.pagination.ADMIN_COUNT_LIMIT', 3), self.capture_queries() as queries:
+            count = EstimatedCountPaginator(Project.objects.order_by('pk'), 2).count
+        self.assertEqual(count, 3)
+        self.assertIn('LIMIT 3', queries[0]['sql'])
+
+
+class AsyncURLConf:
+    """The API as served under ASGI (API_ASYNC_VIEWS)."""
+    urlpatterns = [path('api/', include([
+        path('projects/<int:project_id>', async_views.project_detail_endpoint),
+        path('comments/<int:project_id>/', async_views.comments_endpoint),
+        path('ai_feedback/<int:project_id>/', async_views.analyze_project_with_ai),
+        path('ai_rank_projects/', async_views.rank_projects_by_interests),
+    ]))]
+
+
+class SlowModel:
+    """Stands in for the LLM client: every call takes `latency` seconds."""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def generate_content(self, prompt, generation_config=None):
+        time.sleep(self.latency)
+        return self.reply(prompt)
+
+    async def generate_content_async(self, prompt, generation_config=None):
+        await asyncio.sleep(self.latency)
+        return self.reply(prompt)
+
+    def reply(self, prompt):
+        return mock.Mock(text='{"summary": "ok"}' if 'JSON object' in prompt else '7')
+
+
+@override_settings(ROOT_URLCONF=AsyncURLConf)
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        self.user = make_user('async-reader')
+        self.project = Project.objects.create(author=self.user, name='Park', description='d', city='Vilnius', location='L')
+        Vote.objects.create(user=self.user, project=self.project, value=1)
+        Comment.objects.create(user=self.user, project=self.project, content='first')
+        self.async_client = AsyncClient()
+        throttling.reset()
+
+    async def test_reads_match_the_drf_views(self):
+        await self.async_client.aforce_login(self.user)
+        await sync_to_async(self.client.force_login)(self.user)
+        for url in (f'/api/projects/{self.project.id}', f'/api/comments/{self.project.id}/'):
+            response = await self.async_client.get(url)
+            with override_settings(ROOT_URLCONF='backend.urls'):
+                expected = await sync_to_async(self.client.get)(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.content, expected.content)
+        self.assertEqual((await self.async_client.get('/api/projects/999999')).status_code, 404)
+
+    async def test_login_required_and_csrf_follow_drf(self):
+        # Anonymous requests to a login-only endpoint get DRF's own answer
+        self.assertEqual((await self.async_client.get(f'/api/ai_feedback/{self.project.id}/')).status_code, 403)
+
+        client = AsyncClient(enforce_csrf_checks=True)
+        body = {'prompt': 'parks'}
+        with mock.patch('api.feedback_ai.model', SlowModel(0)):
+            self.assertEqual((await client.post('/api/ai_rank_projects/', body, content_type='application/json')).status_code, 200)
+            await client.aforce_login(self.user)
+            response = await client.post('/api/ai_rank_projects/', body, content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+        self.assertIn('CSRF Failed', response.json()['detail'])
+
+    async def test_llm_calls_overlap(self):
+        for i in range(4):
+            await Project.objects.acreate(author=self.user, name=f'Garden {i}', description='d', city='Vilnius', location='L')
+        await self.async_client.aforce_login(self.user)
+        latency = 0.2
+        with mock.patch('api.feedback_ai.model', SlowModel(latency)):
+            started = time.perf_counter()
+            responses = await asyncio.gather(
+                self.async_client.post('/api/ai_rank_projects/', {'prompt': 'parks'}, content_type='application/json'),
+                self.async_client.get(f'/api/ai_feedback/{self.project.id}/'),
+            )
+            elapsed = time.perf_counter() - started
+        ranking, analysis = (response.json() for response in responses)
+        self.assertEqual(len(ranking['projects']), 5)
+        self.assertEqual(ranking['projects'][0]['score'], 7)
+        self.assertEqual(analysis['analysis'], {'summary': 'ok'})
+        # 12 calls one after another would take 2.4 s: scoring and summary are two rounds
+        self.assertLess(elapsed, latency * 5)
+
+
+@override_settings(THROTTLE_BUDGETS={'anon': (3, 0.001), 'user': (5, 0.001)}, THROTTLE_COSTS={'ping': 2})
+class ThrottleTests(TestCase):
+    def setUp(self):
+        throttling.reset()
+
+    def test_bucket_refills_over_time(self):
+        state, wait = throttling.spend(None, 100.0, 4, capacity=5, rate=2)
+        self.assertEqual((state, wait), ((1, 100.0), None))
+        state, wait = throttling.spend(state, 100.5, 4, capacity=5, rate=2)
+        self.assertEqual(wait, 1.0)
+        self.assertIsNone(throttling.spend(state, 101.5, 4, capacity=5, rate=2)[1])
+
+    def test_costs_and_separate_budgets(self):
+        # ping costs 2 of the 3 anonymous tokens
+        self.assertEqual(self.client.get('/api/ping/').status_code, 200)
+        response = self.client.get('/api/ping/')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        # Cheap views still fit in what is left
+        self.assertEqual(self.client.get('/api/projects/facets/').status_code, 200)
+
+        self.client.force_login(make_user('regular'))
+        self.assertEqual([self.client.get('/api/ping/').status_code for _ in range(3)], [200, 200, 429])
+
+    def test_forwarded_for_header_does_not_reset_the_bucket(self):
+        statuses = [
+            self.client.get('/api/ping/', HTTP_X_FORWARDED_FOR=f'10.0.0.{i}').status_code for i in range(3)
+        ]
+        self.assertEqual(statuses, [200, 429, 429])
+
+    @override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1})
+    def test_clients_behind_a_proxy_are_told_apart(self):
+        # Only the address the trusted proxy appended counts
+        send = lambda forwarded: self.client.get('/api/ping/', HTTP_X_FORWARDED_FOR=forwarded).status_code
+        self.assertEqual([send('1.1.1.1, 10.0.0.1'), send('2.2.2.2, 10.0.0.1'), send('3.3.3.3, 10.0.0.2')], [200, 429, 200])
+
+
+@override_settings(ROOT_URLCONF=AsyncURLConf, LLM_MAX_CONCURRENCY=4, SLOW_REQUEST_THRESHOLD_MS=60000)
+class ThrottleLatencyTests(TestCase):
+    LLM_LATENCY = 0.05
+
+    def setUp(self):
+        self.user = make_user('regular')
+        self.projects = [
+            Project.objects.create(author=self.user, name=f'Park {i}', description='d', city='Vilnius', location='L')
+            for i in range(3)
+        ]
+
+    async def burst(self):
+        """
+        20 concurrent anonymous AI rankings (7 LLM calls each) while a normal
+        user asks for AI feedback 5 times; returns the user's latencies and
+        the burst's status codes.
+        """
+        throttling.reset()
+        abuser, user = AsyncClient(), AsyncClient()
+        await user.aforce_login(self.user)
+
+        async def normal_use():
+            latencies = []
+            for _ in range(5):
+                started = time.perf_counter()
+                response = await user.get(f'/api/ai_feedback/{self.projects[0].id}/')
+                latencies.append(time.perf_counter() - started)
+                self.assertEqual(response.status_code, 200)
+            return latencies
+
+        with mock.patch('api.feedback_ai.model', SlowModel(self.LLM_LATENCY)):
+            abuse = [abuser.post('/api/ai_rank_projects/', {'prompt': 'x'}, content_type='application/json') for _ in range(20)]
+            latencies, *responses = await asyncio.gather(normal_use(), *abuse)
+        return latencies, [response.status_code for response in responses]
+
+    async def test_tail_latency_stays_bounded_during_a_burst(self):
+        with override_settings(THROTTLE_ENABLED=False):
+            unthrottled, _ = await self.burst()
+        throttled, statuses = await self.burst()
+
+        # The anonymous budget pays for one ranking, the rest are turned away
+        self.assertEqual(sorted(statuses), [200] + [429] * 19)
+        # Unthrottled, the user's LLM calls queue behind ~140 of the burst's
+        self.assertGreater(max(unthrottled), 10 * self.LLM_LATENCY)
+        # ~3 model latencies against ~35; relative, so a loaded machine slows both runs alike
+        self.assertLess(max(throttled), max(unthrottled) / 4)
+
+
+@override_settings(IDEMPOTENCY_ENABLED=True)
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        throttling.reset()
+        cache.clear()
+        self.user = make_user('regular')
+        self.project = Project.objects.create(author=make_user('author'), name='Park', description='d', city='Vilnius', location='L')
+        self.client.force_login(self.user)
+
+    def comment(self, content, key='retry-1'):
+        return self.client.post(
+            f'/api/comments/{self.project.id}/', {'content': content},
+            content_type='application/json', HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_retry_replays_the_stored_response(self):
+        first = self.comment('Nice')
+        with self.assertNumQueries(0):
+            retry = self.comment('Nice')
+        self.assertEqual((retry.status_code, retry.json()), (201, first.json()))
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Comment.objects.count(), 1)
+        # Another key, or none, is another request
+        self.assertEqual(self.comment('Nice', key='retry-2').status_code, 201)
+        self.assertEqual(Comment.objects.count(), 2)
+
+    def test_only_json_bodies_take_a_key(self):
+        upload = io.BytesIO(b'file contents')
+        upload.name = 'notes.txt'
+        response = self.client.post(
+            f'/api/comments/{self.project.id}/', {'content': 'Nice', 'attachment': upload}, HTTP_IDEMPOTENCY_KEY='retry-1',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Comment.objects.count(), 0)
+
+    @override_settings(IDEMPOTENCY_ENABLED=False)
+    def test_key_is_ignored_without_a_shared_cache(self):
+        self.comment('Nice')
+        self.assertNotIn('Idempotent-Replayed', self.comment('Nice'))
+        self.assertEqual(Comment.objects.count(), 2)
+
+    def test_key_reused_for_a_different_body(self):
+        self.comment('Nice')
+        self.assertEqual(self.comment('Changed my mind').status_code, 422)
+        self.assertEqual(Comment.objects.count(), 1)
+
+    def test_concurrent_duplicate_and_collisions(self):
+        key = idempotency.cache_key(mock.Mock(user=self.user, META={}), 'comment_on_project', 'retry-1')
+        cache.add(key + ':lock', 1)
+        response = self.comment('Nice')
+        self.assertEqual((response.status_code, response['Retry-After']), (409, '1'))
+        self.assertEqual(Comment.objects.count(), 0)
+        cache.delete(key + ':lock')
+
+        # A retried participation request replays its 201 instead of the "already sent" error
+        send = lambda: self.client.post(
+            f'/api/participation_requests/{self.project.id}/', {'message': 'Count me in'},
+            content_type='application/json', HTTP_IDEMPOTENCY_KEY='join',
+        )
+        self.assertEqual([send().status_code, send().status_code], [201, 201])
+
+
+class DuplicateDetectionTests(TestCase):
+    DESCRIPTION = (
+        'Volunteers plant native trees along the river bank every Saturday morning, '
+        'bring gloves and water, tools are provided by the city park service.'
+    )
+
+    def setUp(self):
+        throttling.reset()
+        self.user = make_user('regular')
+        self.client.force_login(self.user)
+
+    def create(self, name, description, city='Vilnius'):
+        return self.client.post('/api/projects/', {
+            'name': name, 'description': description, 'city': city, 'location': 'River bank',
+        }, content_type='application/json')
+
+    def test_signature_similarity_tracks_text_overlap(self):
+        signature = duplicates.minhash('Tree planting', self.DESCRIPTION)
+        edited = duplicates.minhash('Tree planting!', self.DESCRIPTION.replace('Saturday', 'Sunday'))
+        unrelated = duplicates.minhash('Chess club', 'Weekly chess evenings for beginners in the library.')
+        self.assertGreater(duplicates.similarity(signature, edited), 0.7)
+        self.assertLess(duplicates.similarity(signature, unrelated), 0.2)
+        self.assertEqual(duplicates.unpack(duplicates.pack(signature)), signature)
+
+    def test_create_and_update_report_possible_duplicates(self):
+        self.assertEqual(self.create('Tree planting', self.DESCRIPTION).json()['possible_duplicates'], [])
+        self.create('Tree planting', self.DESCRIPTION, city='Kaunas')
+        original = Project.objects.get(name='Tree planting', city='Vilnius')
+
+        # Insert, facet count, signature, bands and one candidate lookup
+        with self.assertNumQueries(5):
+            response = self.create('Tree planting by the river', self.DESCRIPTION)
+        self.assertEqual([match['id'] for match in response.json()['possible_duplicates']], [original.id])
+
+        copy = Project.objects.get(name='Tree planting by the river')
+        response = self.client.put(
+            f'/api/projects/{copy.id}', {'description': 'Weekly chess evenings for beginners.'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.json()['possible_duplicates'], [])
+
+    def test_find_duplicates_clusters_imported_projects(self):
+        rows = [
+            (1, {'name': 'Tree planting', 'description': self.DESCRIPTION, 'city': 'Vilnius', 'location': 'L'}, None),
+            (2, {'name': 'Tree planting 2', 'description': self.DESCRIPTION + ' Again.', 'city': 'Vilnius', 'location': 'L'}, None),
+            (3, {'name': 'Chess club', 'description': 'Weekly chess evenings.', 'city': 'Vilnius', 'location': 'L'}, None),
+        ]
+        import_projects(rows)
+        with tempfile.NamedTemporaryFile(suffix='.json') as output:
+            call_command('find_duplicates', output=output.name, stdout=io.StringIO())
+            clusters = json.load(output)
+        self.assertEqual([[project['name'] for project in cluster] for cluster in clusters], [['Tree planting', 'Tree planting 2']])
+
+
+class FeedTests(TestCase):
+    def setUp(self):
+        throttling.reset()
+        self.user = make_user('reader')
+        self.user.bio = 'I love gardening and planting trees'
+        self.user.save()
+        author = make_user('author')
+
+        def project(name, description, city='Vilnius', author=author):
+            return Project.objects.create(author=author, name=name, description=description, city=city, location='L')
+
+        self.garden = project('Community garden', 'Planting vegetables and trees together')
+        self.chess = project('Chess club', 'Weekly chess evenings')
+        self.bikes = project('Bike repair', 'Fixing bikes for kids')
+        self.elsewhere = project('Garden in Kaunas', 'Planting trees', city='Kaunas')
+        self.own = project('My garden', 'Planting trees', author=self.user)
+        self.client.force_login(self.user)
+
+    def test_feed_ranks_city_projects_by_interests(self):
+        Vote.objects.create(user=self.user, project=self.bikes, value=1)
+        Vote.objects.create(user=self.user, project=self.chess, value=-1)
+        self.assertEqual(feed.build_feeds(), 2)
+
+        ids = UserFeed.objects.get(user=self.user).project_ids
+        # Other cities and the user's own projects are left out
+        self.assertEqual(ids, [self.garden.id, self.bikes.id, self.chess.id])
+
+    def test_pages_come_from_the_stored_feed(self):
+        feed.build_feeds([self.user.id])
+        self.client.get('/api/feed/')
+        # The feed row by primary key, then the page's projects
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/feed/?offset=1&limit=1&view=card')
+        body = response.json()
+        self.assertEqual([item['id'] for item in body['results']], [self.bikes.id])
+        self.assertEqual((body['count'], body['offset'], body['limit']), (3, 1, 1))
+        self.assertEqual(self.client.get('/api/feed/?offset=-1').status_code, 400)
+
+    def test_missing_feed_is_built_on_first_request(self):
+        self.assertFalse(UserFeed.objects.exists())
+        response = self.client.get('/api/feed/')
+        self.assertEqual(response.json()['results'][0]['id'], self.garden.id)
+        self.assertTrue(UserFeed.objects.filter(user=self.user).exists())
+        self.client.logout()
+        self.assertEqual(self.client.get('/api/feed/').status_code, 403)
+
+
+class ParticipationResponseTests(TestCase):
+    def setUp(self):
+        self.author = make_user('author')
+        self.project = Project.objects.create(author=self.author, name='Park', description='d', city='Vilnius', location='L')
+        other = Project.objects.create(author=make_user('other'), name='Lake', description='d', city='Vilnius', location='L')
+        self.applicants = [make_user(f'applicant{i}') for i in range(3)]
+        self.requests = [
+            ParticipationRequest.objects.create(user=user, project=self.project, message='Hi')
+            for user in self.applicants
+        ]
+        self.foreign = ParticipationRequest.objects.create(user=self.applicants[0], project=other, message='Hi')
+        self.client.force_login(self.author)
+
+    def bulk(self, action, *requests, missing=()):
+        response = self.client.post('/api/handle_participation_requests/', {
+            'action': action, 'request_ids': [request.id for request in requests] + list(missing),
+        }, content_type='application/json')
+        return {item['id']: item['outcome'] for item in response.json()['results']}
+
+    def members(self):
+        return set(Participant.objects.filter(project=self.project).values_list('user__username', flat=True))
+
+    def test_bulk_outcomes(self):
+        first, second, _ = self.requests
+        self.assertEqual(self.bulk('approve', first, self.foreign, missing=[999999]), {
+            first.id: 'approved', self.foreign.id: 'forbidden', 999999: 'not_found',
+        })
+        self.assertEqual(self.bulk('approve', first, second), {first.id: 'unchanged', second.id: 'approved'})
+        self.foreign.refresh_from_db()
+        self.assertEqual(self.foreign.status, 'pending')
+        self.assertEqual(self.members(), {'applicant0', 'applicant1'})
+
+    def test_only_bulk_rejections_revoke_membership(self):
+        first, second, third = self.requests
+        self.bulk('approve', first, second)
+        self.assertEqual(self.bulk('reject', first, third), {first.id: 'rejected', third.id: 'rejected'})
+        self.assertEqual(self.members(), {'applicant1'})
+
+        respond = lambda request, action: self.client.post(
+            f'/api/handle_participation_request/{request.id}/', {'action': action}, content_type='application/json',
+        )
+        self.assertEqual(respond(second, 'reject').json()['status'], 'rejected')
+        self.assertEqual(self.members(), {'applicant1'})
+        # Approving after a bulk approval keeps a single membership
+        self.bulk('approve', third)
+        self.assertEqual(respond(third, 'approve').status_code, 200)
+        self.assertEqual(self.members(), {'applicant1', 'applicant2'})
+        self.assertEqual(respond(self.foreign, 'approve').status_code, 403)
+
+    def test_cached_requests_show_current_score_and_members(self):
+        applicant, voter = self.applicants[0], self.applicants[2]
+
+        def project_info():
+            self.client.force_login(applicant)
+            info = self.client.get('/api/my_participation_requests/').json()
+            return {item['project_info']['id']: item['project_info'] for item in info}[self.project.id]
+
+        self.assertEqual((project_info()['score'], project_info()['participants_count']), (0, 0))
+        self.client.force_login(voter)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(f'/api/vote/{self.project.id}/', {'value': 1}, content_type='application/json')
+        # Voting does not look up who asked to join the project
+        self.assertFalse([q for q in queries if ParticipationRequest._meta.db_table in q['sql']])
+        self.assertEqual(project_info()['score'], 1)
+        self.client.force_login(voter)
+        self.client.delete(f'/api/vote/{self.project.id}/')
+        self.assertEqual(project_info()['score'], 0)
+
+        # Another applicant joining, by hand or through a bulk approval
+        Participant.objects.create(user=self.applicants[1], project=self.project, role='member')
+        self.assertEqual(project_info()['participants_count'], 1)
+        self.client.force_login(self.author)
+        self.bulk('approve', self.requests[2])
+        self.assertEqual(project_info()['participants_count'], 2)
+        Participant.objects.filter(project=self.project).delete()
+        self.assertEqual(project_info()['participants_count'], 0)
+
+
+class ParticipationRequestPaginationTests(QueryPerformanceMixin, TestCase):
+    def setUp(self):
+        self.author = make_user('author')
+        self.projects = [
+            Project.objects.create(author=self.author, name=name, description='d', city='Vilnius', location='L')
+            for name in ('Park', 'Lake')
+        ]
+        applicants = [make_user(f'applicant{i}') for i in range(5)]
+        self.requests = [
+            ParticipationRequest.objects.create(user=user, project=project, message='Hi')
+            for project in self.projects for user in applicants
+        ]
+        # Equal timestamps make the id tie-break decide the order across pages
+        ParticipationRequest.objects.filter(pk__in=[r.pk for r in self.requests[:4]]).update(
+            created_at=self.requests[0].created_at,
+        )
+        self.client.force_login(self.author)
+
+    def walk(self, url):
+        ids, cursor = [], None
+        while True:
+            params = {'limit': 3, **({'cursor': cursor} if cursor else {})}
+            page = self.client.get(url, params).json()
+            self.assertLessEqual(len(page['results']), 3)
+            ids += [item['id'] for item in page['results']]
+            cursor = page['next_cursor']
+            if cursor is None:
+                return ids
+
+    def test_cursor_pages_cover_every_row_once(self):
+        newest_first = ParticipationRequest.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        self.assertEqual(self.walk('/api/participation_requests/inbox/'), list(newest_first))
+        project = self.projects[0]
+        self.assertEqual(
+            self.walk(f'/api/participation_requests/{project.id}/'), list(newest_first.filter(project=project)),
+        )
+        # Without limit or cursor the list stays a plain array
+        self.assertEqual(len(self.client.get('/api/participation_requests/inbox/').json()), len(self.requests))
+
+    def test_invalid_cursor_or_limit(self):
+        forged = base64.urlsafe_b64encode(b'["not a date", 1]').decode()
+        for params in ({'cursor': 'garbage'}, {'cursor': forged}, {'limit': 'ten'}):
+            response = self.client.get('/api/participation_requests/inbox/', params)
+            self.assertEqual(response.status_code, 400, params)
+
+    @skipUnless(connection.vendor == 'sqlite', "Query plans are checked with SQLite's EXPLAIN QUERY PLAN")
+    def test_project_requests_page_uses_the_status_index(self):
+        url = f'/api/participation_requests/{self.projects[0].id}/?status=pending&limit=3'
+        plans = self.explain_request(lambda: self.client.get(url))
+        self.assertTrue(
+            any('api_partreq_proj_status_idx' in line for _, plan in plans for line in plan),
+            plans,
+        )
+
+
+class NearbyProjectTests(TestCase):
+    def setUp(self):
+        author = make_user('author')
+        # Roughly 0, 0.7, 1.4 and 2.1 km north of the query point, plus Kaunas
+        places = [(f'Spot {i}', 54.6872 + 0.0063 * i, 25.2797) for i in range(4)] + [('Kaunas', 54.8985, 23.9036)]
+        for name, latitude, longitude in places:
+            Project.objects.create(
+                author=author, name=name, description='d', city='Vilnius', location='L',
+                latitude=latitude, longitude=longitude,
+            )
+
+    def near(self, **params):
+        return self.client.get('/api/projects/', {'near': '54.6872,25.2797', 'radius': 5, **params})
+
+    def test_results_are_paged_by_distance(self):
+        everything = self.near().json()
+        self.assertEqual([item['name'] for item in everything], ['Spot 0', 'Spot 1', 'Spot 2', 'Spot 3'])
+        self.assertEqual(
+            [item['distance_km'] for item in everything], sorted(item['distance_km'] for item in everything),
+        )
+        first, rest = self.near(limit=2).json(), self.near(limit=2, offset=2).json()
+        self.assertEqual([item['name'] for item in first + rest], [item['name'] for item in everything])
+        self.assertEqual(self.near(offset=4).json(), [])
+        for params in ({'limit': 0}, {'offset': -1}, {'limit': 'all'}):
+            self.assertEqual(self.near(**params).status_code, 400, params)
+
+    def test_covering_ranges_hold_every_point_in_range(self):
+        def destination(latitude, longitude, km, bearing):
+            angle, lat, bearing = km / geo.EARTH_RADIUS_KM, math.radians(latitude), math.radians(bearing)
+            end = math.asin(math.sin(lat) * math.cos(angle) + math.cos(lat) * math.sin(angle) * math.cos(bearing))
+            lon = math.radians(longitude) + math.atan2(
+                math.sin(bearing) * math.sin(angle) * math.cos(lat), math.cos(angle) - math.sin(lat) * math.sin(end),
+            )
+            return math.degrees(end), (math.degrees(lon) + 540.0) % 360.0 - 180.0
+
+        # Mid-latitude, next to the antimeridian and close to a pole
+        for latitude, longitude in ((54.6872, 25.2797), (-16.5, 179.99), (89.5, 10.0)):
+            for radius in (0.5, 5, 50):
+                ranges = geo.covering_ranges(latitude, longitude, radius)
+                for bearing in range(0, 360, 45):
+                    point = destination(latitude, longitude, radius * 0.999, bearing)
+                    self.assertTrue(
+                        any(low <= geo.encode_geohash(*point) < high for low, high in ranges),
+                        (latitude, longitude, radius, point),
+                    )
+
+
+class FacetAndAutocompleteTests(TestCase):
+    def setUp(self):
+        self.author = make_user('author')
+
+    def create(self, name):
+        return Project.objects.create(author=self.author, name=name, description='d', city='Vilnius', location='L')
+
+    def test_drifted_facet_counts_stop_at_zero(self):
+        project = self.create('Park')
+        key = facets.facet_key(project)
+        CityStatusCount.objects.filter(city='Vilnius').update(count=0)
+        project.delete()
+        facets.adjust(key, -3)
+        self.assertEqual(CityStatusCount.objects.get(city='Vilnius').count, 0)
+
+        self.create('Lake')
+        call_command('rebuild_facets', stdout=io.StringIO())
+        self.assertEqual(CityStatusCount.objects.get(city='Vilnius').count, 1)
+
+    def test_updates_during_a_build_survive_it(self):
+        kept, gone = self.create('Old park'), self.create('Old lake')
+        index = autocomplete.AutocompleteIndex()
+        name_keys = autocomplete._name_keys
+
+        def build_with(write):
+            calls = []
+
+            def reading_table(name):
+                # Runs inside build(), after the table was read and before the swap
+                if not calls:
+                    calls.append(name)
+                    writer = threading.Thread(target=write)
+                    writer.start()
+                    writer.join(timeout=5)
+                    self.assertFalse(writer.is_alive(), "Writer waited for the build")
+                return name_keys(name)
+
+            return mock.patch.object(autocomplete, '_name_keys', reading_table)
+
+        names = lambda prefix: [project['name'] for project in index.search(prefix)['projects']]
+        # First, lazy build
+        with build_with(lambda: index.update_project(kept.pk, 'Old park renamed', 'Vilnius')):
+            self.assertEqual(names('old'), ['Old lake', 'Old park renamed'])
+        # The write the journaled update stood for, seen by the next build
+        Project.objects.filter(pk=kept.pk).update(name='Old park renamed')
+
+        def writes():
+            index.update_project(999999, 'Fresh garden', 'Vilnius')
+            index.remove_project(gone.pk)
+
+        # Periodic rebuild
+        with build_with(writes):
+            index.build()
+        self.assertEqual(names('fresh'), ['Fresh garden'])
+        self.assertEqual(names('old'), ['Old park renamed'])
+
+
+class ProjectDeletionTests(TestCase):
+    def setUp(self):
+        self.author = make_user('author')
+        self.client.force_login(self.author)
+        self.project = Project.objects.create(author=self.author, name='Park', description='d', city='Vilnius', location='L')
+        for i in range(3):
+            user = make_user(f'neighbour{i}')
+            Vote.objects.create(user=user, project=self.project, value=1)
+            Comment.objects.create(user=user, project=self.project, content='c')
+            ParticipationRequest.objects.create(user=user, project=self.project, message='Hi')
+        Participant.objects.create(user=user, project=self.project, role='member')
+        self.relations = [rel for rel in Project._meta.related_objects if rel.on_delete is models.CASCADE]
+
+    def cascaded_rows(self):
+        return {
+            rel.related_model.__name__: rel.related_model._base_manager.filter(**{rel.field.attname: self.project.pk}).count()
+            for rel in self.relations
+        }
+
+    def test_purge_removes_every_cascaded_row(self):
+        before = self.cascaded_rows()
+        # Signature and bands come from duplicate detection, the rest from setUp
+        self.assertTrue(all(before.values()), before)
+        self.assertEqual(count_project_rows(self.project.pk), sum(before.values()))
+
+        self.assertEqual(self.client.delete(f'/api/projects/{self.project.pk}').status_code, 204)
+        self.assertEqual(set(self.cascaded_rows().values()), {0})
+        self.assertFalse(Project.objects.filter(pk=self.project.pk).exists())
+        self.assertEqual(CityStatusCount.objects.get(city='Vilnius').count, 0)
+
+    @override_settings(PROJECT_DELETE_BACKGROUND_THRESHOLD=0)
+    def test_tombstoned_project_is_hidden_until_purged(self):
+        # The queued purge is left pending, as if the worker had not got to it
+        with self.captureOnCommitCallbacks(execute=False):
+            self.assertEqual(self.client.delete(f'/api/projects/{self.project.pk}').status_code, 202)
+
+        self.assertFalse(Project.live.filter(pk=self.project.pk).exists())
+        self.assertTrue(Project.objects.get(pk=self.project.pk).is_deleted)
+        self.assertNotIn(self.project.pk, [item['id'] for item in self.client.get('/api/projects/').json()])
+        self.assertEqual(self.client.get(f'/api/projects/{self.project.pk}').status_code, 404)
+        self.assertEqual(CityStatusCount.objects.get(city='Vilnius').count, 0)
+        # Its requests can no longer be answered, one at a time or in bulk
+        pending = ParticipationRequest.objects.filter(project=self.project).first()
+        approve = {'action': 'approve'}
+        self.assertEqual(self.client.post(
+            f'/api/handle_participation_request/{pending.pk}/', approve, content_type='application/json',
+        ).status_code, 404)
+        response = self.client.post(
+            '/api/handle_participation_requests/', {**approve, 'request_ids': [pending.pk]}, content_type='application/json',
+        )
+        self.assertEqual(response.json()['results'][0]['outcome'], 'not_found')
+        self.assertEqual(Participant.objects.filter(project=self.project).count(), 1)
+        # Dumps still carry the project its votes and comments point at
+        dump = io.StringIO()
+        call_command('dumpdata', 'api.project', stdout=dump)
+        self.assertIn(self.project.pk, [row['pk'] for row in json.loads(dump.getvalue())])
+
+        call_command('purge_deleted_projects', stdout=io.StringIO())
+        self.assertFalse(Project.objects.filter(pk=self.project.pk).exists())
+        self.assertEqual(set(self.cascaded_rows().values()), {0})
+
+
+class MetricsTests(TestCase):
+    def test_scrapes_need_an_allowed_address_or_staff(self):
+        self.client.get('/api/ping/')
+        self.assertEqual(self.client.get('/api/metrics').status_code, 403)
+        self.client.force_login(make_user('visitor'))
+        self.assertEqual(self.client.get('/api/metrics').status_code, 403)
+
+        self.client.force_login(make_user('operator', is_staff=True))
+        response = self.client.get('/api/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'api_requests_total{view="ping",method="GET",status="200"}', response.content)
+
+        self.client.logout()
+        with override_settings(METRICS_ALLOWED_IPS=['127.0.0.1']):
+            self.assertEqual(self.client.get('/api/metrics').status_code, 200)
+
+    def test_idle_workers_still_flush(self):
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(METRICS_MULTIPROC_DIR=directory, METRICS_FLUSH_SECONDS=0.05):
+            self.client.get('/api/ping/')
+            path = os.path.join(directory, f'{os.getpid()}.json')
+            # No request after the first: only the flush thread can write this
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline:
+                before = metrics.local_snapshot()
+                if os.path.exists(path):
+                    with open(path) as f:
+                        if {(name, tuple(labels)): value for name, labels, value in json.load(f)} == before:
+                            break
+                time.sleep(0.05)
+            else:
+                self.fail("Metrics were not flushed without further requests")
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        self.staff = make_user('operator', is_staff=True, is_superuser=True)
+        Project.objects.create(author=self.staff, name='Park', description='d', city='Vilnius', location='L')
+
+    def test_staff_requests_are_profiled_and_browsable(self):
+        self.client.force_login(self.staff)
+        for mode in ('1', 'sample'):
+            response = self.client.get('/api/projects/', HTTP_X_PROFILE=mode)
+            self.assertEqual(response.status_code, 200)
+            profile = RequestProfile.objects.get(pk=response['X-Profile-Id'])
+            self.assertEqual((profile.user, profile.view, profile.status_code), (self.staff, 'projects_endpoint', 200))
+        cprofile = RequestProfile.objects.get(mode='cprofile')
+        self.assertTrue(cprofile.pstats and cprofile.top_functions)
+
+        for url in (
+            '/admin/api/requestprofile/',
+            f'/admin/api/requestprofile/{cprofile.pk}/change/',
+            f'/admin/api/requestprofile/{cprofile.pk}/download/',
+            '/admin/api/requestprofile/top-functions/',
+        ):
+            self.assertEqual(self.client.get(url).status_code, 200, url)
+
+    def test_other_requests_are_not_profiled(self):
+        self.client.force_login(make_user('visitor'))
+        response = self.client.get('/api/projects/', HTTP_X_PROFILE='1')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile-Id', response)
+        self.client.force_login(self.staff)
+        self.assertNotIn('X-Profile-Id', self.client.get('/api/projects/', HTTP_X_PROFILE='off'))
+        self.assertFalse(RequestProfile.objects.exists())
+
+
+class InstrumentationTests(TestCase):
+    def test_api_requests_report_server_timing(self):
+        Project.objects.create(author=make_user('author'), name='Park', description='d', city='Vilnius', location='L')
+        with self.assertLogs('api.timing', 'INFO') as logs:
+            response = self.client.get('/api/projects/')
+        timings = [part.split(';') for part in response['Server-Timing'].split(', ')]
+        self.assertEqual([timing[0] for timing in timings], ['db', 'serialize', 'total'])
+        self.assertTrue(all(timing[1].startswith('dur=') for timing in timings), timings)
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual((record['view'], record['status']), ('projects_endpoint', 200))
+        self.assertEqual(timings[0][2], f'desc="{record["queries"]} queries"')
+
+    def test_other_views_are_not_timed(self):
+        response = self.client.get('/admin/login/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Server-Timing', response)
@@ -0,0 +1,123 @@
+"""
+Cost-weighted token-bucket throttling. Every client - a user, or an IP for
+anonymous requests - has a bucket of THROTTLE_BUDGETS[kind] tokens that
+refills continuously; a request spends the cost of its view from
+THROTTLE_COSTS (1 when not listed), so one AI ranking weighs as much as
+dozens of reads. Rejected requests get 429 with Retry-After.
+
+Buckets live in this process (THROTTLE_STORE = 'local') or in the default
+cache (THROTTLE_STORE = 'cache'), which with Redis shares them between
+workers. The cache store reads and writes without a lock, so concurrent
+requests of one client may overspend by a request or two.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+
+KEY_PREFIX = 'throttle:'
+# Clients whose buckets the local store remembers; the least recently seen go first
+LOCAL_MAX_KEYS = 100000
+
+
+def budget(kind):
+    """(capacity, tokens refilled per second) for 'anon' or 'user'."""
+    return settings.THROTTLE_BUDGETS[kind]
+
+
+def cost(view_name):
+    return settings.THROTTLE_COSTS.get(view_name, 1)
+
+
+def spend(state, now, amount, capacity, rate):
+    """
+    Refill a (tokens, timestamp) bucket state up to `now` and take `amount`
+    from it. Returns the new state and the seconds to wait, None if allowed.
+    """
+    tokens, stamp = state if state is not None else (capacity, now)
+    tokens = min(capacity, tokens + max(0.0, now - stamp) * rate)
+    # A view dearer than the whole bucket can still be used once it is full
+    amount = min(amount, capacity)
+    if tokens >= amount:
+        return (tokens - amount, now), None
+    return (tokens, now), (amount - tokens) / rate
+
+
+class LocalBuckets:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = OrderedDict()
+
+    def take(self, key, amount, capacity, rate):
+        with self.lock:
+            state, wait = spend(self.buckets.get(key), time.monotonic(), amount, capacity, rate)
+            self.buckets[key] = state
+            self.buckets.move_to_end(key)
+            if len(self.buckets) > LOCAL_MAX_KEYS:
+                self.buckets.popitem(last=False)
+        return wait
+
+    def clear(self):
+        with self.lock:
+            self.buckets.clear()
+
+
+class CacheBuckets:
+    def take(self, key, amount, capacity, rate):
+        state, wait = spend(cache.get(KEY_PREFIX + key), time.time(), amount, capacity, rate)
+        # An untouched bucket is full again after capacity / rate seconds
+        cache.set(KEY_PREFIX + key, state, timeout=int(capacity / rate) + 1)
+        return wait
+
+
+_local = LocalBuckets()
+_cache = CacheBuckets()
+
+
+def store():
+    return _cache if settings.THROTTLE_STORE == 'cache' else _local
+
+
+def client_key(request, ident):
+    user = request.user
+    if user is not None and user.is_authenticated:
+        return 'user', f'user:{user.pk}'
+    return 'anon', f'anon:{ident}'
+
+
+def consume(request, view_name, ident):
+    """Charge the request's client for `view_name`: seconds to wait, or None if allowed."""
+    if not settings.THROTTLE_ENABLED:
+        return None
+    kind, key = client_key(request, ident)
+    capacity, rate = budget(kind)
+    return store().take(key, cost(view_name), capacity, rate)
+
+
+async def aconsume(request, view_name, ident):
+    """consume() for async views; the local store needs no thread."""
+    if not settings.THROTTLE_ENABLED or store() is _local:
+        return consume(request, view_name, ident)
+    return await sync_to_async(consume)(request, view_name, ident)
+
+
+def reset():
+    """Forget the local buckets, for tests."""
+    _local.clear()
+
+
+class CostThrottle(BaseThrottle):
+    """DRF throttle charging each request the cost of the view it calls."""
+
+    def allow_request(self, request, view):
+        # @api_view views are generated classes named after their function
+        self.wait_seconds = consume(request, type(view).__name__, self.get_ident(request))
+        return self.wait_seconds is None
+
+    def wait(self):
+        return self.wait_seconds
@@ -1,20 +1,43 @@
+from django.conf import settings
 from django.urls import path, include
 from .views import *
 
+if settings.API_ASYNC_VIEWS:
+    # Under ASGI these endpoints run as coroutines, see api.async_views
+    from .async_views import (
+        analyze_project_with_ai,
+        comments_endpoint,
+        project_detail_endpoint,
+        rank_projects_by_interests,
+    )
+
 urlpatterns = [
     path('ping/', ping),
+    path('metrics', metrics),
 
     # Projects
     path('projects/', projects_endpoint),
+    path('projects/facets/', project_facets),
+    path('feed/', user_feed),
+    path('projects/import/', import_projects_upload),
+    path('autocomplete/', autocomplete),
     path('projects/<int:project_id>', project_detail_endpoint),
     path('vote/<int:project_id>/', vote_for_project),
     path('comments/<int:project_id>/', comments_endpoint),
     path('delete_comment/<int:comment_id>/', delete_comment),
+    path('participation_requests/inbox/', participation_requests_inbox),
     path('participation_requests/<int:project_id>/', participation_requests_endpoint),
     path('handle_participation_request/<int:request_id>/', respond_to_participation_request),
+    path('handle_participation_requests/', bulk_respond_to_participation_requests),
     path('my_participation_requests/', my_participation_requests),
     path('participants/<int:project_id>/', get_participants),
 
+    # Analytics exports (staff)
+    path('exports/', queue_export),
+    path('exports/<int:export_id>/', export_status),
+    path('exports/<int:export_id>/download/', download_export),
+    path('exports/stream/<str:dataset>/', export_dataset),
+
     # AI
     path('ai_feedback/<int:project_id>/', analyze_project_with_ai),
     path('ai_rank_projects/', rank_projects_by_interests),
@@ -1,15 +1,44 @@
+import heapq
+
+from django.conf import settings
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden, HttpResponseGone, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import ensure_csrf_cookie
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAdminUser, IsAuthenticated, AllowAny
+from rest_framework.settings import api_settings
 
 from .models import *
 from .serializers import *
+from .autocomplete import index as autocomplete_index
+from .caches import MY_PARTICIPATION_TTL, invalidate_my_participation, my_participation_cache_key
+from . import exporting
+from .duplicates import possible_duplicates
+from .deletion import count_project_rows, purge_project, tombstone_project
+from .facets import city_facets
+from .feed import feed_for
+from .geo import bounding_box, covering_ranges, haversine_km
+from .idempotency import idempotent
+from .importing import detect_format, import_projects, read_rows
+from .instrumentation import span
+from .metrics import render_prometheus
+from .pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidCursor, is_paginated, paginate_keyset
+from .renderers import NDJSONRenderer
+from .streaming import stream_queryset, wants_stream
+from .tasks import run_in_background
 from .feedback_ai import analyze_project_with_gemini, rank_projects_on_interests
 
 
+DEFAULT_NEAR_RADIUS_KM = 5
+MAX_NEAR_RADIUS_KM = 500
+MAX_AUTOCOMPLETE_RESULTS = 50
+
+
 # Create your views here.
 
 
@@ -20,8 +49,17 @@ def ping(request):
     return Response({"message": "pong!"})
 
 
+def metrics(request):
+    # Plain Django view: Prometheus wants text, not DRF's content negotiation.
+    # Scrapers are let in by address, people by staff session; nobody else
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS and not request.user.is_staff:
+        return HttpResponseForbidden()
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 @api_view(['GET', 'POST'])
 @permission_classes([AllowAny])
+@renderer_classes([*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer])
 def projects_endpoint(request):
     if request.method == 'GET':
         return get_projects(request)
@@ -41,28 +79,273 @@ def get_projects(request):
     else:
         user = AnonymousUser()
 
-    projects = Project.objects.all()
+    try:
+        serializer_class, fields = project_representation(request)
+    except ValueError as error:
+        return Response({"error": str(error)}, status=400)
+
+    projects = Project.live.with_stats(request.user, stats=serializer_class.stats_for(fields))
     if city:
         projects = projects.filter(city=request.GET.get('city'))
     if search:
         projects = projects.filter(name__icontains=search)
     if not isinstance(user, AnonymousUser):
         projects = projects.filter(author=user)
-
-    serialized = ProjectSerializer(projects, many=True, context={'request': request})
-    return Response(serialized.data)
-
+    if 'fields' in request.GET or serializer_class is not ProjectSerializer:
+        projects = narrow_project_columns(projects, serializer_class, fields)
+    serializer_kwargs = {'context': {'request': request}, 'fields': fields}
+
+    near = request.GET.get('near', None)
+    if near:
+        return get_projects_near(request, projects, near, serializer_class, serializer_kwargs)
+
+    if wants_stream(request):
+        return stream_queryset(request, projects, serializer_class, **serializer_kwargs)
+
+    with span('serialize'):
+        data = serializer_class(projects, many=True, **serializer_kwargs).data
+    return Response(data)
+
+
+def project_representation(request):
+    """
+    Serializer class and field names for a project list: ?view=card picks the
+    compact card, ?fields=a,b narrows either view. ValueError for unknown names.
+    """
+    view = request.GET.get('view', 'full')
+    if view not in ('full', 'card'):
+        raise ValueError("view must be 'full' or 'card'")
+    serializer_class = ProjectCardSerializer if view == 'card' else ProjectSerializer
+    available = serializer_class.field_names()
+
+    requested = request.GET.get('fields')
+    if not requested:
+        return serializer_class, available
+    fields = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = set(fields) - set(available)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return serializer_class, fields
+
+
+def narrow_project_columns(projects, serializer_class, fields):
+    """Load only the columns the chosen fields read; cards get a description snippet."""
+    columns = {field.name for field in Project._meta.concrete_fields}
+    load = [name for name in fields if name in columns]
+    if serializer_class is ProjectCardSerializer and 'description' in fields:
+        projects = with_description_snippet(projects)
+        load.remove('description')
+    return projects.only('id', *load)
+
+
+def get_projects_near(request, projects, near, serializer_class=ProjectSerializer, serializer_kwargs=None):
+    """
+    Projects within ?radius= km of ?near=lat,lon, nearest first, a page of
+    ?limit= (at most MAX_PAGE_SIZE) after ?offset= at a time.
+    """
+    try:
+        latitude, longitude = (float(part) for part in near.split(','))
+        radius = float(request.GET.get('radius', DEFAULT_NEAR_RADIUS_KM))
+    except ValueError:
+        return Response({"error": "near must be 'lat,lon' and radius a number of km"}, status=400)
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180 and 0 < radius <= MAX_NEAR_RADIUS_KM):
+        return Response({"error": "Coordinates or radius out of range"}, status=400)
+    try:
+        offset = int(request.GET.get('offset', 0))
+        limit = int(request.GET.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return Response({"error": "Invalid offset or limit"}, status=400)
+    if offset < 0 or limit < 1:
+        return Response({"error": "Invalid offset or limit"}, status=400)
+    limit = min(limit, MAX_PAGE_SIZE)
+
+    # Coarse pass on the indexed geohash ranges, trimmed to the circle's bounding
+    # box in SQL; exact distances only for the rows left
+    ranges = covering_ranges(latitude, longitude, radius)
+    min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius)
+    candidates = projects.filter(geohash__isnull=False, latitude__range=(min_lat, max_lat))
+    if min_lon is not None:
+        candidates = candidates.filter(longitude__range=(min_lon, max_lon))
+    if ranges:
+        in_cells = Q()
+        for low, high in ranges:
+            in_cells |= Q(geohash__gte=low, geohash__lt=high)
+        candidates = candidates.filter(in_cells)
+
+    distances = {}
+    for pk, lat, lon in candidates.values_list('id', 'latitude', 'longitude').iterator():
+        distance = haversine_km(latitude, longitude, lat, lon)
+        if distance <= radius:
+            distances[pk] = distance
+
+    # Only the requested page is loaded, however many projects are in range
+    page = heapq.nsmallest(offset + limit, distances, key=lambda pk: (distances[pk], pk))[offset:]
+    nearby = sorted(projects.filter(pk__in=page), key=lambda project: (distances[project.pk], project.pk))
+    serializer_kwargs = serializer_kwargs or {'context': {'request': request}}
+    with span('serialize'):
+        data = serializer_class(nearby, many=True, **serializer_kwargs).data
+    for project, item in zip(nearby, data):
+        item['distance_km'] = round(distances[project.pk], 3)
+    return Response(data)
+
+@idempotent
 def create_project(request):
     serializer = CreateProjectSerializer(data=request.data)
     if serializer.is_valid():
         if request.user.is_authenticated:
-            serializer.save(author=request.user)
+            project = serializer.save(author=request.user)
         else:
-            serializer.save()
-        return Response(serializer.data, status=201)
+            project = serializer.save()
+        return Response({**serializer.data, 'possible_duplicates': possible_duplicates(project)}, status=201)
     return Response(serializer.errors, status=400)
 
 
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def import_projects_upload(request):
+    """Staff upload of a CSV or JSONL feed (multipart field `file`), see api.importing."""
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({"error": "Upload the feed as the multipart field 'file'"}, status=400)
+    fmt = request.data.get('type') or detect_format(upload.name, upload.content_type or '')
+    if fmt not in ('csv', 'jsonl'):
+        return Response({"error": "Cannot tell the format, pass type=csv or type=jsonl"}, status=400)
+
+    report = import_projects(read_rows(upload.file, fmt), author=request.user)
+    return Response(report.as_dict(), status=200 if not report.failed else 207)
+
+
+def export_dataset(request, dataset):
+    """
+    Staff download of a whole dataset as it streams out of the database (see
+    api.exporting). Plain Django view: the body is CSV/JSONL/Parquet, not
+    something for DRF's content negotiation. The `until` used is returned in
+    X-Export-Watermark; pass it as the next export's `since`.
+    """
+    if not request.user.is_staff:
+        return HttpResponseForbidden()
+    fmt = request.GET.get('type', 'csv')
+    try:
+        exporting.validate(dataset, fmt)
+        since = exporting.parse_watermark(request.GET.get('since'))
+        until = exporting.export_until(request.GET.get('until'))
+    except exporting.ExportError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    response = StreamingHttpResponse(
+        exporting.export_chunks(dataset, fmt, since, until),
+        content_type=exporting.CONTENT_TYPES[fmt],
+    )
+    response['Content-Disposition'] = f'attachment; filename="{dataset}.{fmt}"'
+    response['X-Export-Watermark'] = until.isoformat()
+    return response
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def queue_export(request):
+    """Write an export to EXPORT_DIR in the background, for ranges too large to stream over HTTP."""
+    dataset = request.data.get('dataset')
+    fmt = request.data.get('type', 'csv')
+    try:
+        exporting.validate(dataset, fmt)
+        since = exporting.parse_watermark(request.data.get('since'))
+        until = exporting.export_until(request.data.get('until'))
+    except exporting.ExportError as exc:
+        return Response({"error": str(exc)}, status=400)
+
+    export = DataExport.objects.create(
+        requested_by=request.user, dataset=dataset, format=fmt, since=since, until=until,
+    )
+    transaction.on_commit(lambda: run_in_background(exporting.run_export, export.pk))
+    return Response(DataExportSerializer(export).data, status=202)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def export_status(request, export_id):
+    try:
+        export = DataExport.objects.get(pk=export_id)
+    except DataExport.DoesNotExist:
+        return Response({"error": "Export not found"}, status=404)
+    return Response(DataExportSerializer(export).data)
+
+
+def download_export(request, export_id):
+    if not request.user.is_staff:
+        return HttpResponseForbidden()
+    try:
+        export = DataExport.objects.get(pk=export_id, status='done')
+    except DataExport.DoesNotExist:
+        raise Http404("Export not found or not finished")
+    try:
+        file = open(export.path, 'rb')
+    except FileNotFoundError:
+        # Removed by tmp cleanup or a redeploy; the export has to be requested again
+        return HttpResponseGone("Export file is gone, request a new export")
+    return FileResponse(
+        file,
+        as_attachment=True,
+        filename=f'{export.dataset}-{export.pk}.{export.format}',
+        content_type=exporting.CONTENT_TYPES[export.format],
+    )
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def project_facets(request):
+    return Response({"cities": city_facets()})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def user_feed(request):
+    """
+    A page of the user's precomputed feed (see api.feed), best first, by
+    ?offset= and ?limit=. ?view= and ?fields= work as on the project list.
+    """
+    try:
+        offset = int(request.GET.get('offset', 0))
+        limit = int(request.GET.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return Response({"error": "Invalid offset or limit"}, status=400)
+    if offset < 0 or limit < 1:
+        return Response({"error": "Invalid offset or limit"}, status=400)
+    limit = min(limit, MAX_PAGE_SIZE)
+    try:
+        serializer_class, fields = project_representation(request)
+    except ValueError as error:
+        return Response({"error": str(error)}, status=400)
+
+    feed = feed_for(request.user)
+    page_ids = feed.project_ids[offset:offset + limit]
+    projects = Project.live.with_stats(request.user, stats=serializer_class.stats_for(fields)).filter(pk__in=page_ids)
+    if 'fields' in request.GET or serializer_class is not ProjectSerializer:
+        projects = narrow_project_columns(projects, serializer_class, fields)
+    # Projects deleted since the feed was built just drop out of the page
+    position = {pk: i for i, pk in enumerate(page_ids)}
+    projects = sorted(projects, key=lambda project: position[project.pk])
+    with span('serialize'):
+        data = serializer_class(projects, many=True, context={'request': request}, fields=fields).data
+    return Response({
+        "results": data,
+        "count": len(feed.project_ids),
+        "offset": offset,
+        "limit": limit,
+        "built_at": feed.built_at,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def autocomplete(request):
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), MAX_AUTOCOMPLETE_RESULTS)
+    except ValueError:
+        return Response({"error": "Invalid limit"}, status=400)
+    return Response(autocomplete_index.search(request.GET.get('q', ''), limit=limit))
+
+
 @api_view(['GET', 'PUT', 'DELETE'])
 @permission_classes([AllowAny])
 def project_detail_endpoint(request, project_id):
@@ -77,36 +360,45 @@ def project_detail_endpoint(request, project_id):
 
 def get_project_detail(request, project_id):
     try:
-        project = Project.objects.get(pk=project_id)
-        serialized = ProjectSerializer(project, context={'request': request})
-        return Response(serialized.data)
+        project = Project.live.with_stats(request.user).get(pk=project_id)
+        with span('serialize'):
+            data = ProjectSerializer(project, context={'request': request}).data
+        return Response(data)
     except Project.DoesNotExist:
         return Response(status=404)
 
 def update_project(request, project_id):
     try:
-        project = Project.objects.get(pk=project_id)
+        project = Project.live.get(pk=project_id)
         if project.author != request.user:
             return Response(status=403)
         serializer = ProjectSerializer(project, data=request.data, partial=True, context={'request': request})
         if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data)
+            project = serializer.save()
+            return Response({**serializer.data, 'possible_duplicates': possible_duplicates(project)})
         return Response(serializer.errors, status=400)
     except Project.DoesNotExist:
         return Response(status=404)
 
 def delete_project(request, project_id):
     try:
-        project = Project.objects.get(pk=project_id)
-        if project.author == request.user:
-            project.delete()
-            return Response(status=204)
-
-        return Response(status=403)
+        project = Project.live.get(pk=project_id)
     except Project.DoesNotExist:
         return Response(status=404)
 
+    if project.author_id is None or project.author_id != request.user.id:
+        return Response(status=403)
+
+    if count_project_rows(project.id) > settings.PROJECT_DELETE_BACKGROUND_THRESHOLD:
+        # Tombstone right away so the project disappears from every listing,
+        # then let a worker remove the rows once the flag is committed
+        tombstone_project(project)
+        transaction.on_commit(lambda: run_in_background(purge_project, project.id))
+        return Response(status=202)
+
+    purge_project(project.id)
+    return Response(status=204)
+
 
 # AUTH
 @api_view(['POST'])
@@ -163,7 +455,7 @@ def get_user_public(request, user_id):
 @permission_classes([IsAuthenticated])
 def vote_for_project(request, project_id):
     try:
-        project = Project.objects.get(pk=project_id)
+        project = Project.live.get(pk=project_id)
     except Project.DoesNotExist:
         return Response(status=404)
 
@@ -199,12 +491,13 @@ def comments_endpoint(request, project_id):
     return Response(status=405)
 
 
+@idempotent
 def comment_on_project(request, project_id):
     if not request.user.is_authenticated:
         return Response({"error": "Authentication required to comment"}, status=401)
 
     try:
-        project = Project.objects.get(pk=project_id)
+        project = Project.live.get(pk=project_id)
     except Project.DoesNotExist:
         return Response(status=404)
 
@@ -220,13 +513,14 @@ def comment_on_project(request, project_id):
 
 def get_project_comments(request, project_id):
     try:
-        project = Project.objects.get(pk=project_id)
+        project = Project.live.get(pk=project_id)
     except Project.DoesNotExist:
         return Response(status=404)
 
     comments = project.comments.all().order_by('-created_at')
-    serializer = CommentSerializer(comments, many=True)
-    return Response(serializer.data)
+    with span('serialize'):
+        data = CommentSerializer(comments, many=True).data
+    return Response(data)
 
 
 @api_view(['DELETE'])
@@ -247,11 +541,12 @@ def delete_comment(request, comment_id):
 @permission_classes([IsAuthenticated])
 def analyze_project_with_ai(request, project_id):
     try:
-        project = Project.objects.get(pk=project_id)
+        project = Project.live.with_stats(request.user).get(pk=project_id)
     except Project.DoesNotExist:
         return Response({"error": "Project not found"}, status=404)
 
-    serialized_project = ProjectSerializer(project, context={"request": request}).data
+    with span('serialize'):
+        serialized_project = ProjectSerializer(project, context={"request": request}).data
 
     try:
         analysis_result = analyze_project_with_gemini(serialized_project)
@@ -270,34 +565,39 @@ def rank_projects_by_interests(request):
     if not prompt:
         return Response({"error": "Prompt is required"}, status=400)
 
-    projects = Project.objects.all()
-    serialized_projects = ProjectSerializer(projects, many=True, context={"request": request}).data
+    projects = Project.live.with_stats(request.user)
+    with span('serialize'):
+        serialized_projects = ProjectSerializer(projects, many=True, context={"request": request}).data
     try:
         ranked_result = rank_projects_on_interests(serialized_projects, prompt)
-        # ranked_result may be either a list (old behavior) or a dict {ranked_projects, summary}
-        if isinstance(ranked_result, dict):
-            ranked_list = ranked_result.get('ranked_projects', [])
-            overall_summary = ranked_result.get('summary', '')
-        else:
-            ranked_list = ranked_result
-            overall_summary = ''
-         # Convert ranked items into the same shape as /projects: include project data and score
-        formatted = []
-        for item in ranked_list:
-            proj = item.get('project')
-            score = item.get('score')
-            explanation = item.get('match_explanation', '')
-            # Attach score to the project dict
-            proj_with_score = dict(proj)
-            proj_with_score['score'] = score
-            proj_with_score['match_explanation'] = explanation
-            formatted.append(proj_with_score)
         # Return projects list and an overall summary
-        return Response({"projects": formatted, "summary": overall_summary})
+        return Response(format_ranking(ranked_result))
     except Exception as e:
         return Response({"error": str(e)}, status=500)
 
 
+def format_ranking(ranked_result):
+    # ranked_result may be either a list (old behavior) or a dict {ranked_projects, summary}
+    if isinstance(ranked_result, dict):
+        ranked_list = ranked_result.get('ranked_projects', [])
+        overall_summary = ranked_result.get('summary', '')
+    else:
+        ranked_list = ranked_result
+        overall_summary = ''
+    # Convert ranked items into the same shape as /projects: include project data and score
+    formatted = []
+    for item in ranked_list:
+        proj = item.get('project')
+        score = item.get('score')
+        explanation = item.get('match_explanation', '')
+        # Attach score to the project dict
+        proj_with_score = dict(proj)
+        proj_with_score['score'] = score
+        proj_with_score['match_explanation'] = explanation
+        formatted.append(proj_with_score)
+    return {"projects": formatted, "summary": overall_summary}
+
+
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
 def participation_requests_endpoint(request, project_id):
@@ -322,9 +622,38 @@ def my_participation_requests(request):
 
 def get_my_participation_requests(request):
     user = request.user
-    requests = ParticipationRequest.objects.filter(user=user).order_by('-created_at')
-    serializer = ParticipationRequestSerializer(requests, many=True)
-    return Response(serializer.data)
+    cache_key = my_participation_cache_key(user.id, request.GET.urlencode())
+    data = cache.get(cache_key)
+    if data is None:
+        requests = ParticipationRequest.objects.filter(user=user, project__is_deleted=False).select_related('user', 'project')
+        response = paginated_response(request, requests, MyParticipationRequestSerializer)
+        if response.status_code != 200:
+            return response
+        data = response.data
+        cache.set(cache_key, data, MY_PARTICIPATION_TTL)
+    return Response(with_project_stats(data))
+
+
+def with_project_stats(data):
+    """
+    Add the current score and participant count to each cached row's
+    project_info. Both change with every vote and membership, so they are
+    read fresh, in one query for the page, rather than cached.
+    """
+    rows = data['results'] if isinstance(data, dict) else data
+    project_ids = {row['project_info']['id'] for row in rows}
+    stats = {}
+    if project_ids:
+        stats = {
+            pk: {'score': score, 'participants_count': participants_count}
+            for pk, score, participants_count in Project.objects.filter(pk__in=project_ids)
+            .with_stats(stats=('score', 'participants_count'))
+            .values_list('pk', 'score', 'participants_count')
+        }
+    for row in rows:
+        info = row['project_info']
+        row['project_info'] = {**info, **stats.get(info['id'], {'score': 0, 'participants_count': 0})}
+    return data
 
 
 def delete_my_participation_request(request, request_id):
@@ -336,20 +665,69 @@ def delete_my_participation_request(request, request_id):
         return Response(status=404)
 
 
+PARTICIPATION_REQUEST_STATUSES = ('pending', 'approved', 'rejected')
+BULK_RESPONSE_MAX_ITEMS = 500
+
+
+def paginated_response(request, queryset, serializer_class, **serializer_kwargs):
+    """
+    Serialize newest-first rows. Clients that pass `limit` or `cursor` get a
+    keyset-paginated envelope, everyone else keeps getting a plain list.
+    """
+    if not is_paginated(request):
+        rows = queryset.order_by('-created_at', '-id')
+        with span('serialize'):
+            data = serializer_class(rows, many=True, **serializer_kwargs).data
+        return Response(data)
+
+    try:
+        rows, next_cursor = paginate_keyset(queryset, request)
+    except InvalidCursor:
+        return Response({"error": "Invalid cursor or limit"}, status=400)
+    with span('serialize'):
+        data = serializer_class(rows, many=True, **serializer_kwargs).data
+    return Response({"results": data, "next_cursor": next_cursor})
+
+
 def get_participation_requests(request, project_id):
     try:
-        project = Project.objects.get(pk=project_id)
+        project = Project.live.get(pk=project_id)
     except Project.DoesNotExist:
         return Response(status=404)
 
-    requests = project.participation_requests.all().order_by('-created_at')
-    serializer = ParticipationRequestSerializer(requests, many=True)
-    return Response(serializer.data)
+    if project.author_id != request.user.id:
+        return Response(status=403)
+
+    requests = project.participation_requests.select_related('user')
+    status = request.GET.get('status')
+    if status:
+        if status not in PARTICIPATION_REQUEST_STATUSES:
+            return Response({"error": "Invalid status"}, status=400)
+        requests = requests.filter(status=status)
+
+    return paginated_response(request, requests, ParticipationRequestSerializer)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def participation_requests_inbox(request):
+    # One query across every project the caller authored, pending by default
+    status = request.GET.get('status', 'pending')
+    if status not in PARTICIPATION_REQUEST_STATUSES:
+        return Response({"error": "Invalid status"}, status=400)
+
+    requests = ParticipationRequest.objects.filter(
+        project__author=request.user,
+        project__is_deleted=False,
+        status=status,
+    ).select_related('user', 'project')
+    return paginated_response(request, requests, InboxParticipationRequestSerializer)
+
+
+@idempotent
 def send_participation_request(request, project_id):
     try:
-        project = Project.objects.get(pk=project_id)
+        project = Project.live.get(pk=project_id)
     except Project.DoesNotExist:
         return Response(status=404)
 
@@ -372,38 +750,134 @@ def send_participation_request(request, project_id):
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def respond_to_participation_request(request, request_id):
-    try:
-        participation_request = ParticipationRequest.objects.get(pk=request_id)
-    except ParticipationRequest.DoesNotExist:
-        return Response(status=404)
+    action = request.data.get('action', '').strip().lower()
 
-    project = participation_request.project
-    if project.author != request.user:
-        return Response(status=403)
+    with transaction.atomic():
+        # Locked so a concurrent response (single or bulk) cannot interleave
+        try:
+            participation_request = (
+                ParticipationRequest.objects.select_for_update(of=('self',))
+                .select_related('project')
+                .get(pk=request_id, project__is_deleted=False)
+            )
+        except ParticipationRequest.DoesNotExist:
+            return Response(status=404)
+
+        project = participation_request.project
+        if project.author_id != request.user.id:
+            return Response(status=403)
 
-    action = request.data.get('action', '').strip().lower()
-    if action not in ['approve', 'reject']:
-        return Response({"error": "Invalid action"}, status=400)
+        if action not in ['approve', 'reject']:
+            return Response({"error": "Invalid action"}, status=400)
 
-    if action == 'approve':
-        participation_request.status = 'approved'
-        Participant.objects.create(user=participation_request.user, project=project, role='member')
-    elif action == 'reject':
-        participation_request.status = 'rejected'
+        if action == 'approve':
+            participation_request.status = 'approved'
+            # A bulk approval may have added the member already
+            Participant.objects.get_or_create(user=participation_request.user, project=project, defaults={'role': 'member'})
+        elif action == 'reject':
+            participation_request.status = 'rejected'
 
-    participation_request.save()
+        participation_request.save()
     serializer = ParticipationRequestSerializer(participation_request)
     return Response(serializer.data)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def bulk_respond_to_participation_requests(request):
+    """
+    Approve or reject up to BULK_RESPONSE_MAX_ITEMS requests in one
+    transaction, with an outcome per id. Unlike the single-item endpoint,
+    rejecting a request that was approved also revokes the membership it
+    granted.
+    """
+    request_ids = request.data.get('request_ids')
+    if not isinstance(request_ids, list) or not request_ids:
+        return Response({"error": "request_ids must be a non-empty list"}, status=400)
+    if len(request_ids) > BULK_RESPONSE_MAX_ITEMS:
+        return Response({"error": f"At most {BULK_RESPONSE_MAX_ITEMS} requests per call"}, status=400)
+    try:
+        request_ids = list(dict.fromkeys(int(pk) for pk in request_ids))
+    except (TypeError, ValueError):
+        return Response({"error": "request_ids must be integers"}, status=400)
+
+    action = str(request.data.get('action', '')).strip().lower()
+    if action not in ['approve', 'reject']:
+        return Response({"error": "Invalid action"}, status=400)
+    new_status = 'approved' if action == 'approve' else 'rejected'
+
+    with transaction.atomic():
+        # Ownership and current status for every item come from this single
+        # query; the rows stay locked until the updates below are committed.
+        # Requests on projects queued for purge count as not found
+        found = {
+            row['id']: row
+            for row in ParticipationRequest.objects.filter(pk__in=request_ids, project__is_deleted=False)
+            .select_for_update(of=('self',))
+            .values('id', 'user_id', 'project_id', 'status', 'project__author_id')
+        }
+
+        outcomes = {}
+        to_update = []
+        for pk in request_ids:
+            row = found.get(pk)
+            if row is None:
+                outcomes[pk] = 'not_found'
+            elif row['project__author_id'] != request.user.id:
+                outcomes[pk] = 'forbidden'
+            elif row['status'] == new_status:
+                outcomes[pk] = 'unchanged'
+            else:
+                outcomes[pk] = new_status
+                to_update.append(row)
+
+        ParticipationRequest.objects.filter(pk__in=[row['id'] for row in to_update]).update(status=new_status)
+        if new_status == 'approved':
+            Participant.objects.bulk_create(
+                [Participant(user_id=row['user_id'], project_id=row['project_id'], role='member') for row in to_update],
+                ignore_conflicts=True,
+            )
+        else:
+            # Rejecting a previously approved request revokes the membership it granted
+            revoked = Q()
+            for row in to_update:
+                if row['status'] == 'approved':
+                    revoked |= Q(user_id=row['user_id'], project_id=row['project_id'])
+            if revoked:
+                Participant.objects.filter(revoked).delete()
+    # update() sends no signals, so drop the applicants' cached pages by hand
+    invalidate_my_participation(*{row['user_id'] for row in to_update})
+
+    touched_projects = {row['project_id'] for row in found.values() if outcomes[row['id']] != 'forbidden'}
+    participants_count = dict(
+        Participant.objects.filter(project_id__in=touched_projects)
+        .values_list('project_id')
+        .annotate(count=Count('id'))
+    )
+
+    results = [
+        {
+            "id": pk,
+            "outcome": outcomes[pk],
+            "status": new_status if outcomes[pk] in (new_status, 'unchanged') else None,
+        }
+        for pk in request_ids
+    ]
+    return Response({
+        "results": results,
+        "participants_count": {str(pk): participants_count.get(pk, 0) for pk in touched_projects},
+    })
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_participants(request, project_id):
     try:
-        project = Project.objects.get(pk=project_id)
+        project = Project.live.get(pk=project_id)
     except Project.DoesNotExist:
         return Response(status=404)
 
     participants = project.participants.all()
-    serializer = ParticipantSerializer(participants, many=True)
-    return Response(serializer.data)
+    with span('serialize'):
+        data = ParticipantSerializer(participants, many=True).data
+    return Response(data)
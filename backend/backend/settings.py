@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 import os
+import sys
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -47,6 +48,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.RequestTimingMiddleware',
+    'api.middleware.CompressionMiddleware',
+    'api.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -55,6 +59,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.ProfilingMiddleware',
     ]
 
 CORS_ALLOW_CREDENTIALS = True
@@ -97,12 +102,166 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_ENGINE=postgres switches to PostgreSQL (needs psycopg[pool] installed). Connections are either
+# kept open for DB_CONN_MAX_AGE seconds, or, with DB_POOL=1, taken from a
+# psycopg connection pool; Django does not allow both at once
+if os.getenv('DB_ENGINE', 'sqlite') == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('DB_NAME', 'volohub'),
+            'USER': os.getenv('DB_USER', ''),
+            'PASSWORD': os.getenv('DB_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', ''),
+            'PORT': os.getenv('DB_PORT', ''),
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
     }
+    if os.getenv('DB_POOL', '0') == '1':
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+            'timeout': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                # Seconds a writer waits for the lock before "database is locked"
+                'timeout': float(os.getenv('SQLITE_BUSY_TIMEOUT', 20)),
+                # Take the write lock when the transaction starts instead of
+                # failing on the lock upgrade halfway through it
+                'transaction_mode': 'IMMEDIATE',
+                # WAL lets readers run alongside the writer; synchronous=NORMAL is
+                # durable in WAL mode except across a power loss
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    f"PRAGMA mmap_size={int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))};"
+                    'PRAGMA cache_size=-20000;'
+                    'PRAGMA temp_store=MEMORY;'
+                ),
+            },
+        }
+    }
+    # SQLITE_TUNING=0 restores SQLite's defaults, e.g. to benchmark against them.
+    # WAL is a property of the database file, so it is switched back explicitly
+    if os.getenv('SQLITE_TUNING', '1') == '0':
+        DATABASES['default']['OPTIONS'] = {'init_command': 'PRAGMA journal_mode=DELETE;'}
+
+# Read replicas: DB_REPLICAS lists replica hosts (Postgres) or database files
+# (SQLite), each becoming a `replicaN` alias with the primary's other settings.
+# Safe requests read from them unless the client wrote within REPLICA_PIN_SECONDS
+DATABASE_REPLICAS = []
+for number, replica in enumerate(filter(None, os.getenv('DB_REPLICAS', '').split(',')), start=1):
+    alias = f'replica{number}'
+    location = 'HOST' if DATABASES['default']['ENGINE'].endswith('postgresql') else 'NAME'
+    # Tests run everything against the primary's test database
+    DATABASES[alias] = {**DATABASES['default'], location: replica, 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['api.routers.ReplicaRouter']
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 10))
+
+
+# Shared cache for sessions, the per-user auth cache and API caches. Without
+# REDIS_URL every process keeps its own in-memory cache, which is only correct
+# for single-process deployments: a logout or password change would not reach
+# the other processes' copies
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Sessions are read from the cache and written through to the database, and
+# the user behind a session comes from a short-lived cache (api.caches), so an
+# authenticated request needs no queries before the view runs
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+AUTHENTICATION_BACKENDS = ['api.backends.CachedModelBackend']
+
+
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest_framework.authentication.SessionAuthentication',
+    ],
+    'DEFAULT_PERMISSION_CLASSES': [
+        'rest_framework.permissions.IsAuthenticated',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.CostThrottle',
+    ],
+    # Reverse proxies in front of the app that append to X-Forwarded-For.
+    # 0 identifies anonymous clients by REMOTE_ADDR and ignores the header,
+    # which clients can set to anything
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', 0)),
+}
+
+# Token-bucket throttling (api.throttling). Each client gets (capacity,
+# tokens refilled per second): users by account, anonymous clients by IP
+# (see NUM_PROXIES).
+# A request spends its view's cost, 1 unless listed
+THROTTLE_ENABLED = os.getenv('THROTTLE_ENABLED', '1') == '1'
+THROTTLE_STORE = os.getenv('THROTTLE_STORE', 'cache' if os.getenv('REDIS_URL') else 'local')
+THROTTLE_BUDGETS = {
+    'anon': (int(os.getenv('THROTTLE_ANON_CAPACITY', 60)), float(os.getenv('THROTTLE_ANON_RATE', 1))),
+    'user': (int(os.getenv('THROTTLE_USER_CAPACITY', 300)), float(os.getenv('THROTTLE_USER_RATE', 5))),
 }
+THROTTLE_COSTS = {
+    # One LLM call per request
+    'analyze_project_with_ai': 10,
+    # Two LLM calls per project in the database
+    'rank_projects_by_interests': 50,
+    # Password hashing, and a target for credential stuffing
+    'login_view': 5,
+    'register': 5,
+    'import_projects_upload': 20,
+    'queue_export': 20,
+}
+
+# Estimated name/description similarity (0-1) from which api.duplicates
+# reports a project of the same city as a possible duplicate
+DUPLICATE_SIMILARITY = float(os.getenv('DUPLICATE_SIMILARITY', 0.7))
+
+# Responses to writes sent with an Idempotency-Key (api.idempotency) are
+# replayed for retries within IDEMPOTENCY_TTL seconds; a duplicate arriving
+# while the first is still running waits at most the lock's lifetime. Needs
+# a cache shared by all workers, so it is off without REDIS_URL unless
+# IDEMPOTENCY_ENABLED=1 (single-process deployments)
+IDEMPOTENCY_ENABLED = os.getenv('IDEMPOTENCY_ENABLED', '1' if os.getenv('REDIS_URL') else '0') == '1'
+IDEMPOTENCY_TTL = int(os.getenv('IDEMPOTENCY_TTL', 24 * 60 * 60))
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv('IDEMPOTENCY_LOCK_SECONDS', 10))
+
+# Text responses at least this large are compressed (brotli when the optional
+# `brotli` package is installed and the client accepts it, otherwise gzip)
+COMPRESSION_MIN_BYTES = int(os.getenv('COMPRESSION_MIN_BYTES', 1024))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', 5))
+
+# Rows fetched per database round trip by streamed listings (?stream=1 or
+# Accept: application/x-ndjson)
+STREAM_CHUNK_SIZE = int(os.getenv('STREAM_CHUNK_SIZE', 500))
 
 
 # Password validation
@@ -126,17 +285,52 @@ AUTH_PASSWORD_VALIDATORS = [
 
 
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', '')
+# LLM calls a process keeps in flight at once from async views (see api.feedback_ai)
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', 100))
 
+# Serve the AI and read-heavy project/comment endpoints from api.async_views.
+# backend/asgi.py turns this on; under WSGI the DRF views are used
+API_ASYNC_VIEWS = os.getenv('API_ASYNC_VIEWS', '0') == '1'
 
-REST_FRAMEWORK = {
-    'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.SessionAuthentication',
-    ],
-    'DEFAULT_PERMISSION_CLASSES': [
-        'rest_framework.permissions.IsAuthenticated',
-    ],
-}
 
+# Deleting a project whose votes, comments, participants and requests add up to
+# more rows than this hides it immediately and finishes the delete in the background
+PROJECT_DELETE_BACKGROUND_THRESHOLD = int(os.getenv('PROJECT_DELETE_BACKGROUND_THRESHOLD', 5000))
+BACKGROUND_TASK_WORKERS = int(os.getenv('BACKGROUND_TASK_WORKERS', 2))
+
+# Offline geocoding file (CSV with name, latitude, longitude) used to place
+# projects by their location or city; geocoding is off when unset
+GAZETTEER_PATH = os.getenv('GAZETTEER_PATH', '')
+
+# The autocomplete index is updated in place by this process' writes; a full
+# rebuild this often picks up projects saved by other workers
+AUTOCOMPLETE_REBUILD_SECONDS = int(os.getenv('AUTOCOMPLETE_REBUILD_SECONDS', 300))
+
+
+# Request instrumentation (api.middleware.RequestTimingMiddleware): requests
+# slower than this, or running one query shape this many times, are logged to
+# the `api.slow` logger
+SLOW_REQUEST_THRESHOLD_MS = float(os.getenv('SLOW_REQUEST_THRESHOLD_MS', 500))
+DUPLICATE_QUERY_THRESHOLD = int(os.getenv('DUPLICATE_QUERY_THRESHOLD', 3))
+
+# Metrics exported at /api/metrics. Under gunicorn point METRICS_MULTIPROC_DIR
+# at a directory shared by the workers (cleared on start) so every scrape sees
+# all of them. Only METRICS_ALLOWED_IPS (the scraper's address) and staff
+# sessions may read them; with no addresses listed that is staff only
+METRICS_MULTIPROC_DIR = os.getenv('METRICS_MULTIPROC_DIR', '')
+METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', 5))
+METRICS_ALLOWED_IPS = [ip for ip in os.getenv('METRICS_ALLOWED_IPS', '').split(',') if ip]
+
+# Staff requests carrying `X-Profile: 1` (cProfile) or `X-Profile: sample` are
+# profiled and stored for the admin; only the newest PROFILE_RETENTION are kept
+PROFILE_RETENTION = int(os.getenv('PROFILE_RETENTION', 200))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv('PROFILE_SAMPLE_INTERVAL_MS', 5))
+
+# Analytics exports queued through POST /api/exports/ are written here
+EXPORT_DIR = os.getenv('EXPORT_DIR', str(BASE_DIR / 'exports'))
+# Exports stop this many seconds in the past, so rows still being committed
+# with an earlier created_at are not skipped by the next incremental export
+EXPORT_WATERMARK_LAG = int(os.getenv('EXPORT_WATERMARK_LAG', 60))
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -159,3 +353,37 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Running under `manage.py test`
+TESTING = sys.argv[1:2] == ['test']
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        # One line per request; off under `manage.py test` unless asked for
+        'api.timing': {
+            'handlers': ['console'],
+            'level': os.getenv('REQUEST_TIMING_LOG_LEVEL', 'WARNING' if TESTING else 'INFO'),
+            'propagate': False,
+        },
+        'api.slow': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
+# Keep a dedicated slow-request log file when a path is configured
+if os.getenv('SLOW_REQUEST_LOG'):
+    LOGGING['handlers']['slow_requests'] = {
+        'class': 'logging.FileHandler',
+        'filename': os.getenv('SLOW_REQUEST_LOG'),
+    }
+    LOGGING['loggers']['api.slow']['handlers'].append('slow_requests')